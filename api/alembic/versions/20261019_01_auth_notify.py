@@ -0,0 +1,64 @@
+"""Publish auth cache invalidations over NOTIFY."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_01_auth_notify"
+down_revision = "20260202_01_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # pg_notify inside a trigger is delivered only when the writing
+    # transaction commits, and duplicate payloads within one transaction
+    # are collapsed, so bulk revocations publish one message per key/user.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_auth_invalidate() RETURNS trigger AS $$
+        BEGIN
+          IF TG_TABLE_NAME = 'api_keys' THEN
+            PERFORM pg_notify('auth_invalidate', 'key:' || OLD.key_hash);
+          ELSIF TG_TABLE_NAME = 'user_roles' THEN
+            IF TG_OP = 'INSERT' THEN
+              PERFORM pg_notify('auth_invalidate', 'user:' || NEW.user_id::text);
+            ELSE
+              PERFORM pg_notify('auth_invalidate', 'user:' || OLD.user_id::text);
+            END IF;
+          ELSE
+            PERFORM pg_notify('auth_invalidate', 'user:' || OLD.id::text);
+          END IF;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER api_keys_auth_invalidate
+        AFTER UPDATE OF revoked_at, scopes, expires_at, user_id OR DELETE ON api_keys
+        FOR EACH ROW EXECUTE FUNCTION notify_auth_invalidate();
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER user_roles_auth_invalidate
+        AFTER INSERT OR UPDATE OR DELETE ON user_roles
+        FOR EACH ROW EXECUTE FUNCTION notify_auth_invalidate();
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER users_auth_invalidate
+        AFTER UPDATE OF username, display_name, email OR DELETE ON users
+        FOR EACH ROW EXECUTE FUNCTION notify_auth_invalidate();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS users_auth_invalidate ON users")
+    op.execute("DROP TRIGGER IF EXISTS user_roles_auth_invalidate ON user_roles")
+    op.execute("DROP TRIGGER IF EXISTS api_keys_auth_invalidate ON api_keys")
+    op.execute("DROP FUNCTION IF EXISTS notify_auth_invalidate")
@@ -0,0 +1,19 @@
+"""Index users by case-folded email for login lookups."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_02_users_email_lower"
+down_revision = "20261019_01_auth_notify"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # email ILIKE :value cannot use uq_users_email; lower(email) = :value can
+    op.execute("CREATE INDEX idx_users_email_lower ON users (lower(email))")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_users_email_lower")
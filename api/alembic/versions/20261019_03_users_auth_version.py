@@ -0,0 +1,74 @@
+"""Version users' authorisation state so session tokens can be revoked."""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261019_03_users_auth_version"
+down_revision = "20261019_02_users_email_lower"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("auth_version", sa.Integer(), nullable=False, server_default=sa.text("0")),
+    )
+    # Any role change bumps the version, whichever code path made it
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_user_auth_version() RETURNS trigger AS $$
+        BEGIN
+          IF TG_OP = 'DELETE' THEN
+            UPDATE users SET auth_version = auth_version + 1 WHERE id = OLD.user_id;
+          ELSE
+            UPDATE users SET auth_version = auth_version + 1 WHERE id = NEW.user_id;
+            IF TG_OP = 'UPDATE' AND OLD.user_id <> NEW.user_id THEN
+              UPDATE users SET auth_version = auth_version + 1 WHERE id = OLD.user_id;
+            END IF;
+          END IF;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER user_roles_auth_version
+        AFTER INSERT OR UPDATE OR DELETE ON user_roles
+        FOR EACH ROW EXECUTE FUNCTION bump_user_auth_version();
+        """
+    )
+    # Workers track the newest version per user to reject older tokens
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_auth_version() RETURNS trigger AS $$
+        BEGIN
+          PERFORM pg_notify(
+            'auth_invalidate',
+            'ver:' || NEW.id::text || ':' || NEW.auth_version::text
+          );
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER users_auth_version_notify
+        AFTER UPDATE ON users
+        FOR EACH ROW
+        WHEN (OLD.auth_version IS DISTINCT FROM NEW.auth_version)
+        EXECUTE FUNCTION notify_auth_version();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS users_auth_version_notify ON users")
+    op.execute("DROP FUNCTION IF EXISTS notify_auth_version")
+    op.execute("DROP TRIGGER IF EXISTS user_roles_auth_version ON user_roles")
+    op.execute("DROP FUNCTION IF EXISTS bump_user_auth_version")
+    op.drop_column("users", "auth_version")
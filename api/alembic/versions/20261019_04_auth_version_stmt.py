@@ -0,0 +1,90 @@
+"""Bump users.auth_version once per statement instead of once per role row."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_04_auth_version_stmt"
+down_revision = "20261019_03_users_auth_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Bulk provisioning inserts thousands of user_roles rows in one
+    # statement; transition tables let each statement bump every affected
+    # user exactly once with a single UPDATE.
+    op.execute("DROP TRIGGER IF EXISTS user_roles_auth_version ON user_roles")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_user_auth_version() RETURNS trigger AS $$
+        BEGIN
+          IF TG_OP = 'INSERT' THEN
+            UPDATE users SET auth_version = auth_version + 1
+            WHERE id IN (SELECT user_id FROM new_rows);
+          ELSIF TG_OP = 'DELETE' THEN
+            UPDATE users SET auth_version = auth_version + 1
+            WHERE id IN (SELECT user_id FROM old_rows);
+          ELSE
+            UPDATE users SET auth_version = auth_version + 1
+            WHERE id IN (SELECT user_id FROM old_rows UNION SELECT user_id FROM new_rows);
+          END IF;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER user_roles_auth_version_insert
+        AFTER INSERT ON user_roles
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_user_auth_version();
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER user_roles_auth_version_update
+        AFTER UPDATE ON user_roles
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_user_auth_version();
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER user_roles_auth_version_delete
+        AFTER DELETE ON user_roles
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_user_auth_version();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS user_roles_auth_version_delete ON user_roles")
+    op.execute("DROP TRIGGER IF EXISTS user_roles_auth_version_update ON user_roles")
+    op.execute("DROP TRIGGER IF EXISTS user_roles_auth_version_insert ON user_roles")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_user_auth_version() RETURNS trigger AS $$
+        BEGIN
+          IF TG_OP = 'DELETE' THEN
+            UPDATE users SET auth_version = auth_version + 1 WHERE id = OLD.user_id;
+          ELSE
+            UPDATE users SET auth_version = auth_version + 1 WHERE id = NEW.user_id;
+            IF TG_OP = 'UPDATE' AND OLD.user_id <> NEW.user_id THEN
+              UPDATE users SET auth_version = auth_version + 1 WHERE id = OLD.user_id;
+            END IF;
+          END IF;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER user_roles_auth_version
+        AFTER INSERT OR UPDATE OR DELETE ON user_roles
+        FOR EACH ROW EXECUTE FUNCTION bump_user_auth_version();
+        """
+    )
@@ -0,0 +1,28 @@
+"""Shared counters for the IP-based rate limiter."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_05_rate_limit_counters"
+down_revision = "20261019_04_auth_version_stmt"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # UNLOGGED skips WAL: counters are rewritten every second and losing
+    # them on a crash only resets the current windows
+    op.execute(
+        """
+        CREATE UNLOGGED TABLE rate_limit_counters (
+            key TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            expires_at TIMESTAMPTZ NOT NULL
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS rate_limit_counters")
@@ -0,0 +1,52 @@
+"""Store idempotent responses as the exact bytes and headers that were sent."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_06_idempotency_bytes"
+down_revision = "20261019_05_rate_limit_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE idempotency_keys
+            ADD COLUMN response_bytes BYTEA,
+            ADD COLUMN response_headers JSONB,
+            ADD COLUMN response_encoding VARCHAR(16)
+        """
+    )
+    # Keep completed keys replayable across the upgrade
+    op.execute(
+        """
+        UPDATE idempotency_keys
+        SET response_bytes = convert_to(response_body::text, 'UTF8'),
+            response_headers = '[["content-type", "application/json"]]'::jsonb
+        WHERE response_body IS NOT NULL
+        """
+    )
+    op.execute("ALTER TABLE idempotency_keys DROP COLUMN response_body")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE idempotency_keys ADD COLUMN response_body JSONB")
+    op.execute(
+        """
+        UPDATE idempotency_keys
+        SET response_body = convert_from(response_bytes, 'UTF8')::jsonb
+        WHERE response_bytes IS NOT NULL
+          AND response_bytes <> ''::bytea
+          AND response_encoding IS NULL
+        """
+    )
+    op.execute(
+        """
+        ALTER TABLE idempotency_keys
+            DROP COLUMN response_bytes,
+            DROP COLUMN response_headers,
+            DROP COLUMN response_encoding
+        """
+    )
@@ -0,0 +1,110 @@
+"""Partition idempotency_keys by UTC day so expired keys go with whole partitions."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_07_idempotency_parts"
+down_revision = "20261019_06_idempotency_bytes"
+branch_labels = None
+depends_on = None
+
+COLUMNS = """
+    key, user_id, method, path, request_hash, status, response_status,
+    response_headers, response_bytes, response_encoding, created_at, completed_at
+"""
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE idempotency_keys RENAME TO idempotency_keys_old")
+    op.execute(
+        "ALTER TABLE idempotency_keys_old "
+        "RENAME CONSTRAINT idempotency_keys_pkey TO idempotency_keys_old_pkey"
+    )
+    op.execute("DROP INDEX IF EXISTS idx_idempotency_created")
+    # The day is a column rather than an expression on created_at because a
+    # partitioned table's primary key must contain its partition key
+    op.execute(
+        """
+        CREATE TABLE idempotency_keys (
+            key VARCHAR(255) NOT NULL,
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            method VARCHAR(10) NOT NULL,
+            path TEXT NOT NULL,
+            request_hash VARCHAR(64) NOT NULL,
+            status idempotency_status NOT NULL DEFAULT 'processing',
+            response_status INTEGER,
+            response_headers JSONB,
+            response_bytes BYTEA,
+            response_encoding VARCHAR(16),
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            created_on DATE NOT NULL DEFAULT ((NOW() AT TIME ZONE 'UTC')::date),
+            completed_at TIMESTAMPTZ,
+            PRIMARY KEY (key, user_id, created_on)
+        ) PARTITION BY RANGE (created_on)
+        """
+    )
+    # Yesterday's partition still holds live keys; tomorrow's is ready for midnight
+    op.execute(
+        """
+        DO $$
+        DECLARE
+          d date;
+        BEGIN
+          FOR offset_days IN -1..1 LOOP
+            d := (NOW() AT TIME ZONE 'UTC')::date + offset_days;
+            EXECUTE format(
+              'CREATE TABLE idempotency_keys_p%s PARTITION OF idempotency_keys FOR VALUES FROM (%L) TO (%L)',
+              to_char(d, 'YYYYMMDD'), d, d + 1
+            );
+          END LOOP;
+        END
+        $$;
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO idempotency_keys ({COLUMNS}, created_on)
+        SELECT {COLUMNS}, (created_at AT TIME ZONE 'UTC')::date
+        FROM idempotency_keys_old
+        WHERE created_at >= NOW() - INTERVAL '24 hours'
+        """
+    )
+    op.execute("DROP TABLE idempotency_keys_old")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE idempotency_keys RENAME TO idempotency_keys_new")
+    op.execute(
+        "ALTER TABLE idempotency_keys_new "
+        "RENAME CONSTRAINT idempotency_keys_pkey TO idempotency_keys_new_pkey"
+    )
+    op.execute(
+        """
+        CREATE TABLE idempotency_keys (
+            key VARCHAR(255) NOT NULL,
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            method VARCHAR(10) NOT NULL,
+            path TEXT NOT NULL,
+            request_hash VARCHAR(64) NOT NULL,
+            status idempotency_status NOT NULL DEFAULT 'processing',
+            response_status INTEGER,
+            response_headers JSONB,
+            response_bytes BYTEA,
+            response_encoding VARCHAR(16),
+            created_at TIMESTAMPTZ DEFAULT NOW(),
+            completed_at TIMESTAMPTZ,
+            PRIMARY KEY (key, user_id)
+        )
+        """
+    )
+    op.execute("CREATE INDEX idx_idempotency_created ON idempotency_keys (created_at)")
+    op.execute(
+        f"""
+        INSERT INTO idempotency_keys ({COLUMNS})
+        SELECT DISTINCT ON (key, user_id) {COLUMNS}
+        FROM idempotency_keys_new
+        ORDER BY key, user_id, created_at DESC
+        """
+    )
+    op.execute("DROP TABLE idempotency_keys_new")
@@ -0,0 +1,117 @@
+"""Range-partition activity_log by month on timestamp."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_08_activity_parts"
+down_revision = "20261019_07_idempotency_parts"
+branch_labels = None
+depends_on = None
+
+COLUMNS = """
+    id, timestamp, user_id, api_key_id, action, resource, resource_id,
+    request_id, ip_address, user_agent, extra_data
+"""
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE activity_log RENAME TO activity_log_old")
+    op.execute(
+        "ALTER TABLE activity_log_old RENAME CONSTRAINT activity_log_pkey TO activity_log_old_pkey"
+    )
+    op.execute("DROP INDEX idx_activity_resource")
+    op.execute("DROP INDEX idx_activity_user")
+    op.execute("DROP INDEX idx_activity_timestamp")
+    # The primary key must contain the partition key. Leading with timestamp
+    # lets it serve newest-first keyset pages, replacing idx_activity_timestamp
+    op.execute(
+        """
+        CREATE TABLE activity_log (
+            id UUID NOT NULL DEFAULT gen_random_uuid(),
+            timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+            api_key_id UUID REFERENCES api_keys(id) ON DELETE SET NULL,
+            action activity_action NOT NULL,
+            resource resource_type NOT NULL,
+            resource_id UUID NOT NULL,
+            request_id TEXT,
+            ip_address INET,
+            user_agent VARCHAR(512),
+            extra_data JSONB DEFAULT '{}'::jsonb,
+            PRIMARY KEY (timestamp, id)
+        ) PARTITION BY RANGE (timestamp)
+        """
+    )
+    op.execute(
+        "CREATE INDEX idx_activity_resource ON activity_log (resource, resource_id, timestamp)"
+    )
+    op.execute("CREATE INDEX idx_activity_user ON activity_log (user_id, timestamp)")
+    # One partition per UTC month from the oldest existing row through two
+    # months ahead; the maintenance task takes over from there
+    op.execute(
+        """
+        DO $$
+        DECLARE
+          m timestamptz;
+          last timestamptz := date_trunc('month', NOW(), 'UTC') + INTERVAL '2 months';
+        BEGIN
+          m := date_trunc(
+            'month', LEAST(COALESCE((SELECT MIN(timestamp) FROM activity_log_old), NOW()), NOW()), 'UTC'
+          );
+          WHILE m <= last LOOP
+            EXECUTE format(
+              'CREATE TABLE activity_log_p%s PARTITION OF activity_log FOR VALUES FROM (%L) TO (%L)',
+              to_char(m AT TIME ZONE 'UTC', 'YYYYMM'), m, m + INTERVAL '1 month'
+            );
+            m := m + INTERVAL '1 month';
+          END LOOP;
+        END
+        $$;
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO activity_log ({COLUMNS})
+        SELECT {COLUMNS} FROM activity_log_old
+        """
+    )
+    op.execute("DROP TABLE activity_log_old")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE activity_log RENAME TO activity_log_new")
+    op.execute(
+        "ALTER TABLE activity_log_new RENAME CONSTRAINT activity_log_pkey TO activity_log_new_pkey"
+    )
+    op.execute("DROP INDEX idx_activity_resource")
+    op.execute("DROP INDEX idx_activity_user")
+    op.execute(
+        """
+        CREATE TABLE activity_log (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+            api_key_id UUID REFERENCES api_keys(id) ON DELETE SET NULL,
+            action activity_action NOT NULL,
+            resource resource_type NOT NULL,
+            resource_id UUID NOT NULL,
+            request_id TEXT,
+            ip_address INET,
+            user_agent VARCHAR(512),
+            extra_data JSONB DEFAULT '{}'::jsonb
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX idx_activity_resource ON activity_log (resource, resource_id, timestamp)"
+    )
+    op.execute("CREATE INDEX idx_activity_user ON activity_log (user_id, timestamp)")
+    op.execute("CREATE INDEX idx_activity_timestamp ON activity_log (timestamp)")
+    op.execute(
+        f"""
+        INSERT INTO activity_log ({COLUMNS})
+        SELECT {COLUMNS} FROM activity_log_new
+        """
+    )
+    op.execute("DROP TABLE activity_log_new")
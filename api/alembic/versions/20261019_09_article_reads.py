@@ -0,0 +1,41 @@
+"""Hourly article read rollups and the key sets behind their distinct counts."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_09_article_reads"
+down_revision = "20261019_08_activity_parts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE article_read_hours (
+            article_id UUID NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+            hour TIMESTAMPTZ NOT NULL,
+            reads BIGINT NOT NULL DEFAULT 0,
+            distinct_keys INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (article_id, hour)
+        )
+        """
+    )
+    # Only needed while an hour can still receive reads; leading with hour
+    # makes pruning a range delete
+    op.execute(
+        """
+        CREATE TABLE article_read_keys (
+            hour TIMESTAMPTZ NOT NULL,
+            article_id UUID NOT NULL,
+            api_key_id UUID NOT NULL,
+            PRIMARY KEY (hour, article_id, api_key_id)
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS article_read_keys")
+    op.execute("DROP TABLE IF EXISTS article_read_hours")
@@ -0,0 +1,35 @@
+"""Index activity_log for filtered newest-first pages by user, key and resource."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_10_activity_filters"
+down_revision = "20261019_09_article_reads"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Trailing id matches the (timestamp, id) keyset order, so a filtered
+    # page is read straight off the index with no sort
+    op.execute("DROP INDEX idx_activity_user")
+    op.execute("DROP INDEX idx_activity_resource")
+    op.execute("CREATE INDEX idx_activity_user ON activity_log (user_id, timestamp, id)")
+    op.execute(
+        "CREATE INDEX idx_activity_resource ON activity_log (resource, resource_id, timestamp, id)"
+    )
+    op.execute(
+        "CREATE INDEX idx_activity_api_key ON activity_log (api_key_id, timestamp, id) "
+        "WHERE api_key_id IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX idx_activity_api_key")
+    op.execute("DROP INDEX idx_activity_resource")
+    op.execute("DROP INDEX idx_activity_user")
+    op.execute(
+        "CREATE INDEX idx_activity_resource ON activity_log (resource, resource_id, timestamp)"
+    )
+    op.execute("CREATE INDEX idx_activity_user ON activity_log (user_id, timestamp)")
@@ -0,0 +1,20 @@
+"""Index bulletin_follows by post for comment fan-out."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_11_follows_by_post"
+down_revision = "20261019_10_activity_filters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The primary key leads with user_id; fan-out selects a post's followers.
+    # Including user_id makes that an index-only scan
+    op.execute("CREATE INDEX idx_bulletin_follows_post ON bulletin_follows (post_id, user_id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_bulletin_follows_post")
@@ -0,0 +1,40 @@
+"""Publish new notifications per recipient over NOTIFY for inbox streams."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_12_inbox_notify"
+down_revision = "20261019_11_follows_by_post"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Statement-level with a transition table: a fan-out to thousands of
+    # followers runs the trigger once and publishes one message per
+    # recipient, delivered when the inserting transaction commits
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_inbox() RETURNS trigger AS $$
+        BEGIN
+          PERFORM pg_notify('inbox', user_id::text)
+          FROM (SELECT DISTINCT user_id FROM new_notifications) recipients;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER notifications_inbox_notify
+        AFTER INSERT ON notifications
+        REFERENCING NEW TABLE AS new_notifications
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inbox();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS notifications_inbox_notify ON notifications")
+    op.execute("DROP FUNCTION IF EXISTS notify_inbox")
@@ -0,0 +1,133 @@
+"""Per-user inbox counters maintained by triggers on notifications."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_13_inbox_counters"
+down_revision = "20261019_12_inbox_notify"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE inbox_counters (
+            user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            unread INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            latest_at TIMESTAMPTZ
+        )
+        """
+    )
+    # Statement-level triggers see every affected row at once, so a fan-out
+    # to thousands of followers is one grouped upsert. Inserts lock counter
+    # rows in user_id order so concurrent fan-outs cannot deadlock
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION inbox_counters_insert() RETURNS trigger AS $$
+        BEGIN
+          INSERT INTO inbox_counters AS c (user_id, unread, total, latest_at)
+          SELECT user_id,
+                 COUNT(*) FILTER (WHERE read_at IS NULL),
+                 COUNT(*),
+                 MAX(created_at)
+          FROM new_notifications
+          GROUP BY user_id
+          ORDER BY user_id
+          ON CONFLICT (user_id) DO UPDATE SET
+            unread = c.unread + EXCLUDED.unread,
+            total = c.total + EXCLUDED.total,
+            latest_at = GREATEST(c.latest_at, EXCLUDED.latest_at);
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION inbox_counters_update() RETURNS trigger AS $$
+        BEGIN
+          UPDATE inbox_counters AS c
+          SET unread = c.unread + d.unread
+          FROM (
+            SELECT n.user_id,
+                   SUM((n.read_at IS NULL)::int - (o.read_at IS NULL)::int) AS unread
+            FROM new_notifications n
+            JOIN old_notifications o ON o.id = n.id
+            GROUP BY n.user_id
+          ) d
+          WHERE c.user_id = d.user_id AND d.unread <> 0;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    # latest_at is only recomputed when the newest notification went away
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION inbox_counters_delete() RETURNS trigger AS $$
+        BEGIN
+          UPDATE inbox_counters AS c
+          SET unread = c.unread - d.unread,
+              total = c.total - d.total,
+              latest_at = CASE WHEN d.latest_at >= c.latest_at THEN (
+                SELECT MAX(created_at) FROM notifications WHERE user_id = c.user_id
+              ) ELSE c.latest_at END
+          FROM (
+            SELECT user_id,
+                   COUNT(*) FILTER (WHERE read_at IS NULL) AS unread,
+                   COUNT(*) AS total,
+                   MAX(created_at) AS latest_at
+            FROM old_notifications
+            GROUP BY user_id
+          ) d
+          WHERE c.user_id = d.user_id;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER notifications_counters_insert
+        AFTER INSERT ON notifications
+        REFERENCING NEW TABLE AS new_notifications
+        FOR EACH STATEMENT EXECUTE FUNCTION inbox_counters_insert();
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER notifications_counters_update
+        AFTER UPDATE ON notifications
+        REFERENCING OLD TABLE AS old_notifications NEW TABLE AS new_notifications
+        FOR EACH STATEMENT EXECUTE FUNCTION inbox_counters_update();
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER notifications_counters_delete
+        AFTER DELETE ON notifications
+        REFERENCING OLD TABLE AS old_notifications
+        FOR EACH STATEMENT EXECUTE FUNCTION inbox_counters_delete();
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO inbox_counters (user_id, unread, total, latest_at)
+        SELECT user_id, COUNT(*) FILTER (WHERE read_at IS NULL), COUNT(*), MAX(created_at)
+        FROM notifications
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS notifications_counters_delete ON notifications")
+    op.execute("DROP TRIGGER IF EXISTS notifications_counters_update ON notifications")
+    op.execute("DROP TRIGGER IF EXISTS notifications_counters_insert ON notifications")
+    op.execute("DROP FUNCTION IF EXISTS inbox_counters_delete")
+    op.execute("DROP FUNCTION IF EXISTS inbox_counters_update")
+    op.execute("DROP FUNCTION IF EXISTS inbox_counters_insert")
+    op.execute("DROP TABLE IF EXISTS inbox_counters")
@@ -0,0 +1,187 @@
+"""Per-user read_through watermark: notifications created up to it count as read."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_14_inbox_read_through"
+down_revision = "20261019_13_inbox_counters"
+branch_labels = None
+depends_on = None
+
+
+def _unread(alias: str) -> str:
+    """A notification is unread when it has no read_at and is newer than the watermark."""
+    return f"{alias}.read_at IS NULL AND {alias}.created_at > COALESCE(k.read_through, '-infinity')"
+
+
+# Each trigger locks the affected counter rows (in user_id order) before
+# reading read_through in a later statement, so it always sees the watermark
+# that mark-all-read last committed
+LOCK_COUNTERS = """
+          PERFORM 1 FROM inbox_counters
+          WHERE user_id IN (SELECT user_id FROM {table})
+          ORDER BY user_id
+          FOR UPDATE;
+"""
+
+INSERT_FUNCTION = f"""
+        CREATE OR REPLACE FUNCTION inbox_counters_insert() RETURNS trigger AS $$
+        BEGIN
+          INSERT INTO inbox_counters (user_id)
+          SELECT DISTINCT user_id FROM new_notifications
+          ORDER BY user_id
+          ON CONFLICT (user_id) DO NOTHING;
+          {LOCK_COUNTERS.format(table="new_notifications")}
+          UPDATE inbox_counters AS c
+          SET unread = c.unread + d.unread,
+              total = c.total + d.total,
+              latest_at = GREATEST(c.latest_at, d.latest_at)
+          FROM (
+            SELECT n.user_id,
+                   COUNT(*) FILTER (WHERE {_unread("n")}) AS unread,
+                   COUNT(*) AS total,
+                   MAX(n.created_at) AS latest_at
+            FROM new_notifications n
+            JOIN inbox_counters k ON k.user_id = n.user_id
+            GROUP BY n.user_id
+          ) d
+          WHERE c.user_id = d.user_id;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+"""
+
+UPDATE_FUNCTION = f"""
+        CREATE OR REPLACE FUNCTION inbox_counters_update() RETURNS trigger AS $$
+        BEGIN
+          {LOCK_COUNTERS.format(table="new_notifications")}
+          UPDATE inbox_counters AS c
+          SET unread = c.unread + d.unread
+          FROM (
+            SELECT n.user_id,
+                   SUM(({_unread("n")})::int - ({_unread("o")})::int) AS unread
+            FROM new_notifications n
+            JOIN old_notifications o ON o.id = n.id
+            JOIN inbox_counters k ON k.user_id = n.user_id
+            GROUP BY n.user_id
+          ) d
+          WHERE c.user_id = d.user_id AND d.unread <> 0;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+"""
+
+DELETE_FUNCTION = f"""
+        CREATE OR REPLACE FUNCTION inbox_counters_delete() RETURNS trigger AS $$
+        BEGIN
+          {LOCK_COUNTERS.format(table="old_notifications")}
+          UPDATE inbox_counters AS c
+          SET unread = c.unread - d.unread,
+              total = c.total - d.total,
+              latest_at = CASE WHEN d.latest_at >= c.latest_at THEN (
+                SELECT MAX(created_at) FROM notifications WHERE user_id = c.user_id
+              ) ELSE c.latest_at END
+          FROM (
+            SELECT n.user_id,
+                   COUNT(*) FILTER (WHERE {_unread("n")}) AS unread,
+                   COUNT(*) AS total,
+                   MAX(n.created_at) AS latest_at
+            FROM old_notifications n
+            JOIN inbox_counters k ON k.user_id = n.user_id
+            GROUP BY n.user_id
+          ) d
+          WHERE c.user_id = d.user_id;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+"""
+
+# The 20261019_13 versions, which only look at read_at
+OLD_INSERT_FUNCTION = """
+        CREATE OR REPLACE FUNCTION inbox_counters_insert() RETURNS trigger AS $$
+        BEGIN
+          INSERT INTO inbox_counters AS c (user_id, unread, total, latest_at)
+          SELECT user_id,
+                 COUNT(*) FILTER (WHERE read_at IS NULL),
+                 COUNT(*),
+                 MAX(created_at)
+          FROM new_notifications
+          GROUP BY user_id
+          ORDER BY user_id
+          ON CONFLICT (user_id) DO UPDATE SET
+            unread = c.unread + EXCLUDED.unread,
+            total = c.total + EXCLUDED.total,
+            latest_at = GREATEST(c.latest_at, EXCLUDED.latest_at);
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+"""
+
+OLD_UPDATE_FUNCTION = """
+        CREATE OR REPLACE FUNCTION inbox_counters_update() RETURNS trigger AS $$
+        BEGIN
+          UPDATE inbox_counters AS c
+          SET unread = c.unread + d.unread
+          FROM (
+            SELECT n.user_id,
+                   SUM((n.read_at IS NULL)::int - (o.read_at IS NULL)::int) AS unread
+            FROM new_notifications n
+            JOIN old_notifications o ON o.id = n.id
+            GROUP BY n.user_id
+          ) d
+          WHERE c.user_id = d.user_id AND d.unread <> 0;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+"""
+
+OLD_DELETE_FUNCTION = """
+        CREATE OR REPLACE FUNCTION inbox_counters_delete() RETURNS trigger AS $$
+        BEGIN
+          UPDATE inbox_counters AS c
+          SET unread = c.unread - d.unread,
+              total = c.total - d.total,
+              latest_at = CASE WHEN d.latest_at >= c.latest_at THEN (
+                SELECT MAX(created_at) FROM notifications WHERE user_id = c.user_id
+              ) ELSE c.latest_at END
+          FROM (
+            SELECT user_id,
+                   COUNT(*) FILTER (WHERE read_at IS NULL) AS unread,
+                   COUNT(*) AS total,
+                   MAX(created_at) AS latest_at
+            FROM old_notifications
+            GROUP BY user_id
+          ) d
+          WHERE c.user_id = d.user_id;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE inbox_counters ADD COLUMN read_through TIMESTAMPTZ")
+    op.execute(INSERT_FUNCTION)
+    op.execute(UPDATE_FUNCTION)
+    op.execute(DELETE_FUNCTION)
+
+
+def downgrade() -> None:
+    # Spell the watermark out as per-row read_at before dropping it. The
+    # watermark-aware trigger leaves the counters alone, as these rows
+    # already count as read
+    op.execute(
+        """
+        UPDATE notifications AS n
+        SET read_at = c.read_through
+        FROM inbox_counters c
+        WHERE n.user_id = c.user_id
+          AND n.read_at IS NULL
+          AND n.created_at <= c.read_through
+        """
+    )
+    op.execute(OLD_INSERT_FUNCTION)
+    op.execute(OLD_UPDATE_FUNCTION)
+    op.execute(OLD_DELETE_FUNCTION)
+    op.execute("ALTER TABLE inbox_counters DROP COLUMN read_through")
@@ -0,0 +1,117 @@
+"""Coalesce unread notifications about the same thing into one row."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_15_inbox_coalesce"
+down_revision = "20261019_14_inbox_read_through"
+branch_labels = None
+depends_on = None
+
+COALESCE_KEY = "user_id, resource_type, resource_id, notification_type"
+
+
+def _unread(alias: str) -> str:
+    """A notification is unread when it has no read_at and is newer than the watermark."""
+    return f"{alias}.read_at IS NULL AND {alias}.created_at > COALESCE(k.read_through, '-infinity')"
+
+
+def _update_function(latest_at: bool) -> str:
+    """
+    inbox_counters_update(); with latest_at, folding an event into a row
+    (which moves its created_at forward) also advances latest_at.
+    """
+    set_latest = ", latest_at = GREATEST(c.latest_at, d.latest_at)" if latest_at else ""
+    moved = " OR d.latest_at > c.latest_at" if latest_at else ""
+    return f"""
+        CREATE OR REPLACE FUNCTION inbox_counters_update() RETURNS trigger AS $$
+        BEGIN
+          PERFORM 1 FROM inbox_counters
+          WHERE user_id IN (SELECT user_id FROM new_notifications)
+          ORDER BY user_id
+          FOR UPDATE;
+          UPDATE inbox_counters AS c
+          SET unread = c.unread + d.unread{set_latest}
+          FROM (
+            SELECT n.user_id,
+                   SUM(({_unread("n")})::int - ({_unread("o")})::int) AS unread,
+                   MAX(n.created_at) AS latest_at
+            FROM new_notifications n
+            JOIN old_notifications o ON o.id = n.id
+            JOIN inbox_counters k ON k.user_id = n.user_id
+            GROUP BY n.user_id
+          ) d
+          WHERE c.user_id = d.user_id AND (d.unread <> 0{moved});
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+    """
+
+
+def upgrade() -> None:
+    # Existing duplicates are folded into the newest row of each group; the
+    # older ones are marked read so the unique index below can be built
+    op.execute(
+        f"""
+        WITH grouped AS (
+          SELECT id,
+                 COUNT(*) OVER (PARTITION BY {COALESCE_KEY}) AS events,
+                 ROW_NUMBER() OVER (
+                   PARTITION BY {COALESCE_KEY} ORDER BY created_at DESC, id DESC
+                 ) AS position
+          FROM notifications
+          WHERE read_at IS NULL AND resource_id IS NOT NULL
+        ),
+        newest AS (
+          UPDATE notifications AS n
+          SET payload = COALESCE(n.payload, '{{}}'::jsonb) || jsonb_build_object('count', g.events)
+          FROM grouped g
+          WHERE n.id = g.id AND g.position = 1 AND g.events > 1
+        )
+        UPDATE notifications AS n
+        SET read_at = NOW()
+        FROM grouped g
+        WHERE n.id = g.id AND g.position > 1
+        """
+    )
+    op.execute(
+        f"""
+        CREATE UNIQUE INDEX idx_notifications_coalesce ON notifications ({COALESCE_KEY})
+        WHERE read_at IS NULL AND resource_id IS NOT NULL
+        """
+    )
+    op.execute(_update_function(latest_at=True))
+    # A coalesced event moves its row's created_at forward; publish those
+    # like inserts so open streams pick the row up again
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_inbox_coalesced() RETURNS trigger AS $$
+        BEGIN
+          PERFORM pg_notify('inbox', user_id::text)
+          FROM (
+            SELECT DISTINCT n.user_id
+            FROM new_notifications n
+            JOIN old_notifications o ON o.id = n.id
+            WHERE n.created_at > o.created_at
+          ) recipients;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER notifications_inbox_notify_coalesced
+        AFTER UPDATE ON notifications
+        REFERENCING OLD TABLE AS old_notifications NEW TABLE AS new_notifications
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inbox_coalesced();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS notifications_inbox_notify_coalesced ON notifications")
+    op.execute("DROP FUNCTION IF EXISTS notify_inbox_coalesced")
+    op.execute(_update_function(latest_at=False))
+    op.execute("DROP INDEX IF EXISTS idx_notifications_coalesce")
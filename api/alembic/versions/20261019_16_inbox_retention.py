@@ -0,0 +1,40 @@
+"""Notification retention: index by age and a compact archive table."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_16_inbox_retention"
+down_revision = "20261019_15_inbox_coalesce"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Lets each retention batch start at the oldest rows instead of scanning
+    op.execute("CREATE INDEX idx_notifications_created ON notifications (created_at)")
+    # Archived notifications keep what they were about and when, not their
+    # body or payload; read_at is when they were read, however that happened
+    op.execute(
+        """
+        CREATE TABLE notifications_archive (
+            id UUID PRIMARY KEY,
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            notification_type VARCHAR NOT NULL,
+            title TEXT NOT NULL,
+            resource_type VARCHAR,
+            resource_id UUID,
+            created_at TIMESTAMPTZ NOT NULL,
+            read_at TIMESTAMPTZ,
+            archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX idx_notifications_archive_user ON notifications_archive (user_id, created_at)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS notifications_archive")
+    op.execute("DROP INDEX IF EXISTS idx_notifications_created")
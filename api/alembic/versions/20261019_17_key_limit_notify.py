@@ -0,0 +1,34 @@
+"""Publish auth cache invalidations when an API key's rate limits change."""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261019_17_key_limit_notify"
+down_revision = "20261019_16_inbox_retention"
+branch_labels = None
+depends_on = None
+
+
+def _api_keys_trigger(columns: str) -> str:
+    return f"""
+        CREATE TRIGGER api_keys_auth_invalidate
+        AFTER UPDATE OF {columns} OR DELETE ON api_keys
+        FOR EACH ROW EXECUTE FUNCTION notify_auth_invalidate();
+    """
+
+
+def upgrade() -> None:
+    # Cached principals carry the key's budgets, so other workers must drop
+    # them when the limits change as well
+    op.execute("DROP TRIGGER IF EXISTS api_keys_auth_invalidate ON api_keys")
+    op.execute(
+        _api_keys_trigger(
+            "revoked_at, scopes, expires_at, user_id, rate_limit_reads, rate_limit_writes"
+        )
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS api_keys_auth_invalidate ON api_keys")
+    op.execute(_api_keys_trigger("revoked_at, scopes, expires_at, user_id"))
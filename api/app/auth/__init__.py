@@ -2,11 +2,12 @@
 
 from app.auth.api_key import generate_api_key, get_key_prefix, hash_api_key
 from app.auth.jwt import create_access_token, create_refresh_token, create_tokens, decode_token
-from app.auth.password import hash_password, verify_password
+from app.auth.password import hash_password, password_hasher, verify_password
 
 __all__ = [
     "hash_password",
     "verify_password",
+    "password_hasher",
     "generate_api_key",
     "hash_api_key",
     "get_key_prefix",
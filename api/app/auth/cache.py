@@ -0,0 +1,214 @@
+"""In-process cache of authenticated principals keyed by API key hash.
+
+Every authenticated request would otherwise load the API key, its user and
+the user's roles before any handler code runs. Entries are bounded (LRU) and
+expire after a TTL; writes that change who a key belongs to or what it may do
+(revocation, role changes, profile edits) invalidate explicitly.
+
+Other workers learn about those writes through Postgres NOTIFY: triggers on
+api_keys, user_roles and users publish on AUTH_INVALIDATE_CHANNEL when the
+writing transaction commits, and each worker's listener applies the payload.
+
+Session access tokens are never cached (they carry their own claims), but
+role changes bump users.auth_version and publish it on the same channel.
+The cache keeps each user's latest version (bounded and expiring like the
+principals) so tokens minted before a change are rejected. A user with no
+cached version is looked up once, so a worker that missed notifications
+while starting or reconnecting never trusts a stale token.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from uuid import UUID
+
+from app.auth.principal import AuthPrincipal
+from app.config import settings
+
+AUTH_INVALIDATE_CHANNEL = "auth_invalidate"
+
+
+@dataclass(slots=True)
+class _CacheEntry:
+    principal: AuthPrincipal
+    stored_at: float
+
+
+@dataclass(slots=True)
+class _VersionEntry:
+    version: int
+    stored_at: float
+
+
+class PrincipalCache:
+    """
+    Bounded TTL cache from HMAC key hash to an immutable principal snapshot.
+
+    Lookups that miss record the cache generation before querying the
+    database; any invalidation bumps the generation so a snapshot loaded
+    concurrently with a revocation is never stored.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._keys_by_user: dict[UUID, set[str]] = {}
+        self._auth_versions: OrderedDict[UUID, _VersionEntry] = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped on every invalidation."""
+        return self._generation
+
+    def get(self, key_hash: str) -> AuthPrincipal | None:
+        """Return a fresh cached principal, or None on miss/expiry."""
+        entry = self._entries.get(key_hash)
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.monotonic() - entry.stored_at > self.ttl_seconds:
+            self._remove(key_hash)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key_hash)
+        self.hits += 1
+        return entry.principal
+
+    def put(
+        self,
+        key_hash: str,
+        principal: AuthPrincipal,
+        generation: int,
+    ) -> None:
+        """Store a principal unless an invalidation happened since `generation`."""
+        if self.max_entries <= 0 or generation != self._generation:
+            return
+        if key_hash in self._entries:
+            self._remove(key_hash)
+        self._entries[key_hash] = _CacheEntry(principal, time.monotonic())
+        self._keys_by_user.setdefault(principal.user_id, set()).add(key_hash)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_key(self, key_hash: str) -> None:
+        """Drop a single API key's principal."""
+        self._generation += 1
+        self.invalidations += 1
+        self._remove(key_hash)
+
+    def invalidate_user(self, user_id: UUID) -> None:
+        """Drop every cached principal belonging to a user."""
+        self._generation += 1
+        self.invalidations += 1
+        for key_hash in list(self._keys_by_user.get(user_id, ())):
+            self._remove(key_hash)
+
+    def get_auth_version(self, user_id: UUID) -> int | None:
+        """Return a user's fresh cached auth version, or None on miss/expiry."""
+        entry = self._auth_versions.get(user_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.stored_at > self.ttl_seconds:
+            del self._auth_versions[user_id]
+            return None
+        self._auth_versions.move_to_end(user_id)
+        return entry.version
+
+    def note_auth_version(self, user_id: UUID, version: int, generation: int | None = None) -> None:
+        """
+        Record a user's current auth version; older session tokens become stale.
+
+        Versions only move forward. A version read from the database passes
+        the generation recorded before the read and is dropped if the cache
+        was invalidated meanwhile, as for put().
+        """
+        if self.max_entries <= 0 or (generation is not None and generation != self._generation):
+            return
+        entry = self._auth_versions.pop(user_id, None)
+        if entry is not None:
+            version = max(version, entry.version)
+        self._auth_versions[user_id] = _VersionEntry(version, time.monotonic())
+        while len(self._auth_versions) > self.max_entries:
+            self._auth_versions.popitem(last=False)
+
+    def apply_notification(self, payload: str) -> None:
+        """
+        Apply an invalidation published on AUTH_INVALIDATE_CHANNEL.
+
+        Payloads are "key:<key_hash>", "user:<user_id>" or
+        "ver:<user_id>:<auth_version>". Anything else clears the whole cache,
+        since we cannot tell what changed.
+        """
+        kind, _, value = payload.partition(":")
+        if kind == "key" and value:
+            self.invalidate_key(value)
+            return
+        if kind == "ver":
+            user_id, _, version = value.rpartition(":")
+            try:
+                self.note_auth_version(UUID(user_id), int(version))
+                return
+            except ValueError:
+                pass
+        if kind == "user":
+            try:
+                self.invalidate_user(UUID(value))
+                return
+            except ValueError:
+                pass
+        self.clear()
+
+    def clear(self) -> None:
+        """
+        Drop all entries and auth versions (counters are kept).
+
+        Forgotten versions are reloaded from the database on next use.
+        """
+        self._generation += 1
+        self._entries.clear()
+        self._keys_by_user.clear()
+        self._auth_versions.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        """Return counters for monitoring cache effectiveness."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "auth_versions": len(self._auth_versions),
+        }
+
+    def _remove(self, key_hash: str) -> None:
+        entry = self._entries.pop(key_hash, None)
+        if entry is None:
+            return
+        user_keys = self._keys_by_user.get(entry.principal.user_id)
+        if user_keys is not None:
+            user_keys.discard(key_hash)
+            if not user_keys:
+                del self._keys_by_user[entry.principal.user_id]
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.auth_cache_max_entries,
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+)
+
+
+def get_principal_cache() -> PrincipalCache:
+    """Get the global principal cache instance."""
+    return principal_cache
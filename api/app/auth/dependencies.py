@@ -3,35 +3,104 @@
 import datetime as dt
 import hmac
 import re
+from collections.abc import Callable
+from typing import Any, TypeVar
+from urllib.parse import urlsplit
 
-from fastapi import Depends, Header, HTTPException, status
+from fastapi import Cookie, Depends, Header, HTTPException, Request, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.auth.api_key import hash_api_key
+from app.auth.cache import principal_cache
+from app.auth.jwt import decode_token
+from app.auth.principal import AuthPrincipal
+from app.config import settings
 from app.database import get_db
 from app.models.user import APIKey, User
+from app.services.key_rate_limit import BucketType, RateLimitDecision, key_rate_limiter
+from app.services.last_seen import last_seen_recorder
 
-# Minimum interval between last_used_at updates to reduce write amplification
-LAST_USED_UPDATE_INTERVAL_SECONDS = 300  # 5 minutes
 API_KEY_PATTERN = re.compile(r"^ts_live_[0-9a-f]{64}$")
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+F = TypeVar("F", bound=Callable[..., Any])
 
 
 async def get_current_user(
+    request: Request,
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
+    access_token: str | None = Cookie(default=None),
     db: AsyncSession = Depends(get_db),
-) -> tuple[User, APIKey]:
+) -> AuthPrincipal:
     """
-    Validate API key and return the authenticated user and API key.
+    Authenticate an API key or a session cookie and return the principal.
+
+    The principal is an immutable snapshot of the user (id, username, roles)
+    and the credential's scopes. An X-API-Key header wins when both are
+    sent. API key snapshots are served from the in-process principal cache
+    when possible; session requests are authorised from the access token's
+    signed claims alone, so neither path usually touches the database.
 
-    Returns a tuple of (User, APIKey) so endpoints can access both
-    the user info and the specific API key's scopes.
+    Session writes must come from this site or a configured CORS origin.
+    Requests are charged against the key's read or write budget, or for
+    sessions the user's.
 
     Raises:
-        HTTPException: 401 if API key is missing, invalid, or revoked
+        HTTPException: 401 if the credential is missing, invalid, revoked or stale
+        HTTPException: 403 if a session write comes from another origin
+        HTTPException: 429 if the budget is exhausted
+    """
+    principal = await authenticate(x_api_key, access_token, db)
+    if principal.api_key_id is None and request.method not in SAFE_METHODS:
+        _check_session_origin(request)
+    _charge_rate_limit(request, principal)
+    return principal
+
+
+def _check_session_origin(request: Request) -> None:
+    """
+    Reject cookie-authenticated writes sent from another site (CSRF).
+
+    The cookie is SameSite=Strict; as a second line, the Origin header (or
+    the Referer's origin when a browser omits it) must be this site or one
+    of the CORS origins. Requests carrying neither are refused.
+    """
+    origin = request.headers.get("origin")
+    if origin is None and (referer := request.headers.get("referer")):
+        parts = urlsplit(referer)
+        origin = f"{parts.scheme}://{parts.netloc}"
+    own_origin = f"{request.url.scheme}://{request.url.netloc}"
+    if origin != own_origin and origin not in settings.cors_origins_list:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                "error": {
+                    "code": "CSRF_FAILED",
+                    "message": "Cross-origin request with session cookie refused",
+                }
+            },
+        )
+
+
+async def authenticate(
+    x_api_key: str | None,
+    access_token: str | None,
+    db: AsyncSession,
+) -> AuthPrincipal:
+    """
+    Resolve request credentials to a principal without charging any budget.
+
+    For callers outside the dependency system (ASGI middleware) that need to
+    know who is calling; endpoints use get_current_user.
+
+    Raises:
+        HTTPException: 401 if the credential is missing, invalid, revoked or stale
     """
     if not x_api_key:
+        if access_token:
+            return await _session_principal(access_token, db)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={
@@ -42,6 +111,11 @@ async def get_current_user(
             },
         )
 
+    return await _api_key_principal(x_api_key, db)
+
+
+async def _api_key_principal(x_api_key: str, db: AsyncSession) -> AuthPrincipal:
+    """Resolve an API key to its principal, from the cache when possible."""
     # Validate key format
     if not API_KEY_PATTERN.fullmatch(x_api_key):
         raise HTTPException(
@@ -56,7 +130,15 @@ async def get_current_user(
 
     # Hash the key and look it up
     key_hash = hash_api_key(x_api_key)
+    now = dt.datetime.now(dt.UTC)
+
+    principal = principal_cache.get(key_hash)
+    if principal is not None:
+        _check_expiry(principal, now)
+        last_seen_recorder.record(principal.api_key_id, principal.user_id, now)
+        return principal
 
+    generation = principal_cache.generation
     result = await db.execute(
         select(APIKey)
         .options(selectinload(APIKey.user).selectinload(User.roles))
@@ -80,82 +162,236 @@ async def get_current_user(
             },
         )
 
-    # Check expiration if set
-    now = dt.datetime.now(dt.UTC)
-    if api_key.expires_at is not None:
-        if api_key.expires_at < now:
+    principal = AuthPrincipal.from_models(api_key.user, api_key)
+    _check_expiry(principal, now)
+
+    # last_used_at / last_seen_at are written behind, outside this transaction
+    last_seen_recorder.record(principal.api_key_id, principal.user_id, now)
+
+    principal_cache.put(key_hash, principal, generation)
+    return principal
+
+
+def rate_limit_bucket(bucket_type: BucketType) -> Callable[[F], F]:
+    """
+    Charge an endpoint to `bucket_type` whatever its HTTP method.
+
+    For POST endpoints that only read, such as batch reads whose slugs do
+    not fit in a query string.
+    """
+
+    def mark(endpoint: F) -> F:
+        endpoint.rate_limit_bucket = bucket_type  # type: ignore[attr-defined]
+        return endpoint
+
+    return mark
+
+
+def charge_rate_limit(request: Request, principal: AuthPrincipal, cost: int) -> None:
+    """
+    Charge `cost` more units to the budget this request was charged to.
+
+    get_current_user already charged one unit; endpoints whose work grows
+    with the request (batch items, payload size) call this with the rest
+    once they know it, before doing the expensive part.
+
+    Raises:
+        HTTPException: 413 if the request costs more than the whole hourly
+            budget, so waiting would never let it through
+        HTTPException: 429 if the remaining budget cannot cover `cost`
+    """
+    if cost <= 0:
+        return
+    bucket_type = _rate_limit_bucket_type(request)
+    limit = _budget_limit(principal, bucket_type)
+    if limit is not None and cost + 1 > limit:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail={
+                "error": {
+                    "code": "REQUEST_TOO_COSTLY",
+                    "message": (
+                        f"Request costs {cost + 1} units, more than the hourly "
+                        f"{bucket_type} limit of {limit}"
+                    ),
+                }
+            },
+        )
+    _consume_rate_limit(request, principal, cost)
+
+
+def _charge_rate_limit(request: Request, principal: AuthPrincipal) -> None:
+    """
+    Charge one request to the read (GET/HEAD) or write budget.
+
+    The decision is kept on request.state so the response middleware can
+    emit X-RateLimit-* headers on every response, not just rejections.
+    """
+    _consume_rate_limit(request, principal, 1)
+
+
+def consume_rate_limit(
+    principal: AuthPrincipal, bucket_type: BucketType, cost: int = 1
+) -> RateLimitDecision | None:
+    """
+    Charge `cost` units to the principal's `bucket_type` budget.
+
+    API keys are charged to their own budget, sessions to the user's.
+    Returns the decision, or None when there is no such budget (unlimited
+    keys, rate limiting disabled). Does not raise; see rate_limit_exceeded.
+    """
+    limit = _budget_limit(principal, bucket_type)
+    if limit is None:
+        return None
+    return key_rate_limiter.consume(principal.rate_limit_id, bucket_type, limit, cost)
+
+
+def _budget_limit(principal: AuthPrincipal, bucket_type: BucketType) -> int | None:
+    """The principal's hourly `bucket_type` limit, or None when it is not limited."""
+    if not settings.rate_limit_enabled:
+        return None
+    return principal.rate_limit_reads if bucket_type == "read" else principal.rate_limit_writes
+
+
+def rate_limit_exceeded(decision: RateLimitDecision, bucket_type: BucketType) -> HTTPException:
+    """The 429 for a rejected decision."""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail={
+            "error": {
+                "code": "RATE_LIMITED",
+                "message": f"{bucket_type.capitalize()} rate limit exceeded",
+            }
+        },
+        headers=decision.headers(),
+    )
+
+
+def _consume_rate_limit(request: Request, principal: AuthPrincipal, cost: int) -> None:
+    bucket_type = _rate_limit_bucket_type(request)
+    decision = consume_rate_limit(principal, bucket_type, cost)
+    if decision is None:
+        return
+    request.state.rate_limit = decision
+    if not decision.allowed:
+        raise rate_limit_exceeded(decision, bucket_type)
+
+
+def _rate_limit_bucket_type(request: Request) -> BucketType:
+    """The endpoint's declared bucket, else read for GET/HEAD/OPTIONS and write otherwise."""
+    declared = getattr(request.scope.get("endpoint"), "rate_limit_bucket", None)
+    if declared is not None:
+        return declared
+    return "read" if request.method in ("GET", "HEAD", "OPTIONS") else "write"
+
+
+async def _session_principal(access_token: str, db: AsyncSession) -> AuthPrincipal:
+    """
+    Build a principal from an access-token cookie.
+
+    Tokens minted before the user's latest role change (auth_version) are
+    rejected so the client refreshes and picks up the new roles. The version
+    comes from the principal cache; only a miss queries the database.
+    """
+    payload = decode_token(access_token)
+    principal = None
+    if payload is not None and payload.get("type") == "access":
+        principal = AuthPrincipal.from_claims(payload)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "error": {
+                    "code": "UNAUTHORIZED",
+                    "message": "Invalid or expired access token",
+                }
+            },
+        )
+
+    current_version = principal_cache.get_auth_version(principal.user_id)
+    if current_version is None:
+        generation = principal_cache.generation
+        current_version = await db.scalar(
+            select(User.auth_version).where(User.id == principal.user_id)
+        )
+        if current_version is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail={
                     "error": {
                         "code": "UNAUTHORIZED",
-                        "message": "API key has expired",
+                        "message": "Invalid or expired access token",
                     }
                 },
             )
+        principal_cache.note_auth_version(principal.user_id, current_version, generation)
 
-    # Sampled last_used_at update to reduce write amplification
-    # Only update if more than 5 minutes since last update
-    last_used_at = api_key.last_used_at
-    if last_used_at is None:
-        api_key.last_used_at = now
-    else:
-        last_used_utc = (
-            last_used_at.astimezone(dt.UTC)
-            if last_used_at.tzinfo is not None
-            else last_used_at.replace(tzinfo=dt.UTC)
+    if principal.auth_version < current_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "error": {
+                    "code": "UNAUTHORIZED",
+                    "message": "Access token is stale, refresh required",
+                }
+            },
         )
-        if (now - last_used_utc).total_seconds() > LAST_USED_UPDATE_INTERVAL_SECONDS:
-            api_key.last_used_at = now
 
-    return api_key.user, api_key
+    last_seen_recorder.record(None, principal.user_id, dt.datetime.now(dt.UTC))
+    return principal
+
+
+def _check_expiry(principal: AuthPrincipal, now: dt.datetime) -> None:
+    """Reject principals whose API key has passed its expiry."""
+    if principal.key_expires_at is not None and principal.key_expires_at < now:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "error": {
+                    "code": "UNAUTHORIZED",
+                    "message": "API key has expired",
+                }
+            },
+        )
 
 
-def get_effective_scopes(user: User, api_key: APIKey) -> set[str]:
+def get_effective_scopes(principal: AuthPrincipal) -> set[str]:
     """Compute effective scopes as intersection of key scopes and current user roles."""
-    user_roles = {role.role for role in user.roles}
-    key_scopes = set(api_key.scopes or [])
-    return key_scopes & user_roles
+    return set(principal.effective_scopes)
 
 
 async def get_current_user_roles(
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> set[str]:
     """
     Get the set of roles for the current user.
 
     This returns the user's roles (not the API key's scopes).
     """
-    user, _ = auth
-    return {role.role for role in user.roles}
+    return set(principal.roles)
 
 
 async def get_api_key_scopes(
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> set[str]:
     """
     Get the set of scopes for the current API key.
 
     Returns effective scopes (API key scopes intersected with current user roles).
     """
-    user, api_key = auth
-    return get_effective_scopes(user, api_key)
+    return get_effective_scopes(principal)
 
 
 async def require_admin(
-    auth: tuple[User, APIKey] = Depends(get_current_user),
-) -> tuple[User, APIKey]:
+    principal: AuthPrincipal = Depends(get_current_user),
+) -> AuthPrincipal:
     """
     Require the authenticated user to have admin role.
 
     Raises:
         HTTPException: 403 if user doesn't have admin role
     """
-    user, api_key = auth
-    user_roles = {role.role for role in user.roles}
-    effective_scopes = get_effective_scopes(user, api_key)
-
-    if "admin" not in user_roles or "admin" not in effective_scopes:
+    if "admin" not in principal.roles or "admin" not in principal.effective_scopes:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={
@@ -166,4 +402,4 @@ async def require_admin(
             },
         )
 
-    return user, api_key
+    return principal
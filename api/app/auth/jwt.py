@@ -1,16 +1,23 @@
 """JWT token creation and validation for human sessions."""
 
 from datetime import datetime, timedelta, timezone
+from typing import Any
 
 from jose import jwt
 
 from app.config import settings
 
 
-def create_access_token(user_id: str) -> str:
-    """Create a short-lived access token (15 minutes)."""
+def create_access_token(user_id: str, claims: dict[str, Any] | None = None) -> str:
+    """
+    Create a short-lived access token (15 minutes).
+
+    `claims` (see AuthPrincipal.to_claims) carry the user's roles and auth
+    version so requests can be authorised from the token alone.
+    """
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
     payload = {
+        **(claims or {}),
         "sub": user_id,
         "exp": expire,
         "type": "access",
@@ -29,10 +36,10 @@ def create_refresh_token(user_id: str) -> str:
     return jwt.encode(payload, settings.jwt_secret, algorithm="HS256")
 
 
-def create_tokens(user_id: str) -> dict[str, str]:
+def create_tokens(user_id: str, claims: dict[str, Any] | None = None) -> dict[str, str]:
     """Create both access and refresh tokens."""
     return {
-        "access_token": create_access_token(user_id),
+        "access_token": create_access_token(user_id, claims),
         "refresh_token": create_refresh_token(user_id),
     }
 
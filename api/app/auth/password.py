@@ -1,9 +1,41 @@
-"""Password hashing utilities using passlib with bcrypt."""
+"""Password hashing utilities using passlib with bcrypt.
 
+bcrypt is deliberately slow (~100-300 ms per call), so request handlers must
+not call it on the event loop. `password_hasher` runs hashing and
+verification on a small dedicated thread pool (bcrypt releases the GIL) and
+refuses work with a 503 once too many calls are already queued, so a burst of
+logins degrades into fast rejections instead of stalling every other request.
+
+The bcrypt cost is picked at startup: `calibrate_bcrypt_rounds` measures the
+current hardware and chooses the highest cost that stays within a latency
+target. Stored hashes below that cost report `needs_update` and are rehashed
+on the next successful login. Hashes above it are kept: workers on hosts
+under different load can calibrate to different costs, and rehashing in
+both directions would rewrite the same hash back and forth between them.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+T = TypeVar("T")
+
+CALIBRATION_PASSWORD = "bcrypt-calibration"
+
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt."""
@@ -13,3 +45,197 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Whether a stored hash uses a cost below the configured one."""
+    return pwd_context.needs_update(hashed_password)
+
+
+def set_bcrypt_rounds(rounds: int) -> None:
+    """Hash with `rounds` and treat only lower costs as needing an update."""
+    pwd_context.update(
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=pwd_context.handler("bcrypt").max_rounds,
+    )
+
+
+def time_bcrypt_hash(rounds: int) -> float:
+    """Return the wall time in milliseconds of one bcrypt hash at `rounds`."""
+    handler = pwd_context.handler("bcrypt").using(rounds=rounds)
+    started = time.perf_counter()
+    handler.hash(CALIBRATION_PASSWORD)
+    return (time.perf_counter() - started) * 1000
+
+
+def calibrate_bcrypt_rounds(target_ms: float, min_rounds: int, max_rounds: int) -> tuple[int, float]:
+    """
+    Pick the highest bcrypt cost whose hash time stays within `target_ms`.
+
+    Each extra round doubles the work, so one measurement at `min_rounds`
+    predicts the rest; the chosen cost is then measured to confirm it and
+    stepped down if it overshoots. Never goes below `min_rounds`, even on
+    hardware too slow to meet the target.
+
+    Returns (rounds, measured milliseconds per hash).
+    """
+    # Best of two, so a cold first call does not drag the estimate down
+    base_ms = min(time_bcrypt_hash(min_rounds), time_bcrypt_hash(min_rounds))
+    if base_ms >= target_ms:
+        return min_rounds, base_ms
+
+    rounds = min(min_rounds + int(math.log2(target_ms / base_ms)), max_rounds)
+    measured_ms = time_bcrypt_hash(rounds)
+    while measured_ms > target_ms and rounds > min_rounds:
+        rounds -= 1
+        measured_ms = time_bcrypt_hash(rounds)
+    return rounds, measured_ms
+
+
+class PasswordHasher:
+    """Bounded worker pool for bcrypt calls made from async handlers."""
+
+    def __init__(self, max_workers: int, max_queue: int, retry_after_seconds: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after_seconds = retry_after_seconds
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+        self.bcrypt_rounds: int = pwd_context.handler("bcrypt").default_rounds
+        self.bcrypt_hash_ms: float | None = None
+
+    @property
+    def capacity(self) -> int:
+        """Maximum calls running or queued before new ones are rejected."""
+        return self.max_workers + self.max_queue
+
+    async def hash(self, password: str) -> str:
+        """Hash a password off the event loop."""
+        return await self._submit(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password off the event loop."""
+        return await self._submit(verify_password, plain_password, hashed_password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        """Whether a stored hash should be replaced (cheap, no hashing)."""
+        return password_needs_rehash(hashed_password)
+
+    def set_rounds(self, rounds: int, hash_ms: float | None = None) -> None:
+        """Pin the bcrypt cost used for new hashes."""
+        set_bcrypt_rounds(rounds)
+        self.bcrypt_rounds = rounds
+        self.bcrypt_hash_ms = hash_ms
+
+    async def calibrate(self, target_ms: float, min_rounds: int, max_rounds: int) -> int:
+        """Measure this host on the pool threads and pin the resulting cost."""
+        loop = asyncio.get_running_loop()
+        rounds, hash_ms = await loop.run_in_executor(
+            self._get_executor(),
+            calibrate_bcrypt_rounds,
+            target_ms,
+            min_rounds,
+            max_rounds,
+        )
+        self.set_rounds(rounds, hash_ms)
+        logger.info(
+            "Calibrated bcrypt cost to %d rounds (%.0f ms per hash, target %.0f ms)",
+            rounds,
+            hash_ms,
+            target_ms,
+        )
+        return rounds
+
+    def shutdown(self) -> None:
+        """Stop the worker threads (pending calls finish first)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict[str, int | float | None]:
+        """Return pool utilisation and wait-time counters."""
+        with self._lock:
+            active = self._active
+            in_flight = self._in_flight
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "active": active,
+            "queued": max(in_flight - active, 0),
+            "utilisation": active / self.max_workers if self.max_workers else 0.0,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": (self.total_wait_seconds / self.completed * 1000) if self.completed else 0.0,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+            "avg_run_ms": (self.total_run_seconds / self.completed * 1000) if self.completed else 0.0,
+            "bcrypt_rounds": self.bcrypt_rounds,
+            "bcrypt_hash_ms": self.bcrypt_hash_ms,
+        }
+
+    async def _submit(self, fn: Callable[..., T], *args: str) -> T:
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                busy = True
+            else:
+                self._in_flight += 1
+                busy = False
+        if busy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail={
+                    "error": {
+                        "code": "SERVICE_BUSY",
+                        "message": "Too many concurrent password operations, retry shortly",
+                    }
+                },
+                headers={"Retry-After": str(self.retry_after_seconds)},
+            )
+
+        submitted = time.perf_counter()
+
+        def run() -> tuple[T, float, float]:
+            started = time.perf_counter()
+            with self._lock:
+                self._active += 1
+            try:
+                return fn(*args), started - submitted, time.perf_counter() - started
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            result, waited, ran = await loop.run_in_executor(self._get_executor(), run)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        self.completed += 1
+        self.total_wait_seconds += waited
+        self.total_run_seconds += ran
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return result
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hasher",
+            )
+        return self._executor
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+    retry_after_seconds=settings.password_hash_retry_after_seconds,
+)
@@ -0,0 +1,122 @@
+"""Authenticated principal snapshot shared by auth dependencies and routers."""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from app.config import settings
+from app.models.user import APIKey, User
+
+
+@dataclass(frozen=True, slots=True)
+class AuthPrincipal:
+    """
+    Immutable view of the authenticated user and the credential they used.
+
+    API key principals are built once from the database and then served from
+    the principal cache. Session principals are rebuilt from signed
+    access-token claims on every request. Either way the snapshot must only
+    hold plain values (never ORM instances).
+
+    Session principals have no API key: `api_key_id` is None,
+    `key_scopes` equals the user's roles and the rate limits are the
+    configured per-user session budgets.
+    """
+
+    user_id: UUID
+    username: str
+    display_name: str | None
+    email: str | None
+    roles: frozenset[str]
+    api_key_id: UUID | None
+    key_scopes: frozenset[str]
+    key_expires_at: datetime | None
+    auth_version: int = 0
+    rate_limit_reads: int | None = None  # Per hour; None means unlimited
+    rate_limit_writes: int | None = None
+
+    @property
+    def effective_scopes(self) -> frozenset[str]:
+        """Key scopes intersected with the user's current roles."""
+        return self.key_scopes & self.roles
+
+    @property
+    def rate_limit_id(self) -> UUID:
+        """What budgets are charged to: the API key, or the user for sessions."""
+        return self.api_key_id or self.user_id
+
+    @property
+    def display(self) -> str:
+        """Name to show for content authored by this principal."""
+        return self.display_name or self.username
+
+    @classmethod
+    def from_models(cls, user: User, api_key: APIKey) -> "AuthPrincipal":
+        """Snapshot a loaded user (with roles) and API key."""
+        return cls(
+            user_id=user.id,
+            username=user.username,
+            display_name=user.display_name,
+            email=user.email,
+            roles=frozenset(role.role for role in user.roles),
+            api_key_id=api_key.id,
+            key_scopes=frozenset(api_key.scopes or []),
+            key_expires_at=api_key.expires_at,
+            auth_version=user.auth_version or 0,
+            rate_limit_reads=api_key.rate_limit_reads,
+            rate_limit_writes=api_key.rate_limit_writes,
+        )
+
+    @classmethod
+    def for_session(
+        cls,
+        user_id: UUID,
+        username: str,
+        display_name: str | None,
+        email: str | None,
+        roles: frozenset[str],
+        auth_version: int,
+    ) -> "AuthPrincipal":
+        """Principal for a human session; its authority is the user's roles."""
+        return cls(
+            user_id=user_id,
+            username=username,
+            display_name=display_name,
+            email=email,
+            roles=roles,
+            api_key_id=None,
+            key_scopes=roles,
+            key_expires_at=None,
+            auth_version=auth_version,
+            rate_limit_reads=settings.session_rate_limit_reads,
+            rate_limit_writes=settings.session_rate_limit_writes,
+        )
+
+    def to_claims(self) -> dict[str, Any]:
+        """Access-token claims that let from_claims rebuild this principal."""
+        return {
+            "username": self.username,
+            "name": self.display_name,
+            "email": self.email,
+            "roles": sorted(self.roles),
+            "ver": self.auth_version,
+        }
+
+    @classmethod
+    def from_claims(cls, payload: dict[str, Any]) -> "AuthPrincipal | None":
+        """Rebuild a session principal from a decoded access token, or None if malformed."""
+        try:
+            roles = payload["roles"]
+            if not isinstance(roles, list) or not isinstance(payload["ver"], int):
+                return None
+            return cls.for_session(
+                user_id=UUID(payload["sub"]),
+                username=payload["username"],
+                display_name=payload.get("name"),
+                email=payload.get("email"),
+                roles=frozenset(roles),
+                auth_version=payload["ver"],
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
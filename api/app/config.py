@@ -1,6 +1,7 @@
 """Application configuration using pydantic-settings."""
 
 from functools import lru_cache
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -28,6 +29,80 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 15
     refresh_token_expire_days: int = 7
 
+    # API key principal cache (per worker process)
+    auth_cache_ttl_seconds: float = 300.0
+    auth_cache_max_entries: int = 10000
+    # Propagate invalidations between workers via Postgres LISTEN/NOTIFY
+    auth_cache_notify_enabled: bool = True
+
+    # Write-behind flush interval for APIKey.last_used_at / User.last_seen_at
+    last_seen_flush_interval_seconds: float = 60.0
+
+    # Password hashing pool (bcrypt runs off the event loop)
+    password_hash_workers: int = 2
+    password_hash_max_queue: int = 16
+    password_hash_retry_after_seconds: int = 2
+    # bcrypt cost: calibrated at startup to the latency target unless pinned
+    bcrypt_rounds: int | None = None
+    bcrypt_target_ms: float = 250.0
+    bcrypt_min_rounds: int = 10
+    bcrypt_max_rounds: int = 16
+
+    # Completed idempotent writes replayed from memory (per worker process)
+    idempotency_cache_max_entries: int = 1024
+    idempotency_cache_max_body_bytes: int = 65536
+    # Stored idempotent responses at least this large are gzip-compressed
+    idempotency_compress_min_bytes: int = 1024
+    # How often day partitions of idempotency_keys are created and dropped
+    idempotency_partition_interval_seconds: float = 3600.0
+
+    # Activity log writer: events are queued per worker and COPY'd in batches.
+    # When the queue is full: block the request (dropping the event after
+    # activity_log_block_timeout_seconds), drop the event, or sample (keep
+    # activity_log_overflow_sample_rate of new events once half full)
+    activity_log_batch_size: int = 500
+    activity_log_flush_interval_seconds: float = 1.0
+    activity_log_max_queue: int = 20000
+    activity_log_overflow: Literal["block", "drop", "sample"] = "sample"
+    activity_log_overflow_sample_rate: float = 0.1
+    activity_log_block_timeout_seconds: float = 1.0
+    # A batch failing this many times is written event by event; events that
+    # still fail are logged and dropped
+    activity_log_max_attempts: int = 3
+    # Fraction of "read" events audited, per resource (others are always audited).
+    # Exact article read counts are kept separately by the read rollup
+    activity_log_read_sample_rates: dict[str, float] = {"article": 0.01, "profile": 0.01}
+    # activity_log is range-partitioned on timestamp by "day", "week" or "month".
+    # Partitions are created this many periods ahead and dropped whole once they
+    # end more than activity_log_retention_days ago
+    activity_log_partition_unit: Literal["day", "week", "month"] = "month"
+    activity_log_partitions_ahead: int = 2
+    activity_log_retention_days: int = 180
+    activity_log_partition_interval_seconds: float = 3600.0
+
+    # Hourly article read counters, accumulated per worker and upserted in batches
+    read_rollup_flush_interval_seconds: float = 10.0
+    # Keys behind distinct_keys are kept while late reads for an hour may arrive
+    read_rollup_key_retention_hours: int = 48
+
+    # Inbox SSE streams: comment heartbeat interval, and how long a stream may
+    # stay open before the client must reconnect (re-authenticating)
+    inbox_stream_heartbeat_seconds: float = 15.0
+    inbox_stream_max_seconds: float = 3600.0
+
+    # Recount per-user inbox counters (trigger-maintained) to repair any drift
+    inbox_counter_repair_interval_seconds: float = 86400.0
+    inbox_counter_repair_batch_size: int = 500
+
+    # Read notifications older than this are deleted, or moved to
+    # notifications_archive ("archive"), in batches of inbox_retention_batch_size.
+    # With inbox_retention_dry_run the job only counts what it would remove
+    inbox_retention_days: int = 90
+    inbox_retention_mode: Literal["delete", "archive"] = "delete"
+    inbox_retention_batch_size: int = 1000
+    inbox_retention_interval_seconds: float = 3600.0
+    inbox_retention_dry_run: bool = False
+
     # CORS
     cors_origins: str = "http://localhost:3000"
 
@@ -35,6 +110,20 @@ class Settings(BaseSettings):
     register_rate_limit: str = "5/hour"
     login_rate_limit: str = "10/15minutes"
     api_key_create_rate_limit: str = "10/hour"
+    # IP limiter counters shared by all workers (pgbatch://) or per process (memory://)
+    rate_limit_storage_uri: str = "pgbatch://"
+    rate_limit_storage_flush_interval_seconds: float = 1.0
+    # Per-API-key read/write budgets (APIKey.rate_limit_reads/writes, per hour)
+    rate_limit_enabled: bool = True
+    rate_limit_sync_interval_seconds: float = 10.0
+    # Per-user budgets for session-cookie requests, per hour (enforced per worker)
+    session_rate_limit_reads: int = 1000
+    session_rate_limit_writes: int = 100
+    # Batch reads cost one unit per item requested; "bytes"/"tokens" also charge
+    # one unit per rate_limit_bytes/tokens_per_unit served when that is higher
+    rate_limit_payload_cost: Literal["items", "bytes", "tokens"] = "items"
+    rate_limit_bytes_per_unit: int = 65536
+    rate_limit_tokens_per_unit: int = 16384
 
     @property
     def cors_origins_list(self) -> list[str]:
@@ -15,9 +15,12 @@ from fastapi.responses import JSONResponse
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
+from app.auth.cache import AUTH_INVALIDATE_CHANNEL, principal_cache
+from app.auth.password import password_hasher
 from app.config import settings, validate_security_settings
 from app.database import init_db
-from app.middleware.rate_limit import limiter
+from app.middleware.idempotency import IdempotencyMiddleware
+from app.middleware.rate_limit import get_shared_storage, limiter
 
 # Import models to register them with Base.metadata
 from app.models import APIKey, User, UserRole  # noqa: F401
@@ -27,16 +30,64 @@ from app.routers.bulletin import router as bulletin_router
 from app.routers.inbox import router as inbox_router
 from app.routers.library import router as library_router
 from app.routers.users import router as users_router
+from app.services.activity import activity_partitions, activity_writer
+from app.services.idempotency import idempotency_partitions
+from app.services.inbox_counters import inbox_counter_repair
+from app.services.inbox_retention import inbox_retention
+from app.services.inbox_stream import INBOX_CHANNEL, inbox_broker
+from app.services.key_rate_limit import key_rate_limiter
+from app.services.last_seen import last_seen_recorder
+from app.services.listener import pg_listener
+from app.services.read_rollup import read_rollup
 
 
 @asynccontextmanager
-async def lifespan(app: FastAPI):  # noqa: ARG001
+async def lifespan(app: FastAPI):
     """Application lifespan handler for startup/shutdown."""
     validate_security_settings()
     # Startup: Ensure extensions and create tables if they don't exist
     await init_db()
+    if settings.bcrypt_rounds is not None:
+        password_hasher.set_rounds(settings.bcrypt_rounds)
+    else:
+        await password_hasher.calibrate(
+            settings.bcrypt_target_ms,
+            settings.bcrypt_min_rounds,
+            settings.bcrypt_max_rounds,
+        )
+    if settings.auth_cache_notify_enabled:
+        pg_listener.subscribe(AUTH_INVALIDATE_CHANNEL, principal_cache.apply_notification)
+        # Invalidations sent while disconnected are lost, so start cold
+        pg_listener.on_reconnect(principal_cache.clear)
+    pg_listener.subscribe(INBOX_CHANNEL, inbox_broker.apply_notification)
+    # Streams re-read on wake, so waking them all recovers anything missed
+    pg_listener.on_reconnect(inbox_broker.wake_all)
+    if pg_listener.has_subscriptions:
+        await pg_listener.start()
+    await idempotency_partitions.start()
+    await activity_partitions.start()
+    await activity_writer.start()
+    await last_seen_recorder.start()
+    await read_rollup.start()
+    await inbox_counter_repair.start()
+    await inbox_retention.start()
+    await key_rate_limiter.start()
+    if (limit_storage := get_shared_storage()) is not None:
+        await limit_storage.start()
     yield
     # Shutdown
+    if limit_storage is not None:
+        await limit_storage.stop()
+    await key_rate_limiter.stop()
+    await inbox_retention.stop()
+    await inbox_counter_repair.stop()
+    await read_rollup.stop()
+    await last_seen_recorder.stop()
+    await activity_writer.stop()
+    await activity_partitions.stop()
+    await idempotency_partitions.stop()
+    await pg_listener.stop()
+    password_hasher.shutdown()
 
 
 app = FastAPI(
@@ -55,6 +106,9 @@ app.state.limiter = limiter
 # Rate limit exceeded handler
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# X-Idempotency-Key handling for writes (innermost, so replays still get CORS headers)
+app.add_middleware(IdempotencyMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -86,6 +140,16 @@ async def add_request_id(request: Request, call_next):
     return response
 
 
+@app.middleware("http")
+async def add_rate_limit_headers(request: Request, call_next):
+    """Report the caller's remaining budget (charged during authentication)."""
+    response = await call_next(request)
+    decision = getattr(request.state, "rate_limit", None)
+    if decision is not None:
+        response.headers.update(decision.headers())
+    return response
+
+
 # --- Exception Handlers ---
 
 
@@ -0,0 +1,280 @@
+"""Idempotent retries for write requests, as a pure ASGI layer.
+
+Any POST/PATCH/DELETE carrying an X-Idempotency-Key is claimed in
+idempotency_keys before the route runs and its response is recorded when it
+finishes, so a bot that retries after a timeout gets the original response
+back instead of creating a second article, post or comment. Routes need no
+changes.
+
+Responses are buffered and recorded byte for byte before they are sent;
+replays send those bytes back unchanged. Only successful (< 400) responses
+are stored. Anything else made no change worth protecting, so the key is
+marked failed and a retry runs again; so is a request that raises or is
+cancelled (the client went away). Streamed responses are passed through
+as they are produced, not buffered, and release the key when they finish
+since they cannot be replayed.
+A replay does no write but is still a request: it is charged to the key's
+read budget, so retrying a completed write cannot bypass the rate limit.
+Auth endpoints are excluded because their responses carry credentials.
+"""
+
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from uuid import UUID
+
+import anyio
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth.dependencies import authenticate, consume_rate_limit, rate_limit_exceeded
+from app.database import get_db
+from app.services.idempotency import (
+    CachedResponse,
+    IdempotencyService,
+    idempotency_conflict,
+    replay_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "x-idempotency-key"
+REPLAYED_HEADER = "X-Idempotency-Replayed"
+IDEMPOTENT_METHODS = frozenset({"POST", "PATCH", "DELETE"})
+EXCLUDED_PATH_PREFIXES = ("/api/v1/auth/", "/api/v1/admin/bots")
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyMiddleware:
+    """Claim, record and replay X-Idempotency-Key writes around the app."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in IDEMPOTENT_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        key = headers.get(IDEMPOTENCY_HEADER)
+        path = scope["path"]
+        if not key or path.startswith(EXCLUDED_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await _send_error(
+                HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail={
+                        "error": {
+                            "code": "VALIDATION_ERROR",
+                            "message": f"X-Idempotency-Key must be at most {MAX_KEY_LENGTH} characters",
+                        }
+                    },
+                ),
+                scope,
+                receive,
+                send,
+            )
+            return
+
+        body = await _read_body(receive)
+        receive = _replay_body(body, receive)
+        method = scope["method"]
+        request_hash = IdempotencyService.hash_request_body(body)
+        claimed_at = time.time()
+
+        async with _session(scope) as db:
+            try:
+                principal = await authenticate(
+                    headers.get("x-api-key"),
+                    Request(scope).cookies.get("access_token"),
+                    db,
+                )
+            except HTTPException:
+                principal = None
+            if principal is not None:
+                claim = await _claim(db, principal.user_id, key, method, path, request_hash)
+
+        if principal is None:
+            # Let the route reject the credential as usual
+            await self.app(scope, receive, send)
+            return
+        user_id = principal.user_id
+        if isinstance(claim, HTTPException):
+            await _send_error(claim, scope, receive, send)
+            return
+        if isinstance(claim, CachedResponse):
+            decision = consume_rate_limit(principal, "read")
+            if decision is not None:
+                # Picked up by the X-RateLimit-* header middleware
+                scope.setdefault("state", {})["rate_limit"] = decision
+                if not decision.allowed:
+                    await _send_error(rate_limit_exceeded(decision, "read"), scope, receive, send)
+                    return
+            await _replay(claim, headers, send)
+            return
+
+        messages: list[Message] = []
+        streaming = False
+
+        async def capture(message: Message) -> None:
+            nonlocal streaming
+            if message["type"] == "http.response.body" and message.get("more_body", False):
+                # A streamed body is neither buffered nor stored
+                streaming = True
+            if streaming:
+                for buffered in messages:
+                    await send(buffered)
+                messages.clear()
+                await send(message)
+            else:
+                messages.append(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except BaseException:
+            # Including cancellation (client disconnect): release the key
+            with anyio.CancelScope(shield=True):
+                await _record(scope, key, user_id, None)
+            raise
+        if streaming:
+            await _record(scope, key, user_id, None)
+            return
+
+        start = next(m for m in messages if m["type"] == "http.response.start")
+        response = None
+        if start["status"] < 400:
+            response = CachedResponse.capture(
+                method=method,
+                path=path,
+                request_hash=request_hash,
+                status_code=start["status"],
+                headers=list(start.get("headers", [])),
+                body=b"".join(
+                    m.get("body", b"") for m in messages if m["type"] == "http.response.body"
+                ),
+                created_at=claimed_at,
+            )
+        await _record(scope, key, user_id, response)
+
+        for message in messages:
+            await send(message)
+
+
+async def _claim(
+    db: AsyncSession,
+    user_id: UUID,
+    key: str,
+    method: str,
+    path: str,
+    request_hash: str,
+) -> CachedResponse | HTTPException | None:
+    """
+    Claim the key for this request.
+
+    Returns None when the request should run, the response to replay when
+    it already completed, or the 409 to send.
+    """
+    cached = replay_cache.get(user_id, key)
+    if cached is not None:
+        return cached if cached.matches(method, path, request_hash) else idempotency_conflict()
+
+    try:
+        acquired, stored = await IdempotencyService(db).acquire_lock(
+            key, user_id, method, path, request_hash
+        )
+        await db.commit()
+    except HTTPException as exc:
+        await db.rollback()
+        return exc
+    if acquired:
+        return None
+
+    replay_cache.put(user_id, key, stored)
+    return stored
+
+
+async def _record(scope: Scope, key: str, user_id: UUID, response: CachedResponse | None) -> None:
+    """Mark the key completed with `response`, or failed when there is none."""
+    try:
+        async with _session(scope) as db:
+            service = IdempotencyService(db)
+            if response is None:
+                await service.fail(key, user_id)
+            else:
+                await service.complete(key, user_id, response)
+            await db.commit()
+    except Exception:
+        # The write already happened; a retry will see IDEMPOTENCY_IN_PROGRESS
+        logger.exception("Failed to record idempotency key outcome")
+        return
+    if response is not None:
+        replay_cache.put(user_id, key, response)
+
+
+@asynccontextmanager
+async def _session(scope: Scope) -> AsyncIterator[AsyncSession]:
+    """A session from get_db, honouring dependency overrides like the routes do."""
+    get_session = scope["app"].dependency_overrides.get(get_db, get_db)
+    sessions = get_session()
+    try:
+        yield await anext(sessions)
+    finally:
+        await sessions.aclose()
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay_body(body: bytes, receive: Receive) -> Receive:
+    """A receive callable that yields the already-read body once."""
+    sent = False
+
+    async def replay() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+async def _replay(cached: CachedResponse, request_headers: Headers, send: Send) -> None:
+    """Send a stored response verbatim."""
+    headers, body = cached.encoded(_accepts_gzip(request_headers.get("accept-encoding", "")))
+    headers.append((REPLAYED_HEADER.lower().encode("latin-1"), b"true"))
+    await send({"type": "http.response.start", "status": cached.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+async def _send_error(exc: HTTPException, scope: Scope, receive: Receive, send: Send) -> None:
+    response = JSONResponse(
+        {"detail": exc.detail},
+        status_code=exc.status_code,
+        headers=exc.headers,
+    )
+    await response(scope, receive, send)
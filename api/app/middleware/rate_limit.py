@@ -3,11 +3,25 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
+from app.config import settings
+
+# Registers the pgbatch:// storage scheme with limits
+from app.services.rate_limit_storage import PostgresCounterStorage
+
 # Create limiter instance with IP-based key function
 # Note: headers_enabled requires Response parameter on all rate-limited endpoints,
-# which is incompatible with our current setup. Rate limit headers would need
-# a custom middleware implementation for per-API-key rate limiting.
-limiter = Limiter(key_func=get_remote_address)
+# which is incompatible with our current setup. This limiter only guards the
+# unauthenticated auth endpoints; per-API-key budgets and their X-RateLimit-*
+# headers come from app.services.key_rate_limit.
+# Counters live in Postgres (pgbatch://) so limits hold across workers;
+# set RATE_LIMIT_STORAGE_URI=memory:// for per-process counters.
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=settings.rate_limit_storage_uri,
+    storage_options={
+        "flush_interval_seconds": settings.rate_limit_storage_flush_interval_seconds,
+    },
+)
 
 
 def get_limiter() -> Limiter:
@@ -15,6 +29,12 @@ def get_limiter() -> Limiter:
     return limiter
 
 
+def get_shared_storage() -> PostgresCounterStorage | None:
+    """Get the limiter's Postgres storage, if it is configured to use one."""
+    storage = limiter._storage
+    return storage if isinstance(storage, PostgresCounterStorage) else None
+
+
 def reset_limiter() -> None:
     """Reset the limiter storage. Used in tests to clear rate limit state."""
     if hasattr(limiter, "_limiter") and limiter._limiter:
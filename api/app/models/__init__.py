@@ -1,12 +1,12 @@
 """Database models for Third-Space API."""
 
 from app.models.activity import ActivityLog
-from app.models.article import Article, ArticleRevision
+from app.models.article import Article, ArticleReadHour, ArticleReadKey, ArticleRevision
 from app.models.bulletin import BulletinComment, BulletinFollow, BulletinPost
 from app.models.idempotency import IdempotencyKey
-from app.models.notification import Notification
+from app.models.notification import InboxCounter, Notification, NotificationArchive
 from app.models.profile import Profile
-from app.models.rate_limit import RateLimitBucket
+from app.models.rate_limit import RateLimitBucket, RateLimitCounter
 from app.models.user import APIKey, User, UserRole
 
 __all__ = [
@@ -16,11 +16,16 @@ __all__ = [
     "Profile",
     "Article",
     "ArticleRevision",
+    "ArticleReadHour",
+    "ArticleReadKey",
     "BulletinPost",
     "BulletinComment",
     "BulletinFollow",
     "Notification",
+    "InboxCounter",
+    "NotificationArchive",
     "IdempotencyKey",
     "ActivityLog",
     "RateLimitBucket",
+    "RateLimitCounter",
 ]
@@ -6,6 +6,7 @@ from sqlalchemy import (
     Enum,
     ForeignKey,
     Index,
+    PrimaryKeyConstraint,
     String,
     Text,
     text,
@@ -22,13 +23,14 @@ class ActivityLog(Base):
 
     Tracks read, create, update, delete operations on resources
     with HTTP context for compliance and debugging.
+
+    Range-partitioned on timestamp; the primary key leads with timestamp
+    because a partitioned table's key must contain the partition key.
     """
 
     __tablename__ = "activity_log"
 
-    id = Column(
-        PG_UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()")
-    )
+    id = Column(PG_UUID(as_uuid=True), nullable=False, server_default=text("gen_random_uuid()"))
     timestamp = Column(TIMESTAMP(timezone=True), server_default=text("NOW()"), nullable=False)
     user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"))
     api_key_id = Column(PG_UUID(as_uuid=True), ForeignKey("api_keys.id", ondelete="SET NULL"))
@@ -58,7 +60,15 @@ class ActivityLog(Base):
     user = relationship("User", foreign_keys=[user_id])
 
     __table_args__ = (
-        Index("idx_activity_resource", "resource", "resource_id", "timestamp"),
-        Index("idx_activity_user", "user_id", "timestamp"),
-        Index("idx_activity_timestamp", "timestamp"),
+        PrimaryKeyConstraint("timestamp", "id"),
+        Index("idx_activity_resource", "resource", "resource_id", "timestamp", "id"),
+        Index("idx_activity_user", "user_id", "timestamp", "id"),
+        Index(
+            "idx_activity_api_key",
+            "api_key_id",
+            "timestamp",
+            "id",
+            postgresql_where=text("api_key_id IS NOT NULL"),
+        ),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
     )
@@ -2,6 +2,7 @@
 
 from sqlalchemy import (
     TIMESTAMP,
+    BigInteger,
     CheckConstraint,
     Column,
     Computed,
@@ -91,3 +92,28 @@ class ArticleRevision(Base):
 
     article = relationship("Article", back_populates="revisions")
     editor = relationship("User", foreign_keys=[editor_id])
+
+
+class ArticleReadHour(Base):
+    """Exact read counts for an article in one UTC hour, rolled up in memory."""
+
+    __tablename__ = "article_read_hours"
+
+    article_id = Column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("articles.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    hour = Column(TIMESTAMP(timezone=True), primary_key=True)
+    reads = Column(BigInteger, nullable=False, server_default=text("0"))
+    distinct_keys = Column(Integer, nullable=False, server_default=text("0"))
+
+
+class ArticleReadKey(Base):
+    """API keys already counted in an ArticleReadHour.distinct_keys."""
+
+    __tablename__ = "article_read_keys"
+
+    hour = Column(TIMESTAMP(timezone=True), primary_key=True)
+    article_id = Column(PG_UUID(as_uuid=True), primary_key=True)
+    api_key_id = Column(PG_UUID(as_uuid=True), primary_key=True)
@@ -101,5 +101,9 @@ class BulletinFollow(Base):
     )
     created_at = Column(TIMESTAMP(timezone=True), server_default=text("NOW()"))
 
+    __table_args__ = (
+        Index("idx_bulletin_follows_post", post_id, user_id),
+    )
+
     post = relationship("BulletinPost", back_populates="follows")
     user = relationship("User", foreign_keys=[user_id])
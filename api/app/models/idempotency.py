@@ -3,10 +3,11 @@
 from sqlalchemy import (
     TIMESTAMP,
     Column,
+    Date,
     Enum,
     ForeignKey,
-    Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     text,
@@ -21,7 +22,12 @@ class IdempotencyKey(Base):
     Idempotency key tracking for write operations.
 
     Scoped by (key, user_id) to prevent cross-user collisions.
-    Stores response for replay on duplicate requests.
+    Stores the response exactly as sent (status, headers, body bytes,
+    gzip-compressed when large) for replay on duplicate requests.
+
+    Range-partitioned by created_on (UTC day of created_at). A key is live in
+    at most the last two partitions; older partitions are dropped whole
+    (see IdempotencyPartitions).
     """
 
     __tablename__ = "idempotency_keys"
@@ -40,11 +46,16 @@ class IdempotencyKey(Base):
         nullable=False,
         server_default=text("'processing'"),
     )
-    response_body = Column(JSONB)
+    response_bytes = Column(LargeBinary)
+    response_headers = Column(JSONB)  # [[name, value], ...] as sent
+    response_encoding = Column(String(16))  # "gzip" or NULL for identity
     response_status = Column(Integer)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=text("NOW()"))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("NOW()"))
+    created_on = Column(
+        Date,
+        primary_key=True,
+        server_default=text("((NOW() AT TIME ZONE 'UTC')::date)"),
+    )
     completed_at = Column(TIMESTAMP(timezone=True))
 
-    __table_args__ = (
-        Index("idx_idempotency_created", "created_at"),
-    )
+    __table_args__ = ({"postgresql_partition_by": "RANGE (created_on)"},)
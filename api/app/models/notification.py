@@ -5,6 +5,7 @@ from sqlalchemy import (
     Column,
     ForeignKey,
     Index,
+    Integer,
     String,
     Text,
     text,
@@ -37,12 +38,75 @@ class Notification(Base):
 
     __table_args__ = (
         Index("idx_notifications_user", user_id, created_at.desc()),
+        # Oldest-first walk for the retention job
+        Index("idx_notifications_created", created_at),
         Index(
             "idx_notifications_unread",
             user_id,
             created_at.desc(),
             postgresql_where=(read_at.is_(None)),
         ),
+        # At most one unread notification per recipient and subject; new
+        # events are folded into it (see app.services.notifications)
+        Index(
+            "idx_notifications_coalesce",
+            user_id,
+            resource_type,
+            resource_id,
+            notification_type,
+            unique=True,
+            postgresql_where=(read_at.is_(None) & resource_id.isnot(None)),
+        ),
     )
 
     user = relationship("User", foreign_keys=[user_id])
+
+
+class InboxCounter(Base):
+    """
+    Per-user notification counts, kept current by triggers on notifications.
+
+    Every insert, update and delete of notifications adjusts the recipient's
+    row in the same transaction, so the inbox summary is a primary-key read.
+    Notifications created at or before read_through count as read even when
+    their own read_at is unset; unread counts only the rest.
+    """
+
+    __tablename__ = "inbox_counters"
+
+    user_id = Column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    unread = Column(Integer, nullable=False, server_default=text("0"))
+    total = Column(Integer, nullable=False, server_default=text("0"))
+    latest_at = Column(TIMESTAMP(timezone=True))
+    read_through = Column(TIMESTAMP(timezone=True))
+
+
+class NotificationArchive(Base):
+    """
+    Compact copy of a notification removed by the retention job.
+
+    Only kept when inbox_retention_mode is "archive". read_at is when the
+    notification was read, individually or through the read watermark.
+    """
+
+    __tablename__ = "notifications_archive"
+
+    id = Column(PG_UUID(as_uuid=True), primary_key=True)
+    user_id = Column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    notification_type = Column(String, nullable=False)
+    title = Column(Text, nullable=False)
+    resource_type = Column(String)
+    resource_id = Column(PG_UUID(as_uuid=True))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    read_at = Column(TIMESTAMP(timezone=True))
+    archived_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("NOW()"))
+
+    __table_args__ = (Index("idx_notifications_archive_user", user_id, created_at),)
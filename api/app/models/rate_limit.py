@@ -7,6 +7,7 @@ from sqlalchemy import (
     ForeignKey,
     Integer,
     String,
+    Text,
     text,
 )
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
@@ -44,3 +45,18 @@ class RateLimitBucket(Base):
     )
 
     api_key = relationship("APIKey")
+
+
+class RateLimitCounter(Base):
+    """
+    Shared fixed-window counter backing the IP-based slowapi limiter.
+
+    UNLOGGED: counters are cheap to lose on a crash and are written often.
+    """
+
+    __tablename__ = "rate_limit_counters"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(Text, primary_key=True)
+    count = Column(Integer, nullable=False)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
@@ -6,9 +6,11 @@ from sqlalchemy import (
     CheckConstraint,
     Column,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
+    func,
     text,
 )
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
@@ -29,6 +31,9 @@ class User(Base):
     display_name = Column(Text)
     created_at = Column(TIMESTAMP(timezone=True), server_default=text("NOW()"))
     last_seen_at = Column(TIMESTAMP(timezone=True))
+    # Bumped by a trigger whenever the user's roles change; access tokens
+    # minted with an older version are rejected
+    auth_version = Column(Integer, nullable=False, server_default=text("0"))
 
     # Lockout tracking (auth_state fields embedded in users table)
     failed_login_count = Column(Integer, server_default=text("0"))
@@ -38,6 +43,7 @@ class User(Base):
 
     __table_args__ = (
         CheckConstraint("username ~ '^[a-z0-9_]{3,32}$'", name="ck_username_format"),
+        Index("idx_users_email_lower", func.lower(email)),
     )
 
     roles = relationship(
@@ -1,28 +1,75 @@
 """Admin router for user and system management."""
 
+import json
+from collections.abc import AsyncIterator
 from datetime import datetime, timezone
+from typing import Any
+from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select, update
+from fastapi.responses import StreamingResponse
+from sqlalchemy import ColumnElement, func, insert, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.auth.api_key import generate_api_key, get_key_prefix
+from app.auth.cache import principal_cache
 from app.auth.dependencies import require_admin
+from app.auth.password import password_hasher
+from app.auth.principal import AuthPrincipal
 from app.database import get_db
+from app.middleware.rate_limit import get_shared_storage
 from app.models.activity import ActivityLog
 from app.models.user import APIKey, User, UserRole
+from app.routers.auth import DEFAULT_ROLES
 from app.schemas.admin import (
     ActivityLogEntry,
+    ActivityPartitionStats,
+    ActivityWriterStats,
     AdminUserInfo,
+    AuthCacheStats,
+    BotIdentity,
+    BulkProvisionRequest,
+    BulkProvisionResponse,
+    IdempotencyCacheStats,
+    IdempotencyPartitionStats,
+    InboxCounterRepairStats,
+    InboxRetentionStats,
+    InboxStreamStats,
+    KeyRateLimitStats,
+    LastSeenStats,
+    LimitStorageStats,
     ListActivityResponse,
     ListUsersResponse,
+    PasswordHasherStats,
+    ProvisionConflict,
+    ProvisionedBot,
+    ReadRollupStats,
     RevokeKeysResponse,
+    SystemMetricsResponse,
     UpdateRolesRequest,
     UpdateRolesResponse,
 )
+from app.services.activity import (
+    ActionType,
+    ResourceType,
+    activity_partitions,
+    activity_writer,
+)
+from app.services.idempotency import idempotency_partitions, replay_cache
+from app.services.inbox_counters import inbox_counter_repair
+from app.services.inbox_retention import inbox_retention
+from app.services.inbox_stream import inbox_broker
+from app.services.key_rate_limit import key_rate_limiter
+from app.services.last_seen import last_seen_recorder
+from app.services.read_rollup import read_rollup
 
 router = APIRouter(prefix="/api/v1/admin", tags=["Admin"])
 
+# Rows fetched per round trip by the activity export's server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
 
 @router.get(
     "/users",
@@ -31,7 +78,7 @@ router = APIRouter(prefix="/api/v1/admin", tags=["Admin"])
 )
 async def list_users(
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_admin),
+    principal: AuthPrincipal = Depends(require_admin),
 ) -> ListUsersResponse:
     """
     List all users in the system.
@@ -70,7 +117,7 @@ async def update_user_roles(
     username: str,
     data: UpdateRolesRequest,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_admin),
+    principal: AuthPrincipal = Depends(require_admin),
 ) -> UpdateRolesResponse:
     """
     Update a user's roles.
@@ -105,9 +152,12 @@ async def update_user_roles(
         db.add(UserRole(user_id=user.id, role=role_name))
 
     await db.commit()
+    principal_cache.invalidate_user(user.id)
 
-    # Refresh to get updated roles
+    # Refresh to get updated roles; the role change bumped auth_version, so
+    # session tokens minted before it stop working on this worker right away
     await db.refresh(user)
+    principal_cache.note_auth_version(user.id, user.auth_version)
     result = await db.execute(
         select(User)
         .options(selectinload(User.roles))
@@ -130,7 +180,7 @@ async def update_user_roles(
 async def revoke_user_keys(
     username: str,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_admin),
+    principal: AuthPrincipal = Depends(require_admin),
 ) -> RevokeKeysResponse:
     """
     Revoke all API keys for a user.
@@ -167,6 +217,7 @@ async def revoke_user_keys(
     revoked_count = len(revoked_ids)
 
     await db.commit()
+    principal_cache.invalidate_user(user.id)
 
     return RevokeKeysResponse(
         username=username,
@@ -174,6 +225,181 @@ async def revoke_user_keys(
     )
 
 
+@router.post(
+    "/bots",
+    response_model=BulkProvisionResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def provision_bots(
+    data: BulkProvisionRequest,
+    db: AsyncSession = Depends(get_db),
+    principal: AuthPrincipal = Depends(require_admin),
+) -> BulkProvisionResponse:
+    """
+    Create password-less bot accounts, each with roles and an initial API key.
+
+    Requires admin role. Users, roles and keys are each inserted with one
+    set-based statement in a single transaction; bots have no password, so
+    no bcrypt work is done. Identities whose username or email is already
+    taken (or repeated in the request) are reported as conflicts instead of
+    failing the batch.
+
+    Returns the plaintext API keys - this is the only time they will be visible.
+    """
+    conflicts: list[ProvisionConflict] = []
+    candidates: list[BotIdentity] = []
+    usernames: set[str] = set()
+    emails: set[str] = set()
+    for bot in data.bots:
+        email = bot.email.lower() if bot.email else None
+        if bot.username in usernames or (email and email in emails):
+            conflicts.append(
+                ProvisionConflict(
+                    username=bot.username,
+                    code="DUPLICATE",
+                    message="Username or email repeated in request",
+                )
+            )
+            continue
+        usernames.add(bot.username)
+        if email:
+            emails.add(email)
+        candidates.append(bot)
+
+    # Existing identities in one query (email is case-insensitive)
+    result = await db.execute(
+        select(User.username, func.lower(User.email)).where(
+            or_(User.username.in_(usernames), func.lower(User.email).in_(emails))
+        )
+    )
+    taken = {value for row in result.all() for value in row if value}
+
+    new_bots: list[BotIdentity] = []
+    for bot in candidates:
+        if bot.username in taken or (bot.email and bot.email.lower() in taken):
+            conflicts.append(_provision_conflict(bot))
+        else:
+            new_bots.append(bot)
+
+    created: list[ProvisionedBot] = []
+    if new_bots:
+        # ON CONFLICT DO NOTHING skips identities created concurrently
+        result = await db.execute(
+            pg_insert(User)
+            .values(
+                [
+                    {
+                        "username": bot.username,
+                        "email": bot.email.lower() if bot.email else None,
+                        "display_name": bot.display_name,
+                    }
+                    for bot in new_bots
+                ]
+            )
+            .on_conflict_do_nothing()
+            .returning(User.id, User.username)
+        )
+        user_ids = {username: user_id for user_id, username in result.all()}
+
+        role_rows: list[dict[str, Any]] = []
+        key_rows: list[dict[str, Any]] = []
+        for bot in new_bots:
+            user_id = user_ids.get(bot.username)
+            if user_id is None:
+                conflicts.append(_provision_conflict(bot))
+                continue
+
+            roles = list(dict.fromkeys(bot.roles if bot.roles is not None else DEFAULT_ROLES))
+            role_rows.extend(
+                {"user_id": user_id, "role": role, "granted_by": principal.user_id}
+                for role in roles
+            )
+            plaintext_key, key_hash = generate_api_key()
+            key_prefix = get_key_prefix(plaintext_key)
+            key_rows.append(
+                {
+                    "user_id": user_id,
+                    "key_hash": key_hash,
+                    "key_prefix": key_prefix,
+                    "name": bot.key_name,
+                    "scopes": roles,
+                }
+            )
+            created.append(
+                ProvisionedBot(
+                    user_id=str(user_id),
+                    username=bot.username,
+                    roles=roles,
+                    api_key=plaintext_key,
+                    key_prefix=key_prefix,
+                )
+            )
+
+        if role_rows:
+            await db.execute(insert(UserRole).values(role_rows))
+        if key_rows:
+            await db.execute(insert(APIKey).values(key_rows))
+
+    await db.commit()
+
+    return BulkProvisionResponse(created=created, conflicts=conflicts)
+
+
+def _provision_conflict(bot: BotIdentity) -> ProvisionConflict:
+    return ProvisionConflict(
+        username=bot.username,
+        code="CONFLICT",
+        message="Username or email already exists",
+    )
+
+
+def activity_filters(
+    user_id: UUID | None = Query(default=None, description="Acting user"),
+    api_key_id: UUID | None = Query(default=None, description="API key used"),
+    resource: ResourceType | None = Query(default=None, description="Resource type"),
+    resource_id: UUID | None = Query(default=None, description="Resource ID (needs resource)"),
+    action: ActionType | None = Query(default=None, description="Action"),
+    since: datetime | None = Query(default=None, description="Oldest timestamp (inclusive)"),
+    until: datetime | None = Query(default=None, description="Newest timestamp (exclusive)"),
+) -> list[ColumnElement[bool]]:
+    """
+    Build WHERE clauses for the activity filters.
+
+    Each filter maps to an index that ends in (timestamp, id): user_id to
+    idx_activity_user, api_key_id to idx_activity_api_key, resource (and
+    resource_id) to idx_activity_resource, and the time range to the primary
+    key and partition pruning. resource_id alone has no index, so it needs
+    resource; action only narrows whichever of those is used.
+    """
+    if resource_id is not None and resource is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": "resource_id requires resource",
+                }
+            },
+        )
+
+    clauses: list[ColumnElement[bool]] = []
+    if user_id is not None:
+        clauses.append(ActivityLog.user_id == user_id)
+    if api_key_id is not None:
+        clauses.append(ActivityLog.api_key_id == api_key_id)
+    if resource is not None:
+        clauses.append(ActivityLog.resource == resource)
+    if resource_id is not None:
+        clauses.append(ActivityLog.resource_id == resource_id)
+    if action is not None:
+        clauses.append(ActivityLog.action == action)
+    if since is not None:
+        clauses.append(ActivityLog.timestamp >= since)
+    if until is not None:
+        clauses.append(ActivityLog.timestamp < until)
+    return clauses
+
+
 @router.get(
     "/activity",
     response_model=ListActivityResponse,
@@ -181,27 +407,38 @@ async def revoke_user_keys(
 )
 async def list_activity(
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_admin),
-    cursor: str | None = Query(default=None, description="Pagination cursor (timestamp)"),
+    principal: AuthPrincipal = Depends(require_admin),
+    filters: list[ColumnElement[bool]] = Depends(activity_filters),
+    cursor: str | None = Query(default=None, description="Pagination cursor"),
     limit: int = Query(default=50, ge=1, le=100, description="Items per page"),
 ) -> ListActivityResponse:
     """
     Get global activity log.
 
-    Requires admin role. Returns cursor-paginated activity entries
-    ordered by timestamp descending (newest first).
+    Requires admin role. Returns keyset-paginated activity entries
+    ordered by timestamp descending (newest first), optionally filtered.
     """
-    query = select(ActivityLog).options(selectinload(ActivityLog.user))
+    query = select(ActivityLog).options(selectinload(ActivityLog.user)).where(*filters)
 
-    # Apply cursor (cursor is the timestamp)
+    # Apply cursor ("<timestamp>_<id>" of the last entry, or a bare timestamp).
+    # The plain timestamp bound lets the planner prune newer partitions; the
+    # row comparison breaks ties between entries sharing a timestamp
     if cursor:
         try:
-            cursor_dt = datetime.fromisoformat(cursor)
-            query = query.where(ActivityLog.timestamp < cursor_dt)
+            cursor_dt, cursor_id = _parse_activity_cursor(cursor)
+            if cursor_id is None:
+                query = query.where(ActivityLog.timestamp < cursor_dt)
+            else:
+                query = query.where(
+                    ActivityLog.timestamp <= cursor_dt,
+                    tuple_(ActivityLog.timestamp, ActivityLog.id) < (cursor_dt, cursor_id),
+                )
         except ValueError:
             pass  # Invalid cursor, ignore
 
-    query = query.order_by(ActivityLog.timestamp.desc()).limit(limit + 1)
+    # Matches the (timestamp, id) primary key, so partitions are read newest
+    # first and the scan stops after limit + 1 rows
+    query = query.order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc()).limit(limit + 1)
 
     result = await db.execute(query)
     entries = list(result.scalars().all())
@@ -217,6 +454,7 @@ async def list_activity(
             timestamp=entry.timestamp.isoformat(),
             user_id=str(entry.user_id) if entry.user_id else None,
             username=entry.user.username if entry.user else None,
+            api_key_id=str(entry.api_key_id) if entry.api_key_id else None,
             action=entry.action,
             resource=entry.resource,
             resource_id=str(entry.resource_id),
@@ -226,9 +464,100 @@ async def list_activity(
         for entry in entries
     ]
 
-    next_cursor = entries[-1].timestamp.isoformat() if entries and has_more else None
+    next_cursor = (
+        f"{entries[-1].timestamp.isoformat()}_{entries[-1].id}" if entries and has_more else None
+    )
 
     return ListActivityResponse(
         items=items,
         next_cursor=next_cursor,
     )
+
+
+@router.get(
+    "/activity/export",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def export_activity(
+    db: AsyncSession = Depends(get_db),
+    principal: AuthPrincipal = Depends(require_admin),
+    filters: list[ColumnElement[bool]] = Depends(activity_filters),
+) -> StreamingResponse:
+    """
+    Export matching activity entries as NDJSON, newest first.
+
+    Requires admin role. Takes the same filters as GET /activity. Rows are
+    read through a server-side cursor EXPORT_BATCH_SIZE at a time and
+    written out as they arrive, so memory stays flat however many match.
+    """
+    query = (
+        select(ActivityLog, User.username)
+        .outerjoin(User, User.id == ActivityLog.user_id)
+        .where(*filters)
+        .order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    async def lines() -> AsyncIterator[bytes]:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield b"".join(_export_line(entry, username) for entry, username in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _export_line(entry: ActivityLog, username: str | None) -> bytes:
+    record = {
+        "id": str(entry.id),
+        "timestamp": entry.timestamp.isoformat(),
+        "user_id": str(entry.user_id) if entry.user_id else None,
+        "username": username,
+        "api_key_id": str(entry.api_key_id) if entry.api_key_id else None,
+        "action": entry.action,
+        "resource": entry.resource,
+        "resource_id": str(entry.resource_id),
+        "request_id": entry.request_id,
+        "ip_address": str(entry.ip_address) if entry.ip_address else None,
+        "user_agent": entry.user_agent,
+        "metadata": entry.extra_data,
+    }
+    return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+
+def _parse_activity_cursor(cursor: str) -> tuple[datetime, UUID | None]:
+    """Split an activity cursor into its timestamp and, if present, entry id."""
+    timestamp, _, entry_id = cursor.partition("_")
+    return datetime.fromisoformat(timestamp), UUID(entry_id) if entry_id else None
+
+
+@router.get(
+    "/metrics",
+    response_model=SystemMetricsResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_metrics(
+    principal: AuthPrincipal = Depends(require_admin),
+) -> SystemMetricsResponse:
+    """
+    Get in-process runtime metrics for this worker.
+
+    Requires admin role. Counters are per worker process.
+    """
+    limit_storage = get_shared_storage()
+    return SystemMetricsResponse(
+        auth_cache=AuthCacheStats(**principal_cache.stats()),
+        last_seen=LastSeenStats(**last_seen_recorder.stats()),
+        password_hasher=PasswordHasherStats(**password_hasher.stats()),
+        rate_limit=KeyRateLimitStats(**key_rate_limiter.stats()),
+        limit_storage=LimitStorageStats(**limit_storage.stats()) if limit_storage else None,
+        idempotency_cache=IdempotencyCacheStats(**replay_cache.stats()),
+        idempotency_partitions=IdempotencyPartitionStats(**idempotency_partitions.stats()),
+        activity_writer=ActivityWriterStats(**activity_writer.stats()),
+        activity_partitions=ActivityPartitionStats(**activity_partitions.stats()),
+        read_rollup=ReadRollupStats(**read_rollup.stats()),
+        inbox_streams=InboxStreamStats(**inbox_broker.stats()),
+        inbox_counter_repair=InboxCounterRepairStats(**inbox_counter_repair.stats()),
+        inbox_retention=InboxRetentionStats(**inbox_retention.stats()),
+    )
@@ -1,17 +1,23 @@
 """Authentication router for user registration, login, and API key management."""
 
-from datetime import datetime, timezone
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any
 from uuid import UUID
 
 from fastapi import APIRouter, Cookie, Depends, HTTPException, Request, Response, status
-from sqlalchemy import or_, select
+from sqlalchemy import Row, Select, case, func, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql.dml import ReturningUpdate
 
 from app.auth.api_key import generate_api_key, get_key_prefix
+from app.auth.cache import principal_cache
 from app.auth.dependencies import get_current_user
 from app.auth.jwt import create_tokens, decode_token
-from app.auth.password import hash_password, verify_password
+from app.auth.password import password_hasher
+from app.auth.principal import AuthPrincipal
 from app.config import settings
 from app.database import get_db
 from app.middleware.rate_limit import limiter
@@ -28,6 +34,8 @@ from app.schemas.auth import (
     RegisterResponse,
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/v1/auth", tags=["Auth"])
 
 DEFAULT_ROLES = [
@@ -57,7 +65,9 @@ async def register(
     """
     # Check for existing username or email (case-insensitive for email)
     existing = await db.execute(
-        select(User).where((User.username == data.username) | (User.email.ilike(data.email)))
+        select(User.id).where(
+            (User.username == data.username) | (func.lower(User.email) == data.email.lower())
+        ).limit(1)
     )
     if existing.scalar_one_or_none():
         raise HTTPException(
@@ -74,7 +84,7 @@ async def register(
     user = User(
         username=data.username,
         email=data.email.lower(),
-        password_hash=hash_password(data.password),
+        password_hash=await password_hasher.hash(data.password),
         display_name=data.display_name,
     )
     db.add(user)
@@ -122,10 +132,73 @@ async def register(
     )
 
 
+def _session_user_query(*columns: InstrumentedAttribute[Any]) -> Select[Any]:
+    """Select what an access token's claims need (plus `columns`) in one query."""
+    roles = (
+        select(func.array_agg(UserRole.role))
+        .where(UserRole.user_id == User.id)
+        .scalar_subquery()
+        .label("roles")
+    )
+    return select(
+        User.id,
+        User.username,
+        User.display_name,
+        User.email,
+        User.auth_version,
+        roles,
+        *columns,
+    )
+
+
+def _session_claims(user: Row[Any]) -> dict[str, Any]:
+    """
+    Access-token claims for a row selected by _session_user_query.
+
+    The row's auth_version is also cached, so the token's first request to
+    this worker needs no lookup.
+    """
+    principal_cache.note_auth_version(user.id, user.auth_version)
+    return AuthPrincipal.for_session(
+        user_id=user.id,
+        username=user.username,
+        display_name=user.display_name,
+        email=user.email,
+        roles=frozenset(user.roles or ()),
+        auth_version=user.auth_version,
+    ).to_claims()
+
+
 LOCKOUT_THRESHOLD = 5  # Number of failed attempts before lockout
 LOCKOUT_DURATION_MINUTES = 15  # Duration of lockout in minutes
 
 
+def _record_failed_login(user_id: UUID, now: datetime) -> ReturningUpdate[Any]:
+    """
+    Count a failed attempt and lock the account at the threshold, atomically.
+
+    The increment happens in the database, so concurrent bad passwords each
+    count once. An expired lock restarts the count; an active lock (set by a
+    racing attempt) is kept rather than extended.
+    """
+    lock_expired = User.locked_until.is_not(None) & (User.locked_until <= now)
+    failed_count = case((lock_expired, 0), else_=func.coalesce(User.failed_login_count, 0)) + 1
+    return (
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            failed_login_count=failed_count,
+            last_failed_at=now,
+            locked_until=case(
+                (User.locked_until > now, User.locked_until),
+                (failed_count >= LOCKOUT_THRESHOLD, now + timedelta(minutes=LOCKOUT_DURATION_MINUTES)),
+                else_=None,
+            ),
+        )
+        .returning(User.failed_login_count, User.locked_until)
+    )
+
+
 @router.post(
     "/login",
     response_model=LoginResponse,
@@ -143,16 +216,17 @@ async def login(
 
     Accepts username or email in the 'username' field.
     """
-    # Find user by username or email (case-insensitive for email)
+    # Usernames cannot contain "@", so the identifier picks exactly one
+    # indexed lookup: uq_users_username or idx_users_email_lower
+    identifier = data.username
+    if "@" in identifier:
+        condition = func.lower(User.email) == identifier.lower()
+    else:
+        condition = User.username == identifier
     result = await db.execute(
-        select(User).where(
-            or_(
-                User.username == data.username,
-                User.email.ilike(data.username),
-            )
-        )
+        _session_user_query(User.password_hash, User.locked_until).where(condition)
     )
-    user = result.scalar_one_or_none()
+    user = result.one_or_none()
 
     # Verify user exists and password is correct
     if not user or not user.password_hash:
@@ -166,12 +240,8 @@ async def login(
             },
         )
 
-    # Check if account is locked
+    # Check if account is locked (an expired lock is cleared by the update below)
     now = datetime.now(timezone.utc)
-    if user.locked_until and user.locked_until <= now:
-        user.locked_until = None
-        user.failed_login_count = 0
-
     if user.locked_until and user.locked_until > now:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -183,18 +253,11 @@ async def login(
             },
         )
 
-    if not verify_password(data.password, user.password_hash):
-        # Increment failed login count and record timestamp
-        user.failed_login_count = (user.failed_login_count or 0) + 1
-        user.last_failed_at = now
-
-        # Check if we should lock the account
-        if user.failed_login_count >= LOCKOUT_THRESHOLD:
-            from datetime import timedelta
-
-            user.locked_until = now + timedelta(minutes=LOCKOUT_DURATION_MINUTES)
-
+    if not await password_hasher.verify(data.password, user.password_hash):
+        failed = (await db.execute(_record_failed_login(user.id, now))).one()
         await db.commit()
+        if failed.failed_login_count == LOCKOUT_THRESHOLD:
+            logger.warning("Locked account %s after %d failed logins", user.username, failed.failed_login_count)
 
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -207,13 +270,19 @@ async def login(
         )
 
     # Successful login - reset failed count, clear lockout, and record timestamp
-    user.failed_login_count = 0
-    user.locked_until = None
-    user.last_successful_at = now
+    values = {
+        User.failed_login_count: 0,
+        User.locked_until: None,
+        User.last_successful_at: now,
+    }
+    # Upgrade hashes made with a different bcrypt cost while we have the password
+    if password_hasher.needs_update(user.password_hash):
+        values[User.password_hash] = await password_hasher.hash(data.password)
+    await db.execute(update(User).where(User.id == user.id).values(values))
     await db.commit()
 
     # Create JWT tokens
-    tokens = create_tokens(str(user.id))
+    tokens = create_tokens(str(user.id), _session_claims(user))
 
     # Set HttpOnly cookies
     # Access token - short TTL matching token expiry
@@ -295,10 +364,10 @@ async def refresh(
             },
         )
 
-    # Get user from database to verify they still exist
+    # Get user from database to verify they still exist, with current roles
     user_id = payload.get("sub")
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    result = await db.execute(_session_user_query().where(User.id == user_id))
+    user = result.one_or_none()
 
     if not user:
         raise HTTPException(
@@ -312,7 +381,7 @@ async def refresh(
         )
 
     # Create new JWT tokens
-    tokens = create_tokens(str(user.id))
+    tokens = create_tokens(str(user.id), _session_claims(user))
 
     # Set HttpOnly cookies
     # Access token - short TTL matching token expiry
@@ -355,7 +424,7 @@ async def create_api_key(
     request: Request,
     data: CreateApiKeyRequest,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> CreateApiKeyResponse:
     """
     Create a new API key for the authenticated user.
@@ -363,10 +432,8 @@ async def create_api_key(
     The plaintext key is only returned once - store it securely!
     Scopes must be a subset of the user's roles.
     """
-    user, current_api_key = auth
-
     # Get user's roles
-    user_roles = {role.role for role in user.roles}
+    user_roles = set(principal.roles)
 
     # Determine scopes for new key
     if data.scopes is None:
@@ -391,7 +458,7 @@ async def create_api_key(
     # Generate new API key
     plaintext_key, key_hash = generate_api_key()
     api_key = APIKey(
-        user_id=user.id,
+        user_id=principal.user_id,
         key_hash=key_hash,
         key_prefix=get_key_prefix(plaintext_key),
         name=data.name,
@@ -418,18 +485,16 @@ async def create_api_key(
 )
 async def list_api_keys(
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> ListApiKeysResponse:
     """
     List all active (non-revoked) API keys for the authenticated user.
 
     Does not include the key hash or plaintext key.
     """
-    user, _ = auth
-
     result = await db.execute(
         select(APIKey)
-        .where(APIKey.user_id == user.id)
+        .where(APIKey.user_id == principal.user_id)
         .where(APIKey.revoked_at.is_(None))
         .order_by(APIKey.created_at.desc())
     )
@@ -458,15 +523,13 @@ async def list_api_keys(
 async def revoke_api_key(
     key_id: str,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> None:
     """
     Revoke an API key (soft delete).
 
     The key will no longer be usable for authentication.
     """
-    user, _ = auth
-
     # Validate UUID format
     try:
         key_uuid = UUID(key_id)
@@ -485,7 +548,7 @@ async def revoke_api_key(
     result = await db.execute(
         select(APIKey)
         .where(APIKey.id == key_uuid)
-        .where(APIKey.user_id == user.id)
+        .where(APIKey.user_id == principal.user_id)
         .where(APIKey.revoked_at.is_(None))
     )
     api_key = result.scalar_one_or_none()
@@ -504,3 +567,5 @@ async def revoke_api_key(
     # Soft delete by setting revoked_at
     api_key.revoked_at = datetime.now(timezone.utc)
     await db.commit()
+
+    principal_cache.invalidate_key(api_key.key_hash)
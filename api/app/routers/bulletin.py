@@ -3,15 +3,16 @@
 import datetime as dt
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.auth.dependencies import get_current_user, get_effective_scopes
+from app.auth.principal import AuthPrincipal
 from app.database import get_db
 from app.models.bulletin import BulletinComment, BulletinFollow, BulletinPost
-from app.models.user import APIKey, User
+from app.models.user import User
 from app.schemas.bulletin import (
     CommentRequest,
     CommentResponse,
@@ -23,6 +24,8 @@ from app.schemas.bulletin import (
     PostWithCommentsResponse,
     UpdatePostRequest,
 )
+from app.services.activity import log_activity
+from app.services.notifications import notify_comment_followers
 
 router = APIRouter(prefix="/api/v1/bulletin", tags=["Bulletin"])
 
@@ -31,10 +34,9 @@ def require_scope(required_scope: str):
     """Dependency factory to require a specific scope."""
 
     async def check_scope(
-        auth: tuple[User, APIKey] = Depends(get_current_user),
-    ) -> tuple[User, APIKey]:
-        user, api_key = auth
-        scopes = get_effective_scopes(user, api_key)
+        principal: AuthPrincipal = Depends(get_current_user),
+    ) -> AuthPrincipal:
+        scopes = get_effective_scopes(principal)
 
         if required_scope not in scopes:
             raise HTTPException(
@@ -47,7 +49,7 @@ def require_scope(required_scope: str):
                 },
             )
 
-        return user, api_key
+        return principal
 
     return check_scope
 
@@ -69,7 +71,7 @@ def _get_author_display(user: User | None) -> str | None:
 )
 async def list_posts(
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("bulletin:read")),
+    principal: AuthPrincipal = Depends(require_scope("bulletin:read")),
     cursor: str | None = Query(default=None, description="Pagination cursor"),
     limit: int = Query(default=20, ge=1, le=100, description="Items per page"),
 ) -> ListPostsResponse:
@@ -146,21 +148,24 @@ async def list_posts(
 )
 async def create_post(
     data: CreatePostRequest,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("bulletin:write")),
+    principal: AuthPrincipal = Depends(require_scope("bulletin:write")),
 ) -> PostResponse:
     """Create a new bulletin post."""
-    user, _ = auth
-
     post = BulletinPost(
         title=data.title,
         content_md=data.content_md,
-        author_id=user.id,
+        author_id=principal.user_id,
     )
 
     db.add(post)
     await db.commit()
 
+    await log_activity(
+        request, principal.user_id, principal.api_key_id, "create", "bulletin_post", post.id
+    )
+
     # Re-fetch to get computed columns
     result = await db.execute(
         select(BulletinPost).options(selectinload(BulletinPost.author)).where(BulletinPost.id == post.id)
@@ -191,7 +196,7 @@ async def create_post(
 async def get_post(
     post_id: UUID,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("bulletin:read")),
+    principal: AuthPrincipal = Depends(require_scope("bulletin:read")),
 ) -> PostWithCommentsResponse:
     """Get a single post by ID with comments."""
     result = await db.execute(
@@ -252,16 +257,15 @@ async def get_post(
 async def update_post(
     post_id: UUID,
     data: UpdatePostRequest,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("bulletin:write")),
+    principal: AuthPrincipal = Depends(require_scope("bulletin:write")),
 ) -> PostResponse:
     """
     Update a bulletin post.
 
     Only the post author can update their post.
     """
-    user, _ = auth
-
     result = await db.execute(
         select(BulletinPost).options(selectinload(BulletinPost.author)).where(BulletinPost.id == post_id)
     )
@@ -279,7 +283,7 @@ async def update_post(
         )
 
     # Check ownership
-    if post.author_id != user.id:
+    if post.author_id != principal.user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={
@@ -300,6 +304,10 @@ async def update_post(
 
     await db.commit()
 
+    await log_activity(
+        request, principal.user_id, principal.api_key_id, "update", "bulletin_post", post.id
+    )
+
     # Re-fetch to get computed columns
     result = await db.execute(
         select(BulletinPost).options(selectinload(BulletinPost.author)).where(BulletinPost.id == post.id)
@@ -328,16 +336,15 @@ async def update_post(
 )
 async def delete_post(
     post_id: UUID,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("bulletin:write")),
+    principal: AuthPrincipal = Depends(require_scope("bulletin:write")),
 ) -> None:
     """
     Delete a bulletin post.
 
     Only the post author can delete their post.
     """
-    user, _ = auth
-
     result = await db.execute(select(BulletinPost).where(BulletinPost.id == post_id))
     post = result.scalar_one_or_none()
 
@@ -353,7 +360,7 @@ async def delete_post(
         )
 
     # Check ownership
-    if post.author_id != user.id:
+    if post.author_id != principal.user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={
@@ -367,6 +374,10 @@ async def delete_post(
     await db.delete(post)
     await db.commit()
 
+    await log_activity(
+        request, principal.user_id, principal.api_key_id, "delete", "bulletin_post", post_id
+    )
+
 
 # --- Add Comment ---
 
@@ -379,12 +390,11 @@ async def delete_post(
 async def add_comment(
     post_id: UUID,
     data: CommentRequest,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("bulletin:write")),
+    principal: AuthPrincipal = Depends(require_scope("bulletin:write")),
 ) -> CommentResponse:
     """Add a comment to a post."""
-    user, _ = auth
-
     # Check post exists
     result = await db.execute(select(BulletinPost).where(BulletinPost.id == post_id))
     post = result.scalar_one_or_none()
@@ -402,19 +412,32 @@ async def add_comment(
 
     comment = BulletinComment(
         post_id=post_id,
-        author_id=user.id,
+        author_id=principal.user_id,
         content_md=data.content_md,
     )
 
     db.add(comment)
+    await db.flush()
+    # Followers are notified in the same transaction as the comment
+    await notify_comment_followers(db, post, comment, principal)
     await db.commit()
     await db.refresh(comment)
 
+    await log_activity(
+        request,
+        principal.user_id,
+        principal.api_key_id,
+        "create",
+        "bulletin_comment",
+        comment.id,
+        {"post_id": str(post_id)},
+    )
+
     return CommentResponse(
         id=str(comment.id),
         post_id=str(comment.post_id),
-        author=user.display_name or user.username,
-        author_id=str(user.id),
+        author=principal.display,
+        author_id=str(principal.user_id),
         content_md=comment.content_md,
         created_at=comment.created_at.isoformat(),
     )
@@ -431,11 +454,9 @@ async def add_comment(
 async def follow_post(
     post_id: UUID,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("bulletin:write")),
+    principal: AuthPrincipal = Depends(require_scope("bulletin:write")),
 ) -> FollowResponse:
     """Follow a post for notifications."""
-    user, _ = auth
-
     # Check post exists
     result = await db.execute(select(BulletinPost).where(BulletinPost.id == post_id))
     post = result.scalar_one_or_none()
@@ -454,7 +475,7 @@ async def follow_post(
     # Check if already following
     result = await db.execute(
         select(BulletinFollow).where(
-            BulletinFollow.user_id == user.id,
+            BulletinFollow.user_id == principal.user_id,
             BulletinFollow.post_id == post_id,
         )
     )
@@ -465,7 +486,7 @@ async def follow_post(
         return FollowResponse(post_id=str(post_id), following=True)
 
     follow = BulletinFollow(
-        user_id=user.id,
+        user_id=principal.user_id,
         post_id=post_id,
     )
 
@@ -485,11 +506,9 @@ async def follow_post(
 async def unfollow_post(
     post_id: UUID,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("bulletin:write")),
+    principal: AuthPrincipal = Depends(require_scope("bulletin:write")),
 ) -> None:
     """Unfollow a post."""
-    user, _ = auth
-
     # Check post exists
     result = await db.execute(select(BulletinPost).where(BulletinPost.id == post_id))
     post = result.scalar_one_or_none()
@@ -508,7 +527,7 @@ async def unfollow_post(
     # Find follow
     result = await db.execute(
         select(BulletinFollow).where(
-            BulletinFollow.user_id == user.id,
+            BulletinFollow.user_id == principal.user_id,
             BulletinFollow.post_id == post_id,
         )
     )
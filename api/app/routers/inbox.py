@@ -1,23 +1,30 @@
 """Inbox router for notifications."""
 
-from datetime import datetime, timezone
+from datetime import UTC, datetime, timedelta, timezone
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func, select, update
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.dependencies import get_current_user
+from app.auth.principal import AuthPrincipal
+from app.config import settings
 from app.database import get_db
-from app.models.notification import Notification
-from app.models.user import APIKey, User
+from app.models.notification import InboxCounter, Notification
 from app.schemas.inbox import (
+    BulkNotificationResult,
+    BulkNotificationsRequest,
+    BulkNotificationsResponse,
     InboxSummaryResponse,
     ListNotificationsResponse,
     MarkAllReadResponse,
     MarkReadResponse,
     NotificationItem,
 )
+from app.services.inbox_counters import mark_all_read
+from app.services.inbox_stream import inbox_broker, inbox_events, parse_event_id
 
 router = APIRouter(prefix="/api/v1/inbox", tags=["Inbox"])
 
@@ -32,33 +39,23 @@ router = APIRouter(prefix="/api/v1/inbox", tags=["Inbox"])
 )
 async def get_inbox_summary(
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> InboxSummaryResponse:
     """
     Get inbox summary for session start.
 
-    Returns counts of unread and total notifications.
+    Returns counts of unread and total notifications from the user's
+    trigger-maintained counter row (one primary-key lookup).
     """
-    user, _ = auth
-
-    # Get unread count
-    unread_result = await db.execute(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == user.id,
-            Notification.read_at.is_(None),
-        )
-    )
-    unread_count = unread_result.scalar() or 0
-
-    # Get total count
-    total_result = await db.execute(
-        select(func.count(Notification.id)).where(Notification.user_id == user.id)
-    )
-    total_count = total_result.scalar() or 0
+    counter = await db.get(InboxCounter, principal.user_id)
+    if counter is None:
+        return InboxSummaryResponse(unread_count=0, total_count=0)
 
     return InboxSummaryResponse(
-        unread_count=unread_count,
-        total_count=total_count,
+        unread_count=counter.unread,
+        total_count=counter.total,
+        latest_at=counter.latest_at.isoformat() if counter.latest_at else None,
+        read_through=counter.read_through.isoformat() if counter.read_through else None,
     )
 
 
@@ -72,7 +69,7 @@ async def get_inbox_summary(
 )
 async def list_notifications(
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
     cursor: str | None = Query(default=None, description="Pagination cursor"),
     limit: int = Query(default=20, ge=1, le=100, description="Items per page"),
     unread_only: bool = Query(default=False, description="Show only unread notifications"),
@@ -82,13 +79,14 @@ async def list_notifications(
 
     Returns notifications ordered by created_at descending.
     """
-    user, _ = auth
-
-    query = select(Notification).where(Notification.user_id == user.id)
+    read_through = await _read_through(db, principal.user_id)
+    query = select(Notification).where(Notification.user_id == principal.user_id)
 
-    # Filter unread only
+    # Filter unread only (served by idx_notifications_unread past the watermark)
     if unread_only:
         query = query.where(Notification.read_at.is_(None))
+        if read_through is not None:
+            query = query.where(Notification.created_at > read_through)
 
     # Apply cursor (cursor is the created_at timestamp)
     if cursor:
@@ -108,20 +106,7 @@ async def list_notifications(
     if has_more:
         notifications = notifications[:limit]
 
-    items = [
-        NotificationItem(
-            id=str(n.id),
-            notification_type=n.notification_type,
-            title=n.title,
-            body=n.body,
-            resource_type=n.resource_type,
-            resource_id=str(n.resource_id) if n.resource_id else None,
-            payload=n.payload or {},
-            created_at=n.created_at.isoformat(),
-            read_at=n.read_at.isoformat() if n.read_at else None,
-        )
-        for n in notifications
-    ]
+    items = [_notification_item(n, read_through) for n in notifications]
 
     next_cursor = notifications[-1].created_at.isoformat() if notifications and has_more else None
 
@@ -132,6 +117,85 @@ async def list_notifications(
     )
 
 
+async def _read_through(db: AsyncSession, user_id: UUID) -> datetime | None:
+    """The user's read watermark, if mark-all-read was ever used."""
+    return (
+        await db.execute(select(InboxCounter.read_through).where(InboxCounter.user_id == user_id))
+    ).scalar_one_or_none()
+
+
+def _read_at(n: Notification, read_through: datetime | None) -> datetime | None:
+    """When the notification was read: its own read_at, else the covering watermark."""
+    if n.read_at is None and read_through is not None and n.created_at <= read_through:
+        return read_through
+    return n.read_at
+
+
+def _notification_item(n: Notification, read_through: datetime | None = None) -> NotificationItem:
+    read_at = _read_at(n, read_through)
+    return NotificationItem(
+        id=str(n.id),
+        notification_type=n.notification_type,
+        title=n.title,
+        body=n.body,
+        resource_type=n.resource_type,
+        resource_id=str(n.resource_id) if n.resource_id else None,
+        payload=n.payload or {},
+        created_at=n.created_at.isoformat(),
+        read_at=read_at.isoformat() if read_at else None,
+    )
+
+
+# --- Stream Notifications ---
+
+
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_notifications(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    principal: AuthPrincipal = Depends(get_current_user),
+    cursor: str | None = Query(default=None, description="Resume after this event id"),
+    last_event_id: str | None = Header(default=None, alias="Last-Event-ID"),
+) -> StreamingResponse:
+    """
+    Stream new notifications as server-sent events.
+
+    Each event is a "notification" whose data is a notification item and
+    whose id is a resume cursor. Reconnect with the Last-Event-ID header
+    (or ?cursor=) to receive everything created after that event; without
+    one, only notifications created after connecting are sent. Comment
+    heartbeats keep idle connections open, and streams end after
+    inbox_stream_max_seconds so clients re-authenticate.
+    """
+    resume_after = None
+    if resume := last_event_id or cursor:
+        try:
+            resume_after = parse_event_id(resume)
+        except ValueError:
+            pass  # Invalid cursor, ignore
+
+    events = inbox_events(
+        db,
+        inbox_broker,
+        principal.user_id,
+        resume_after,
+        render=lambda n: _notification_item(n).model_dump_json(),
+        is_disconnected=request.is_disconnected,
+        heartbeat_seconds=settings.inbox_stream_heartbeat_seconds,
+        max_seconds=settings.inbox_stream_max_seconds,
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # --- Mark Notification as Read ---
 
 
@@ -143,15 +207,13 @@ async def list_notifications(
 async def mark_notification_read(
     notification_id: UUID,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> MarkReadResponse:
     """Mark a single notification as read."""
-    user, _ = auth
-
     result = await db.execute(
         select(Notification).where(
             Notification.id == notification_id,
-            Notification.user_id == user.id,
+            Notification.user_id == principal.user_id,
         )
     )
     notification = result.scalar_one_or_none()
@@ -167,15 +229,17 @@ async def mark_notification_read(
             },
         )
 
-    # Mark as read if not already
-    if notification.read_at is None:
+    # Mark as read if not already, individually or by the watermark
+    read_at = _read_at(notification, await _read_through(db, principal.user_id))
+    if read_at is None:
         notification.read_at = datetime.now(timezone.utc)
         await db.commit()
         await db.refresh(notification)
+        read_at = notification.read_at
 
     return MarkReadResponse(
         id=str(notification.id),
-        read_at=notification.read_at.isoformat(),
+        read_at=read_at.isoformat(),
     )
 
 
@@ -189,28 +253,133 @@ async def mark_notification_read(
 )
 async def mark_all_notifications_read(
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> MarkAllReadResponse:
-    """Mark all unread notifications as read."""
-    user, _ = auth
+    """
+    Mark all unread notifications as read.
 
-    now = datetime.now(timezone.utc)
+    Advances the user's read watermark rather than updating each row, so
+    this costs the same however many notifications are unread.
+    """
+    marked_count = await mark_all_read(db, principal.user_id, datetime.now(UTC))
+    await db.commit()
 
-    result = await db.execute(
+    return MarkAllReadResponse(marked_count=marked_count)
+
+
+# --- Bulk Operations ---
+
+
+@router.post(
+    "/notifications/bulk-read",
+    response_model=BulkNotificationsResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def bulk_mark_notifications_read(
+    data: BulkNotificationsRequest,
+    db: AsyncSession = Depends(get_db),
+    principal: AuthPrincipal = Depends(get_current_user),
+) -> BulkNotificationsResponse:
+    """
+    Mark many notifications as read in one statement.
+
+    With ids (up to 500), each is reported as "read", "already_read" or
+    "not_found". With before, everything created before that cursor is
+    marked read by advancing the read watermark, as read-all does.
+    """
+    now = datetime.now(UTC)
+    if data.before is not None:
+        # The watermark is inclusive; before is not
+        read_through = min(data.before - timedelta(microseconds=1), now)
+        count = await mark_all_read(db, principal.user_id, read_through)
+        await db.commit()
+        return BulkNotificationsResponse(count=count, results=[])
+
+    ids = list(dict.fromkeys(data.ids))
+    read_through = await _read_through(db, principal.user_id)
+    target = (
+        select(Notification.id, Notification.created_at, Notification.read_at)
+        .where(Notification.user_id == principal.user_id, Notification.id.in_(ids))
+        .cte("target")
+    )
+    unread = [Notification.id == target.c.id, Notification.read_at.is_(None)]
+    if read_through is not None:
+        unread.append(Notification.created_at > read_through)
+    marked = (
         update(Notification)
-        .where(
-            Notification.user_id == user.id,
-            Notification.read_at.is_(None),
-        )
+        .where(*unread)
         .values(read_at=now)
         .returning(Notification.id)
+        .cte("marked")
+    )
+    result = await db.execute(
+        select(target, marked.c.id.label("marked_id")).outerjoin(marked, marked.c.id == target.c.id)
     )
+    found = {row.id: row for row in result.all()}
+    await db.commit()
+
+    results = []
+    for notification_id in ids:
+        row = found.get(notification_id)
+        if row is None:
+            results.append(BulkNotificationResult(id=str(notification_id), status="not_found"))
+        elif row.marked_id is not None:
+            results.append(
+                BulkNotificationResult(id=str(row.id), status="read", read_at=now.isoformat())
+            )
+        else:
+            read_at = _read_at(row, read_through)
+            results.append(
+                BulkNotificationResult(
+                    id=str(row.id),
+                    status="already_read",
+                    read_at=read_at.isoformat() if read_at else None,
+                )
+            )
+
+    return BulkNotificationsResponse(
+        count=sum(item.status == "read" for item in results),
+        results=results,
+    )
+
 
-    # Count how many were marked
-    marked_ids = list(result.scalars().all())
+@router.post(
+    "/notifications/bulk-delete",
+    response_model=BulkNotificationsResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def bulk_delete_notifications(
+    data: BulkNotificationsRequest,
+    db: AsyncSession = Depends(get_db),
+    principal: AuthPrincipal = Depends(get_current_user),
+) -> BulkNotificationsResponse:
+    """
+    Delete many notifications in one statement.
+
+    With ids (up to 500), each is reported as "deleted" or "not_found".
+    With before, everything created before that cursor is deleted.
+    """
+    query = delete(Notification).where(Notification.user_id == principal.user_id)
+    if data.before is not None:
+        result = await db.execute(query.where(Notification.created_at < data.before))
+        await db.commit()
+        return BulkNotificationsResponse(count=result.rowcount, results=[])
+
+    ids = list(dict.fromkeys(data.ids))
+    result = await db.execute(query.where(Notification.id.in_(ids)).returning(Notification.id))
+    deleted = set(result.scalars().all())
     await db.commit()
 
-    return MarkAllReadResponse(marked_count=len(marked_ids))
+    return BulkNotificationsResponse(
+        count=len(deleted),
+        results=[
+            BulkNotificationResult(
+                id=str(notification_id),
+                status="deleted" if notification_id in deleted else "not_found",
+            )
+            for notification_id in ids
+        ],
+    )
 
 
 # --- Delete Notification ---
@@ -223,15 +392,13 @@ async def mark_all_notifications_read(
 async def delete_notification(
     notification_id: UUID,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> None:
     """Delete a notification."""
-    user, _ = auth
-
     result = await db.execute(
         select(Notification).where(
             Notification.id == notification_id,
-            Notification.user_id == user.id,
+            Notification.user_id == principal.user_id,
         )
     )
     notification = result.scalar_one_or_none()
@@ -4,18 +4,25 @@ import datetime as dt
 import re
 import secrets
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
 from sqlalchemy import func, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.auth.dependencies import get_current_user, get_effective_scopes
+from app.auth.dependencies import (
+    charge_rate_limit,
+    get_current_user,
+    get_effective_scopes,
+    rate_limit_bucket,
+)
+from app.auth.principal import AuthPrincipal
 from app.database import get_db
-from app.models.article import Article, ArticleRevision
-from app.models.user import APIKey, User
+from app.models.article import Article, ArticleReadHour, ArticleRevision
 from app.schemas.library import (
     ArticleListItem,
+    ArticleReadHourItem,
+    ArticleReadsResponse,
     ArticleResponse,
     BatchReadRequest,
     BatchReadResponse,
@@ -28,6 +35,9 @@ from app.schemas.library import (
     SearchResultItem,
     UpdateArticleRequest,
 )
+from app.services.activity import log_activity
+from app.services.key_rate_limit import payload_cost
+from app.services.read_rollup import read_hour, read_rollup
 
 router = APIRouter(prefix="/api/v1/library", tags=["Library"])
 
@@ -36,10 +46,9 @@ def require_scope(required_scope: str):
     """Dependency factory to require a specific scope."""
 
     async def check_scope(
-        auth: tuple[User, APIKey] = Depends(get_current_user),
-    ) -> tuple[User, APIKey]:
-        user, api_key = auth
-        scopes = get_effective_scopes(user, api_key)
+        principal: AuthPrincipal = Depends(get_current_user),
+    ) -> AuthPrincipal:
+        scopes = get_effective_scopes(principal)
 
         if required_scope not in scopes:
             raise HTTPException(
@@ -52,7 +61,7 @@ def require_scope(required_scope: str):
                 },
             )
 
-        return user, api_key
+        return principal
 
     return check_scope
 
@@ -82,7 +91,7 @@ def generate_slug(title: str) -> str:
 )
 async def list_articles(
     db: AsyncSession = Depends(get_db),
-    _auth: tuple[User, APIKey] = Depends(require_scope("library:read")),
+    _principal: AuthPrincipal = Depends(require_scope("library:read")),
     cursor: str | None = Query(default=None, description="Pagination cursor"),
     limit: int = Query(default=20, ge=1, le=100, description="Items per page"),
 ) -> ListArticlesResponse:
@@ -145,16 +154,15 @@ async def list_articles(
 )
 async def create_article(
     data: CreateArticleRequest,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("library:create")),
+    principal: AuthPrincipal = Depends(require_scope("library:create")),
 ) -> ArticleResponse:
     """
     Create a new article.
 
     If slug is not provided, one will be auto-generated from the title.
     """
-    user, _ = auth
-
     # Generate slug if not provided
     slug = data.slug or generate_slug(data.title)
 
@@ -174,7 +182,7 @@ async def create_article(
         slug=slug,
         title=data.title,
         content_md=data.content_md,
-        author_id=user.id,
+        author_id=principal.user_id,
     )
 
     db.add(article)
@@ -194,6 +202,10 @@ async def create_article(
             },
         ) from exc
 
+    await log_activity(
+        request, principal.user_id, principal.api_key_id, "create", "article", article.id
+    )
+
     # Load author relationship
     await db.refresh(article, ["author"])
 
@@ -222,10 +234,16 @@ async def create_article(
 )
 async def get_article(
     slug: str,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    _auth: tuple[User, APIKey] = Depends(require_scope("library:read")),
+    principal: AuthPrincipal = Depends(require_scope("library:read")),
 ) -> ArticleResponse:
-    """Get a single article by slug."""
+    """
+    Get a single article by slug.
+
+    Large articles may cost more than one request, see payload_cost. The
+    cost is known from the row itself, so it is charged after the one load.
+    """
     result = await db.execute(
         select(Article)
         .options(selectinload(Article.author))
@@ -244,6 +262,23 @@ async def get_article(
             },
         )
 
+    # One unit was charged on authentication
+    charge_rate_limit(
+        request,
+        principal,
+        payload_cost(1, article.byte_size or 0, article.token_count_est or 0) - 1,
+    )
+
+    read_rollup.record(article.id, principal.api_key_id)
+    await log_activity(
+        request=request,
+        user_id=principal.user_id,
+        api_key_id=principal.api_key_id,
+        action="read",
+        resource="article",
+        resource_id=article.id,
+    )
+
     return ArticleResponse(
         id=str(article.id),
         slug=article.slug,
@@ -270,8 +305,9 @@ async def get_article(
 async def update_article(
     slug: str,
     data: UpdateArticleRequest,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("library:edit")),
+    principal: AuthPrincipal = Depends(require_scope("library:edit")),
     if_match: str | None = Header(default=None, alias="If-Match"),
 ) -> ArticleResponse:
     """
@@ -279,8 +315,6 @@ async def update_article(
 
     Requires If-Match header with current version for optimistic concurrency control.
     """
-    user, _ = auth
-
     # Require If-Match header
     if if_match is None:
         raise HTTPException(
@@ -341,9 +375,8 @@ async def update_article(
         )
 
     # Check ownership: user must be author OR have admin role
-    user_roles = {role.role for role in user.roles}
-    is_author = article.author_id == user.id
-    is_admin = "admin" in user_roles
+    is_author = article.author_id == principal.user_id
+    is_admin = "admin" in principal.roles
 
     if not is_author and not is_admin:
         raise HTTPException(
@@ -362,7 +395,7 @@ async def update_article(
         version=article.current_version,
         title=article.title,
         content_md=article.content_md,
-        editor_id=user.id,
+        editor_id=principal.user_id,
         edit_summary=data.edit_summary,
     )
     db.add(revision)
@@ -390,6 +423,16 @@ async def update_article(
             },
         ) from exc
 
+    await log_activity(
+        request,
+        principal.user_id,
+        principal.api_key_id,
+        "update",
+        "article",
+        article.id,
+        {"version": article.current_version},
+    )
+
     # Re-fetch the article to get computed columns
     result = await db.execute(
         select(Article).options(selectinload(Article.author)).where(Article.id == article.id)
@@ -420,16 +463,15 @@ async def update_article(
 )
 async def delete_article(
     slug: str,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(require_scope("library:delete")),
+    principal: AuthPrincipal = Depends(require_scope("library:delete")),
 ) -> None:
     """
     Delete an article.
 
     Requires library:delete scope AND (author OR admin).
     """
-    user, _ = auth
-
     result = await db.execute(
         select(Article)
         .options(selectinload(Article.author))
@@ -449,9 +491,8 @@ async def delete_article(
         )
 
     # Check ownership: user must be author OR have admin role
-    user_roles = {role.role for role in user.roles}
-    is_author = article.author_id == user.id
-    is_admin = "admin" in user_roles
+    is_author = article.author_id == principal.user_id
+    is_admin = "admin" in principal.roles
 
     if not is_author and not is_admin:
         raise HTTPException(
@@ -467,6 +508,16 @@ async def delete_article(
     await db.delete(article)
     await db.commit()
 
+    await log_activity(
+        request,
+        principal.user_id,
+        principal.api_key_id,
+        "delete",
+        "article",
+        article.id,
+        {"slug": slug},
+    )
+
 
 # --- Search ---
 
@@ -479,7 +530,7 @@ async def delete_article(
 async def search_articles(
     q: str = Query(..., min_length=1, description="Search query"),
     db: AsyncSession = Depends(get_db),
-    _auth: tuple[User, APIKey] = Depends(require_scope("library:read")),
+    _principal: AuthPrincipal = Depends(require_scope("library:read")),
     limit: int = Query(default=20, ge=1, le=100, description="Max results"),
 ) -> SearchResponse:
     """
@@ -535,26 +586,47 @@ async def search_articles(
     response_model=BatchReadResponse,
     status_code=status.HTTP_200_OK,
 )
+@rate_limit_bucket("read")
 async def batch_read_articles(
     data: BatchReadRequest,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    _auth: tuple[User, APIKey] = Depends(require_scope("library:read")),
+    principal: AuthPrincipal = Depends(require_scope("library:read")),
 ) -> BatchReadResponse:
     """
     Read multiple articles by slug in a single request.
 
-    Maximum 100 slugs per request.
+    Maximum 100 slugs per request. Charged to the read budget as one
+    request per slug requested, found or not (see payload_cost).
     """
     if not data.slugs:
         return BatchReadResponse(items=[], missing=[])
 
-    # Fetch all matching articles
+    # Price the batch from the stored sizes before loading any content
     result = await db.execute(
-        select(Article)
-        .options(selectinload(Article.author))
-        .where(Article.slug.in_(data.slugs))
+        select(Article.slug, Article.byte_size, Article.token_count_est).where(
+            Article.slug.in_(data.slugs)
+        )
+    )
+    sizes = {slug: (byte_size or 0, token_count or 0) for slug, byte_size, token_count in result.all()}
+    served = [sizes[slug] for slug in data.slugs if slug in sizes]
+    cost = payload_cost(
+        len(data.slugs),
+        sum(byte_size for byte_size, _ in served),
+        sum(token_count for _, token_count in served),
     )
-    articles = {article.slug: article for article in result.scalars().all()}
+    # One unit was charged on authentication
+    charge_rate_limit(request, principal, cost - 1)
+
+    # Fetch all matching articles
+    articles = {}
+    if sizes:
+        result = await db.execute(
+            select(Article)
+            .options(selectinload(Article.author))
+            .where(Article.slug.in_(sizes))
+        )
+        articles = {article.slug: article for article in result.scalars().all()}
 
     # Build response
     items = []
@@ -563,6 +635,16 @@ async def batch_read_articles(
     for slug in data.slugs:
         article = articles.get(slug)
         if article:
+            read_rollup.record(article.id, principal.api_key_id)
+            await log_activity(
+                request=request,
+                user_id=principal.user_id,
+                api_key_id=principal.api_key_id,
+                action="read",
+                resource="article",
+                resource_id=article.id,
+                metadata={"batch": True},
+            )
             items.append(
                 ArticleResponse(
                     id=str(article.id),
@@ -595,7 +677,7 @@ async def batch_read_articles(
 async def list_revisions(
     slug: str,
     db: AsyncSession = Depends(get_db),
-    _auth: tuple[User, APIKey] = Depends(require_scope("library:read")),
+    _principal: AuthPrincipal = Depends(require_scope("library:read")),
 ) -> ListRevisionsResponse:
     """
     List all revisions of an article.
@@ -655,7 +737,7 @@ async def get_revision(
     slug: str,
     version: int,
     db: AsyncSession = Depends(get_db),
-    _auth: tuple[User, APIKey] = Depends(require_scope("library:read")),
+    _principal: AuthPrincipal = Depends(require_scope("library:read")),
 ) -> RevisionResponse:
     """
     Get a specific revision of an article by version number.
@@ -706,3 +788,70 @@ async def get_revision(
         edit_summary=revision.edit_summary,
         created_at=revision.created_at.isoformat(),
     )
+
+
+# --- Read Statistics ---
+
+
+@router.get(
+    "/articles/{slug}/reads",
+    response_model=ArticleReadsResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_article_reads(
+    slug: str,
+    db: AsyncSession = Depends(get_db),
+    principal: AuthPrincipal = Depends(require_scope("library:read")),
+    hours: int = Query(default=24, ge=1, le=24 * 31, description="Hours to include"),
+) -> ArticleReadsResponse:
+    """
+    Get exact hourly read counts for an article.
+
+    Only the author or an admin can see read counts. Counts trail live
+    traffic by up to read_rollup_flush_interval_seconds.
+    """
+    result = await db.execute(select(Article).where(Article.slug == slug))
+    article = result.scalar_one_or_none()
+
+    if not article:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": {
+                    "code": "NOT_FOUND",
+                    "message": f"Article '{slug}' not found",
+                }
+            },
+        )
+
+    if article.author_id != principal.user_id and "admin" not in principal.roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                "error": {
+                    "code": "FORBIDDEN",
+                    "message": "Only the author can see read counts",
+                }
+            },
+        )
+
+    since = read_hour(dt.datetime.now(dt.UTC)) - dt.timedelta(hours=hours - 1)
+    result = await db.execute(
+        select(ArticleReadHour)
+        .where(ArticleReadHour.article_id == article.id, ArticleReadHour.hour >= since)
+        .order_by(ArticleReadHour.hour.desc())
+    )
+    rows = list(result.scalars().all())
+
+    return ArticleReadsResponse(
+        slug=article.slug,
+        reads=sum(row.reads for row in rows),
+        items=[
+            ArticleReadHourItem(
+                hour=row.hour.isoformat(),
+                reads=row.reads,
+                distinct_keys=row.distinct_keys,
+            )
+            for row in rows
+        ],
+    )
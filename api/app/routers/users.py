@@ -2,15 +2,17 @@
 
 import datetime as dt
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.auth.cache import principal_cache
 from app.auth.dependencies import get_current_user, get_effective_scopes
+from app.auth.principal import AuthPrincipal
 from app.database import get_db
 from app.models.profile import Profile
-from app.models.user import APIKey, User
+from app.models.user import User
 from app.schemas.users import (
     ProfileContentResponse,
     UpdateProfileContentRequest,
@@ -20,6 +22,7 @@ from app.schemas.users import (
     UserMeResponse,
     UserProfileResponse,
 )
+from app.services.activity import log_activity
 
 router = APIRouter(prefix="/api/v1/users", tags=["Users"])
 
@@ -30,22 +33,20 @@ router = APIRouter(prefix="/api/v1/users", tags=["Users"])
     status_code=status.HTTP_200_OK,
 )
 async def get_current_user_profile(
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> UserMeResponse:
     """
     Get the authenticated user's profile.
 
     Returns user info and the scopes of the API key used for authentication.
     """
-    user, api_key = auth
-
     return UserMeResponse(
-        user_id=str(user.id),
-        username=user.username,
-        email=user.email,
-        display_name=user.display_name,
-        roles=[role.role for role in user.roles],
-        api_key_scopes=sorted(get_effective_scopes(user, api_key)),
+        user_id=str(principal.user_id),
+        username=principal.username,
+        email=principal.email,
+        display_name=principal.display_name,
+        roles=sorted(principal.roles),
+        api_key_scopes=sorted(get_effective_scopes(principal)),
     )
 
 
@@ -57,14 +58,14 @@ async def get_current_user_profile(
 async def update_current_user_profile(
     data: UpdateProfileRequest,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> UpdateProfileResponse:
     """
     Update the authenticated user's profile.
 
     Currently supports updating display_name only.
     """
-    user, _ = auth
+    user = await db.get(User, principal.user_id)
 
     # Update display_name if provided (including setting to None)
     if "display_name" in data.model_fields_set or data.display_name is not None:
@@ -73,6 +74,9 @@ async def update_current_user_profile(
     await db.commit()
     await db.refresh(user)
 
+    # Cached principals carry display_name
+    principal_cache.invalidate_user(user.id)
+
     return UpdateProfileResponse(
         user_id=str(user.id),
         username=user.username,
@@ -87,8 +91,9 @@ async def update_current_user_profile(
 )
 async def get_user_profile(
     username: str,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> UserProfileResponse:
     """
     Get a user's public profile.
@@ -111,6 +116,15 @@ async def get_user_profile(
             },
         )
 
+    await log_activity(
+        request=request,
+        user_id=principal.user_id,
+        api_key_id=principal.api_key_id,
+        action="read",
+        resource="profile",
+        resource_id=user.id,
+    )
+
     return UserProfileResponse(
         user_id=str(user.id),
         username=user.username,
@@ -126,20 +140,18 @@ async def get_user_profile(
 )
 async def get_profile_content(
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> ProfileContentResponse:
     """
     Get the authenticated user's profile content (bio).
 
     Returns the markdown content of the user's profile.
     """
-    user, _ = auth
-
     # Load profile with user
     result = await db.execute(
         select(User)
         .options(selectinload(User.profile))
-        .where(User.id == user.id)
+        .where(User.id == principal.user_id)
     )
     user = result.scalar_one()
 
@@ -165,20 +177,18 @@ async def get_profile_content(
 async def update_profile_content(
     data: UpdateProfileContentRequest,
     db: AsyncSession = Depends(get_db),
-    auth: tuple[User, APIKey] = Depends(get_current_user),
+    principal: AuthPrincipal = Depends(get_current_user),
 ) -> UpdateProfileContentResponse:
     """
     Update the authenticated user's profile content (bio).
 
     Creates a profile if one doesn't exist.
     """
-    user, _ = auth
-
     # Load profile with user
     result = await db.execute(
         select(User)
         .options(selectinload(User.profile))
-        .where(User.id == user.id)
+        .where(User.id == principal.user_id)
     )
     user = result.scalar_one()
 
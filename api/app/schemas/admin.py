@@ -1,6 +1,10 @@
 """Admin-related Pydantic schemas."""
 
-from pydantic import BaseModel
+from pydantic import BaseModel, EmailStr, Field
+
+from app.schemas.auth import Username
+
+MAX_BULK_PROVISION = 500
 
 
 class AdminUserInfo(BaseModel):
@@ -42,6 +46,47 @@ class RevokeKeysResponse(BaseModel):
     revoked_count: int
 
 
+class BotIdentity(BaseModel):
+    """One bot account to provision."""
+
+    username: Username
+    display_name: str | None = None
+    email: EmailStr | None = None
+    roles: list[str] | None = None  # Defaults to the registration roles
+    key_name: str = "Initial key"
+
+
+class BulkProvisionRequest(BaseModel):
+    """Request to create many password-less bot accounts at once."""
+
+    bots: list[BotIdentity] = Field(min_length=1, max_length=MAX_BULK_PROVISION)
+
+
+class ProvisionedBot(BaseModel):
+    """A bot account created by bulk provisioning."""
+
+    user_id: str
+    username: str
+    roles: list[str]
+    api_key: str  # Plaintext, only returned here
+    key_prefix: str
+
+
+class ProvisionConflict(BaseModel):
+    """A bot identity that was not created."""
+
+    username: str
+    code: str
+    message: str
+
+
+class BulkProvisionResponse(BaseModel):
+    """Response for POST /admin/bots endpoint."""
+
+    created: list[ProvisionedBot]
+    conflicts: list[ProvisionConflict]
+
+
 class ActivityLogEntry(BaseModel):
     """Single activity log entry."""
 
@@ -49,6 +94,7 @@ class ActivityLogEntry(BaseModel):
     timestamp: str
     user_id: str | None
     username: str | None
+    api_key_id: str | None = None
     action: str
     resource: str
     resource_id: str
@@ -61,3 +107,188 @@ class ListActivityResponse(BaseModel):
 
     items: list[ActivityLogEntry]
     next_cursor: str | None = None
+
+
+class AuthCacheStats(BaseModel):
+    """Principal cache counters for one worker."""
+
+    size: int
+    max_entries: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
+    auth_versions: int
+
+
+class LastSeenStats(BaseModel):
+    """Write-behind last-seen recorder counters for one worker."""
+
+    pending_keys: int
+    pending_users: int
+    flush_interval_seconds: float
+    flushes: int
+    keys_written: int
+    users_written: int
+    failures: int
+
+
+class PasswordHasherStats(BaseModel):
+    """Password hashing pool utilisation for one worker."""
+
+    max_workers: int
+    max_queue: int
+    active: int
+    queued: int
+    utilisation: float
+    completed: int
+    rejected: int
+    avg_wait_ms: float
+    max_wait_ms: float
+    avg_run_ms: float
+    bcrypt_rounds: int
+    bcrypt_hash_ms: float | None
+
+
+class KeyRateLimitStats(BaseModel):
+    """Per-API-key rate limiter counters for one worker."""
+
+    buckets: int
+    pending: int
+    sync_interval_seconds: float
+    allowed: int
+    limited: int
+    syncs: int
+    rows_synced: int
+    failures: int
+
+
+class LimitStorageStats(BaseModel):
+    """Shared IP rate limit counter storage for one worker."""
+
+    windows: int
+    pending: int
+    flush_interval_seconds: float
+    flushes: int
+    rows_flushed: int
+    fast_rejects: int
+    failures: int
+
+
+class IdempotencyCacheStats(BaseModel):
+    """Idempotent response replay cache counters for one worker."""
+
+    size: int
+    max_entries: int
+    max_body_bytes: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+
+
+class IdempotencyPartitionStats(BaseModel):
+    """Day partition maintenance for idempotency_keys, as seen by one worker."""
+
+    partitions: int
+    interval_seconds: float
+    runs: int
+    created: int
+    dropped: int
+    failures: int
+
+
+class ActivityWriterStats(BaseModel):
+    """Batched activity log writer counters for one worker."""
+
+    queued: int
+    max_queue: int
+    batch_size: int
+    flush_interval_seconds: float
+    overflow: str
+    written: int
+    dropped: int
+    sampled_out: int
+    blocked: int
+    reads_skipped: int
+    flushes: int
+    failures: int
+    rejected: int
+
+
+class ActivityPartitionStats(BaseModel):
+    """Range partition maintenance for activity_log, as seen by one worker."""
+
+    partitions: int
+    unit: str
+    retention_days: int
+    interval_seconds: float
+    runs: int
+    created: int
+    dropped: int
+    failures: int
+
+
+class ReadRollupStats(BaseModel):
+    """Article read counters pending in one worker."""
+
+    pending_buckets: int
+    pending_reads: int
+    flush_interval_seconds: float
+    flushes: int
+    reads_written: int
+    keys_written: int
+    failures: int
+
+
+class InboxStreamStats(BaseModel):
+    """Inbox SSE streams open in one worker."""
+
+    streams: int
+    users: int
+    notifications: int
+    wakeups: int
+
+
+class InboxCounterRepairStats(BaseModel):
+    """Inbox counter repair runs in one worker."""
+
+    interval_seconds: float
+    runs: int
+    users_checked: int
+    repaired: int
+    failures: int
+
+
+class InboxRetentionStats(BaseModel):
+    """Notification retention runs in one worker."""
+
+    mode: str
+    dry_run: bool
+    retention_days: int
+    interval_seconds: float
+    runs: int
+    batches: int
+    removed: int
+    eligible: int  # Last dry-run count
+    failures: int
+
+
+class SystemMetricsResponse(BaseModel):
+    """Response for GET /admin/metrics endpoint."""
+
+    auth_cache: AuthCacheStats
+    last_seen: LastSeenStats
+    password_hasher: PasswordHasherStats
+    rate_limit: KeyRateLimitStats
+    limit_storage: LimitStorageStats | None = None
+    idempotency_cache: IdempotencyCacheStats
+    idempotency_partitions: IdempotencyPartitionStats
+    activity_writer: ActivityWriterStats
+    activity_partitions: ActivityPartitionStats
+    read_rollup: ReadRollupStats
+    inbox_streams: InboxStreamStats
+    inbox_counter_repair: InboxCounterRepairStats
+    inbox_retention: InboxRetentionStats
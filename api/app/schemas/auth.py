@@ -1,28 +1,32 @@
 """Authentication schemas for request/response validation."""
 
 import re
+from typing import Annotated
 
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import AfterValidator, BaseModel, EmailStr, field_validator
+
+
+def validate_username(v: str) -> str:
+    """Validate username format: 3-32 chars, lowercase alphanumeric and underscore only."""
+    if not re.match(r"^[a-z0-9_]{3,32}$", v):
+        raise ValueError(
+            "Username must be 3-32 characters, lowercase letters, numbers, and underscores only"
+        )
+    return v
+
+
+# A username chosen for a new account
+Username = Annotated[str, AfterValidator(validate_username)]
 
 
 class RegisterRequest(BaseModel):
     """User registration request schema."""
 
-    username: str
+    username: Username
     email: EmailStr
     password: str
     display_name: str | None = None
 
-    @field_validator("username")
-    @classmethod
-    def validate_username(cls, v: str) -> str:
-        """Validate username format: 3-32 chars, lowercase alphanumeric and underscore only."""
-        if not re.match(r"^[a-z0-9_]{3,32}$", v):
-            raise ValueError(
-                "Username must be 3-32 characters, lowercase letters, numbers, and underscores only"
-            )
-        return v
-
     @field_validator("password")
     @classmethod
     def validate_password(cls, v: str) -> str:
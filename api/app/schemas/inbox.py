@@ -1,8 +1,11 @@
 """Inbox-related Pydantic schemas."""
 
-from typing import Any
+from typing import Any, Literal
+from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import AwareDatetime, BaseModel, Field, model_validator
+
+MAX_BULK_NOTIFICATIONS = 500
 
 
 class InboxSummaryResponse(BaseModel):
@@ -10,6 +13,8 @@ class InboxSummaryResponse(BaseModel):
 
     unread_count: int
     total_count: int
+    latest_at: str | None = None  # created_at of the newest notification
+    read_through: str | None = None  # everything created up to here is read
 
 
 class NotificationItem(BaseModel):
@@ -45,3 +50,33 @@ class MarkAllReadResponse(BaseModel):
     """Response for marking all notifications as read."""
 
     marked_count: int
+
+
+class BulkNotificationsRequest(BaseModel):
+    """Notifications to act on: up to 500 ids, or all created before a cursor."""
+
+    ids: list[UUID] | None = Field(default=None, min_length=1, max_length=MAX_BULK_NOTIFICATIONS)
+    # A created_at, e.g. a next_cursor from GET /inbox/notifications
+    before: AwareDatetime | None = None
+
+    @model_validator(mode="after")
+    def validate_selection(self) -> "BulkNotificationsRequest":
+        """Exactly one of ids and before."""
+        if (self.ids is None) == (self.before is None):
+            raise ValueError("Provide either ids or before")
+        return self
+
+
+class BulkNotificationResult(BaseModel):
+    """Outcome for one requested id."""
+
+    id: str
+    status: Literal["read", "already_read", "deleted", "not_found"]
+    read_at: str | None = None
+
+
+class BulkNotificationsResponse(BaseModel):
+    """Response for bulk mark-read and bulk delete."""
+
+    count: int  # Notifications marked read or deleted
+    results: list[BulkNotificationResult]  # Per id, in request order (empty for before)
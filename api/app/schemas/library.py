@@ -177,3 +177,19 @@ class ListRevisionsResponse(BaseModel):
     items: list[RevisionListItem]
     article_slug: str
     current_version: int
+
+
+class ArticleReadHourItem(BaseModel):
+    """Reads of an article in one UTC hour."""
+
+    hour: str
+    reads: int
+    distinct_keys: int  # API keys that read the article during the hour
+
+
+class ArticleReadsResponse(BaseModel):
+    """Response for article read statistics, newest hour first."""
+
+    slug: str
+    reads: int  # Total over the requested hours
+    items: list[ArticleReadHourItem]
@@ -1,26 +1,477 @@
-"""Activity logging service for audit trail."""
+"""Activity logging service for audit trail.
 
-from datetime import datetime, timezone
-from typing import Any, Literal
+Request handlers never write activity_log rows themselves. `log_activity`
+builds the row in memory and hands it to `activity_writer`, a per-worker
+queue drained by a background task that writes whole batches with one COPY
+(asyncpg `copy_records_to_table`). Auditing therefore costs a request a few
+microseconds instead of an INSERT in its transaction.
+
+When the queue is full the configured overflow policy applies: "block"
+makes the request wait for the next flush (for at most block_timeout_seconds,
+then the event is dropped), "drop" discards the new event, and "sample"
+starts keeping only a fraction of new events once the queue is half full,
+then drops when it is full. Every discarded event is counted.
+
+A batch that keeps failing is retried up to max_attempts times, then written
+one event at a time; events Postgres still refuses are logged and counted as
+rejected instead of blocking the queue forever.
+
+Reads are sampled before they reach the queue: activity_log_read_sample_rates
+sets the fraction of "read" events audited per resource. Exact article read
+counts are kept by app.services.read_rollup instead.
+
+activity_log is range-partitioned on timestamp (monthly by default).
+ActivityPartitions keeps partitions created ahead of time and drops whole
+partitions once they fall out of the retention window, so inserts always land
+in a small, hot partition and retention never deletes rows one by one.
+"""
+
+import asyncio
+import ipaddress
+import json
+import logging
+import random
+import re
+import uuid
+from collections import deque
+from datetime import UTC, datetime, timedelta
+from typing import Any, Literal, NamedTuple
 from uuid import UUID
 
+from asyncpg.exceptions import ForeignKeyViolationError, PostgresError
 from fastapi import Request
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
+from app.database import AsyncSessionLocal
 from app.models.activity import ActivityLog
+from app.services.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
 
 # Type aliases
 ActionType = Literal["read", "create", "update", "delete"]
 ResourceType = Literal[
     "article", "bulletin_post", "bulletin_comment", "profile", "user", "api_key"
 ]
+OverflowPolicy = Literal["block", "drop", "sample"]
+PartitionUnit = Literal["day", "week", "month"]
+
+# Partition DDL waits at most this long for locks held by running queries
+PARTITION_LOCK_TIMEOUT = "2s"
+PARTITION_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+class ActivityEvent(NamedTuple):
+    """One activity_log row, in COPY column order."""
+
+    id: UUID
+    timestamp: datetime
+    user_id: UUID | None
+    api_key_id: UUID | None
+    action: str
+    resource: str
+    resource_id: UUID
+    request_id: str | None
+    ip_address: str | None
+    user_agent: str
+    extra_data: str  # JSON text
+
+
+COLUMNS = list(ActivityEvent._fields)
+
+# Fallback for batches that reference users or keys deleted since they were
+# queued: missing references become NULL, as ON DELETE SET NULL would make them
+INSERT_CHECKED = """
+    INSERT INTO activity_log (
+        id, timestamp, user_id, api_key_id, action, resource, resource_id,
+        request_id, ip_address, user_agent, extra_data
+    )
+    SELECT $1, $2,
+        (SELECT id FROM users WHERE id = $3),
+        (SELECT id FROM api_keys WHERE id = $4),
+        $5::activity_action, $6::resource_type, $7, $8, $9::inet, $10, $11::jsonb
+"""
+
+
+class ActivityWriter:
+    """Bounded in-memory queue of activity events, written in batches."""
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval_seconds: float,
+        max_queue: int,
+        overflow: OverflowPolicy,
+        sample_rate: float,
+        max_attempts: int = 3,
+        block_timeout_seconds: float = 1.0,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.sample_rate = sample_rate
+        self.max_attempts = max_attempts
+        self.block_timeout_seconds = block_timeout_seconds
+        self._queue: deque[ActivityEvent] = deque()
+        self._attempts = 0
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.blocked = 0
+        self.reads_skipped = 0
+        self.flushes = 0
+        self.failures = 0
+        self.rejected = 0
+
+    async def log(self, event: ActivityEvent) -> bool:
+        """
+        Queue an event. No I/O; only waits under the "block" policy, and
+        drops the event if the queue has not drained within
+        block_timeout_seconds.
+
+        Returns whether the event was kept.
+        """
+        if self.overflow == "block":
+            deadline = asyncio.get_running_loop().time() + self.block_timeout_seconds
+            while len(self._queue) >= self.max_queue:
+                self.blocked += 1
+                self._wakeup.set()
+                self._drained.clear()
+                try:
+                    timeout = deadline - asyncio.get_running_loop().time()
+                    await asyncio.wait_for(self._drained.wait(), timeout=max(timeout, 0))
+                except TimeoutError:
+                    self.dropped += 1
+                    return False
+        elif len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return False
+        elif (
+            self.overflow == "sample"
+            and len(self._queue) >= self.max_queue // 2
+            and random.random() >= self.sample_rate
+        ):
+            self.sampled_out += 1
+            return False
+
+        self._queue.append(event)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self, db: AsyncSession) -> int:
+        """
+        Write every queued event in batches of batch_size and commit each.
+
+        Returns the number of events written. On failure the unwritten
+        batch is put back at the head of the queue for the next flush; once
+        it has failed max_attempts times it is written event by event and
+        the events that still fail are rejected.
+        """
+        total = 0
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            try:
+                try:
+                    await _copy(db, batch)
+                    await db.commit()
+                except ForeignKeyViolationError:
+                    await db.rollback()
+                    await _insert_checked(db, batch)
+                    await db.commit()
+                written = len(batch)
+            except Exception:
+                await db.rollback()
+                self.failures += 1
+                self._attempts += 1
+                if self._attempts < self.max_attempts:
+                    self._queue.extendleft(reversed(batch))
+                    raise
+                logger.warning(
+                    "Activity log batch failed %d times, writing its %d events one by one",
+                    self._attempts,
+                    len(batch),
+                )
+                written = await self._write_each(db, batch)
+            self._attempts = 0
+            total += written
+            self.written += written
+            self._drained.set()
+        self.flushes += 1
+        return total
+
+    async def _write_each(self, db: AsyncSession, batch: list[ActivityEvent]) -> int:
+        """
+        Write a batch one event per transaction, rejecting events Postgres refuses.
+
+        Any other error (the database is unreachable, say) puts the rest of
+        the batch back and is raised.
+        """
+        written = 0
+        for position, event in enumerate(batch):
+            try:
+                await _insert_checked(db, [event])
+                await db.commit()
+            except PostgresError:
+                await db.rollback()
+                self.rejected += 1
+                logger.exception("Rejected activity event that cannot be written: %r", event)
+                continue
+            except Exception:
+                await db.rollback()
+                self._queue.extendleft(reversed(batch[position:]))
+                raise
+            written += 1
+        return written
+
+    async def start(self) -> None:
+        """Start the background writer."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="activity-writer")
+
+    async def stop(self) -> None:
+        """Stop the writer and write whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._flush_with_new_session()
+
+    def clear(self) -> None:
+        """Drop queued events without writing them."""
+        self._queue.clear()
+        self._drained.set()
+
+    def stats(self) -> dict[str, int | float | str]:
+        """Return counters for monitoring."""
+        return {
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval_seconds,
+            "overflow": self.overflow,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "blocked": self.blocked,
+            "reads_skipped": self.reads_skipped,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._queue:
+                await self._flush_with_new_session()
+
+    async def _flush_with_new_session(self) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.flush(db)
+        except Exception:
+            logger.exception("Failed to write activity log batch")
+
+
+async def _copy(db: AsyncSession, batch: list[ActivityEvent]) -> None:
+    """COPY a batch into activity_log over the session's connection."""
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        "activity_log", records=batch, columns=COLUMNS
+    )
+
+
+async def _insert_checked(db: AsyncSession, batch: list[ActivityEvent]) -> None:
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.executemany(INSERT_CHECKED, batch)
+
+
+class ActivityPartitions(PeriodicTask):
+    """
+    Keeps activity_log range-partitioned on timestamp.
+
+    Each run creates the partition for the current period and the next
+    `ahead` periods, then detaches and drops every partition that ends
+    before the retention window. Periods are UTC days, ISO weeks or calendar
+    months; a new period is skipped if it overlaps an existing partition, so
+    changing the unit takes effect once the old partitions run out. The
+    first run happens at startup.
+    """
+
+    name = "activity-partitions"
+    run_on_start = True
+
+    def __init__(
+        self,
+        unit: PartitionUnit,
+        ahead: int,
+        retention_days: int,
+        interval_seconds: float,
+    ):
+        super().__init__(interval_seconds)
+        self.unit = unit
+        self.ahead = ahead
+        self.retention_days = retention_days
+        self.partitions = 0
+        self.runs = 0
+        self.created = 0
+        self.dropped = 0
+        self.failures = 0
+
+    async def maintain(self, db: AsyncSession, now: datetime | None = None) -> tuple[int, int]:
+        """
+        Create upcoming partitions and drop expired ones.
+
+        Returns (created, dropped). Every create and drop commits on its own
+        under lock_timeout, so one that cannot get its lock is retried on the
+        next run while partitions created ahead keep inserts working.
+        """
+        now = now or datetime.now(UTC)
+        existing = await list_partitions(db)
+
+        created = 0
+        dropped = 0
+        try:
+            start = partition_start(now, self.unit)
+            for _ in range(self.ahead + 1):
+                end = next_partition_start(start, self.unit)
+                if not any(lower < end and start < upper for lower, upper in existing.values()):
+                    name = _partition_name(start, self.unit)
+                    await db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+                    await db.execute(
+                        text(
+                            f"CREATE TABLE IF NOT EXISTS {name} "
+                            f"PARTITION OF {ActivityLog.__tablename__} "
+                            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                        )
+                    )
+                    await db.commit()
+                    existing[name] = (start, end)
+                    created += 1
+                start = end
+
+            cutoff = now - timedelta(days=self.retention_days)
+            for name, (_, upper) in sorted(existing.items(), key=lambda item: item[1]):
+                if upper > cutoff:
+                    continue
+                await db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+                await db.execute(
+                    text(f"ALTER TABLE {ActivityLog.__tablename__} DETACH PARTITION {name}")
+                )
+                await db.execute(text(f"DROP TABLE {name}"))
+                await db.commit()
+                dropped += 1
+        except Exception:
+            await db.rollback()
+            self.failures += 1
+            raise
+        finally:
+            self.created += created
+            self.dropped += dropped
+            self.partitions = len(existing) - dropped
+
+        self.runs += 1
+        return created, dropped
+
+    async def run_once(self, db: AsyncSession) -> tuple[int, int]:
+        """Maintain partitions (the periodic task's work)."""
+        return await self.maintain(db)
+
+    def stats(self) -> dict[str, int | float | str]:
+        """Return counters for monitoring."""
+        return {
+            "partitions": self.partitions,
+            "unit": self.unit,
+            "retention_days": self.retention_days,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "created": self.created,
+            "dropped": self.dropped,
+            "failures": self.failures,
+        }
+
+
+def partition_start(moment: datetime, unit: PartitionUnit) -> datetime:
+    """Start of the UTC day, ISO week or month containing `moment`."""
+    day = moment.astimezone(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == "month":
+        return day.replace(day=1)
+    if unit == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def next_partition_start(start: datetime, unit: PartitionUnit) -> datetime:
+    """Start of the period after the one beginning at `start`."""
+    if unit == "month":
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=7 if unit == "week" else 1)
+
+
+def _partition_name(start: datetime, unit: PartitionUnit) -> str:
+    suffix = f"{start:%Y%m}" if unit == "month" else f"{start:%Y%m%d}"
+    return f"{ActivityLog.__tablename__}_p{suffix}"
+
+
+async def list_partitions(db: AsyncSession) -> dict[str, tuple[datetime, datetime]]:
+    """Existing partitions of activity_log with their [lower, upper) bounds."""
+    result = await db.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:parent AS regclass)"
+        ),
+        {"parent": ActivityLog.__tablename__},
+    )
+    partitions = {}
+    for name, bound in result.all():
+        match = PARTITION_BOUND.search(bound or "")
+        if match:
+            lower, upper = (datetime.fromisoformat(value) for value in match.groups())
+            partitions[name] = (lower, upper)
+    return partitions
+
+
+def _client_ip(request: Request) -> str | None:
+    """The client address if it is an IP (activity_log.ip_address is INET)."""
+    if request.client is None:
+        return None
+    try:
+        return str(ipaddress.ip_address(request.client.host))
+    except ValueError:
+        return None
 
 
 class ActivityService:
     """Service for logging user activity."""
 
-    def __init__(self, db: AsyncSession):
-        self.db = db
+    def __init__(
+        self,
+        writer: ActivityWriter | None = None,
+        read_sample_rates: dict[str, float] | None = None,
+    ):
+        self.writer = writer or activity_writer
+        self.read_sample_rates = (
+            settings.activity_log_read_sample_rates
+            if read_sample_rates is None
+            else read_sample_rates
+        )
 
     async def log(
         self,
@@ -31,10 +482,16 @@ class ActivityService:
         resource: ResourceType,
         resource_id: UUID,
         metadata: dict[str, Any] | None = None,
-    ) -> ActivityLog:
+    ) -> ActivityEvent | None:
         """
         Log an activity event.
 
+        The event is queued for the background writer; nothing is added to
+        the caller's session. Returns the queued event, or None when it was
+        not queued: a read left out by sampling, or an event the writer
+        dropped or sampled out under its overflow policy (both counted in
+        its stats).
+
         Args:
             request: FastAPI Request object (for IP, user-agent, request_id)
             user_id: ID of the user performing the action
@@ -44,31 +501,27 @@ class ActivityService:
             resource_id: ID of the resource
             metadata: Optional additional context
         """
-        # Extract HTTP context from request
-        request_id = getattr(request.state, "request_id", None)
-        ip_address = request.client.host if request.client else None
-        user_agent = request.headers.get("user-agent", "")[:512]  # Truncate to 512 chars
+        if action == "read" and random.random() >= self.read_sample_rates.get(resource, 1.0):
+            self.writer.reads_skipped += 1
+            return None
 
-        log_entry = ActivityLog(
-            timestamp=datetime.now(timezone.utc),
+        event = ActivityEvent(
+            id=uuid.uuid4(),
+            timestamp=datetime.now(UTC),
             user_id=user_id,
             api_key_id=api_key_id,
             action=action,
             resource=resource,
             resource_id=resource_id,
-            request_id=request_id,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            extra_data=metadata or {},
+            request_id=getattr(request.state, "request_id", None),
+            ip_address=_client_ip(request),
+            user_agent=request.headers.get("user-agent", "")[:512],  # Truncate to 512 chars
+            extra_data=json.dumps(metadata or {}),
         )
-
-        self.db.add(log_entry)
-        # Don't commit here - let the caller handle the transaction
-        return log_entry
+        return event if await self.writer.log(event) else None
 
 
 async def log_activity(
-    db: AsyncSession,
     request: Request,
     user_id: UUID | None,
     api_key_id: UUID | None,
@@ -76,22 +529,21 @@ async def log_activity(
     resource: ResourceType,
     resource_id: UUID,
     metadata: dict[str, Any] | None = None,
-) -> ActivityLog:
+) -> ActivityEvent | None:
     """
     Convenience function to log activity without instantiating service.
 
     Usage in endpoints:
         await log_activity(
-            db=db,
             request=request,
-            user_id=user.id,
-            api_key_id=api_key.id,
+            user_id=principal.user_id,
+            api_key_id=principal.api_key_id,
             action="create",
             resource="article",
             resource_id=article.id,
         )
     """
-    service = ActivityService(db)
+    service = ActivityService()
     return await service.log(
         request=request,
         user_id=user_id,
@@ -101,3 +553,27 @@ async def log_activity(
         resource_id=resource_id,
         metadata=metadata,
     )
+
+
+activity_writer = ActivityWriter(
+    batch_size=settings.activity_log_batch_size,
+    flush_interval_seconds=settings.activity_log_flush_interval_seconds,
+    max_queue=settings.activity_log_max_queue,
+    overflow=settings.activity_log_overflow,
+    sample_rate=settings.activity_log_overflow_sample_rate,
+    max_attempts=settings.activity_log_max_attempts,
+    block_timeout_seconds=settings.activity_log_block_timeout_seconds,
+)
+
+
+def get_activity_writer() -> ActivityWriter:
+    """Get the global activity writer instance."""
+    return activity_writer
+
+
+activity_partitions = ActivityPartitions(
+    unit=settings.activity_log_partition_unit,
+    ahead=settings.activity_log_partitions_ahead,
+    retention_days=settings.activity_log_retention_days,
+    interval_seconds=settings.activity_log_partition_interval_seconds,
+)
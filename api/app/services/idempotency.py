@@ -1,21 +1,50 @@
-"""Idempotency service for safe write operation retries."""
+"""Idempotency service for safe write operation retries.
 
+Writes carrying an X-Idempotency-Key are fingerprinted (method, path, body
+hash) and recorded in idempotency_keys before they run. A retry with the
+same key replays the stored response instead of repeating the write; the
+same key with a different request, or while the first is still running, is
+rejected with 409.
+
+Responses are stored as the exact status, headers and body bytes that were
+sent, gzip-compressed above idempotency_compress_min_bytes, so a replay is a
+byte copy rather than a re-serialisation, and clients that accept gzip get
+the compressed bytes as they are.
+
+Completed responses are also kept in a small per-worker LRU so the hot case,
+a bot retrying a request that just finished, is answered without a query.
+
+The table is range-partitioned by UTC day. With a 24 hour TTL a key can only
+be live in today's or yesterday's partition, so lookups touch those two and
+IdempotencyPartitions expires keys by dropping older partitions whole.
+"""
+
+import gzip
 import hashlib
-import json
-from datetime import datetime, timedelta, timezone
-from typing import Any
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import exists, literal, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.models.idempotency import IdempotencyKey
+from app.services.periodic import PeriodicTask
 
 # Idempotency keys expire after 24 hours
 IDEMPOTENCY_TTL = timedelta(hours=24)
 
+# Dropping a partition briefly locks the parent; give up rather than queue writes
+PARTITION_LOCK_TIMEOUT = "2s"
+
+# Recomputed on replay, or specific to the original exchange
+UNSTORED_HEADERS = frozenset({b"content-length", b"set-cookie"})
+
 
 class IdempotencyService:
     """Service for handling idempotency keys on write operations."""
@@ -35,44 +64,79 @@ class IdempotencyService:
         method: str,
         path: str,
         request_hash: str,
-    ) -> tuple[bool, dict | None]:
+    ) -> tuple[bool, "CachedResponse | None"]:
         """
         Attempt to acquire idempotency lock.
 
+        A single INSERT ... ON CONFLICT DO UPDATE ... RETURNING claims the key
+        in today's partition when it is new, expired or failed, and inserts
+        nothing while an earlier live partition still holds it. Only when it
+        returns nothing is the existing row read to decide between replay
+        and conflict. The caller commits.
+
         Returns:
             (True, None) - Lock acquired, proceed with request
             (False, cached_response) - Request already completed, return cached
+                as a CachedResponse
 
         Raises:
             HTTPException(409) - Conflict (different payload or in-progress)
         """
-        now = datetime.now(timezone.utc)
+        now = datetime.now(UTC)
         cutoff = now - IDEMPOTENCY_TTL
+        days = live_partition_days(now)
 
-        # Try to insert with PROCESSING status
-        try:
-            new_key = IdempotencyKey(
-                key=key,
-                user_id=user_id,
-                method=method,
-                path=path,
-                request_hash=request_hash,
-                status="processing",
-                created_at=now,
-            )
-            self.db.add(new_key)
-            await self.db.flush()
+        held_earlier = exists().where(
+            IdempotencyKey.key == key,
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.created_on.in_(days[:-1]),
+            IdempotencyKey.created_at >= cutoff,
+            IdempotencyKey.status != "failed",
+        )
+        claim = select(
+            literal(key, IdempotencyKey.key.type),
+            literal(user_id, IdempotencyKey.user_id.type),
+            literal(method, IdempotencyKey.method.type),
+            literal(path, IdempotencyKey.path.type),
+            literal(request_hash, IdempotencyKey.request_hash.type),
+            literal("processing", IdempotencyKey.status.type),
+            literal(now, IdempotencyKey.created_at.type),
+            literal(days[-1], IdempotencyKey.created_on.type),
+        ).where(~held_earlier)
+        stmt = pg_insert(IdempotencyKey).from_select(
+            ["key", "user_id", "method", "path", "request_hash", "status", "created_at", "created_on"],
+            claim,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key, IdempotencyKey.user_id, IdempotencyKey.created_on],
+            set_={
+                "method": stmt.excluded.method,
+                "path": stmt.excluded.path,
+                "request_hash": stmt.excluded.request_hash,
+                "status": "processing",
+                "response_status": None,
+                "response_headers": None,
+                "response_bytes": None,
+                "response_encoding": None,
+                "created_at": stmt.excluded.created_at,
+                "completed_at": None,
+            },
+            # Expired keys may be reused; failed requests changed nothing
+            where=(IdempotencyKey.created_at < cutoff) | (IdempotencyKey.status == "failed"),
+        ).returning(IdempotencyKey.key)
+
+        if (await self.db.execute(stmt)).first() is not None:
             return (True, None)  # Lock acquired
-        except IntegrityError:
-            await self.db.rollback()
-            # Key exists, check status
 
-        # Key exists - fetch current state
+        # Key exists and is live - fetch current state (prunes to live partitions)
         result = await self.db.execute(
             select(IdempotencyKey)
             .where(IdempotencyKey.key == key)
             .where(IdempotencyKey.user_id == user_id)
-            .with_for_update()
+            .where(IdempotencyKey.created_on.in_(days))
+            .where(IdempotencyKey.created_at >= cutoff)
+            .order_by(IdempotencyKey.created_at.desc())
+            .limit(1)
         )
         record = result.scalar_one_or_none()
 
@@ -88,99 +152,349 @@ class IdempotencyService:
                 },
             )
 
-        # Check if expired - allow reuse
-        if record.created_at < cutoff:
-            await self.db.delete(record)
-            await self.db.flush()
-
-            # Create new entry
-            new_key = IdempotencyKey(
-                key=key,
-                user_id=user_id,
-                method=method,
-                path=path,
-                request_hash=request_hash,
-                status="processing",
-                created_at=now,
-            )
-            self.db.add(new_key)
-            await self.db.flush()
-            return (True, None)
-
         # Check for payload mismatch
         if (
             record.method != method
             or record.path != path
             or record.request_hash != request_hash
         ):
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail={
-                    "error": {
-                        "code": "IDEMPOTENCY_CONFLICT",
-                        "message": "Idempotency key reused with different request",
-                    }
-                },
-            )
-
-        # Same request - check status
-        if record.status == "processing":
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail={
-                    "error": {
-                        "code": "IDEMPOTENCY_IN_PROGRESS",
-                        "message": "Request with this idempotency key is currently processing",
-                    }
-                },
-            )
+            raise idempotency_conflict()
 
         if record.status == "completed":
             return (
                 False,
-                {
-                    "body": record.response_body,
-                    "status": record.response_status,
-                },
+                CachedResponse(
+                    method=record.method,
+                    path=record.path,
+                    request_hash=record.request_hash,
+                    status_code=record.response_status,
+                    headers=tuple(
+                        (name.encode("latin-1"), value.encode("latin-1"))
+                        for name, value in record.response_headers or ()
+                    ),
+                    body=record.response_bytes or b"",
+                    content_encoding=record.response_encoding,
+                    created_at=record.created_at.timestamp(),
+                ),
             )
 
-        # FAILED status - allow retry
-        record.status = "processing"
-        record.created_at = now
-        await self.db.flush()
-        return (True, None)
-
-    async def complete(
-        self,
-        key: str,
-        user_id: UUID,
-        response: dict[str, Any],
-        status_code: int,
-    ) -> None:
-        """Mark request as completed with cached response."""
-        result = await self.db.execute(
-            select(IdempotencyKey)
-            .where(IdempotencyKey.key == key)
-            .where(IdempotencyKey.user_id == user_id)
+        # Processing (or failed and just reclaimed by a concurrent retry)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "error": {
+                    "code": "IDEMPOTENCY_IN_PROGRESS",
+                    "message": "Request with this idempotency key is currently processing",
+                }
+            },
         )
-        record = result.scalar_one_or_none()
 
-        if record:
-            record.status = "completed"
-            record.response_body = response
-            record.response_status = status_code
-            record.completed_at = datetime.now(timezone.utc)
-            await self.db.flush()
+    async def complete(self, key: str, user_id: UUID, response: "CachedResponse") -> None:
+        """Mark request as completed with the response as sent."""
+        await self.db.execute(
+            update(IdempotencyKey)
+            .where(*_claimed(key, user_id))
+            .values(
+                status="completed",
+                response_status=response.status_code,
+                response_headers=[
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in response.headers
+                ],
+                response_bytes=response.body,
+                response_encoding=response.content_encoding,
+                completed_at=datetime.now(UTC),
+            )
+        )
 
     async def fail(self, key: str, user_id: UUID) -> None:
         """Mark request as failed (allows retry with same key)."""
-        result = await self.db.execute(
-            select(IdempotencyKey)
-            .where(IdempotencyKey.key == key)
-            .where(IdempotencyKey.user_id == user_id)
+        await self.db.execute(
+            update(IdempotencyKey)
+            .where(*_claimed(key, user_id))
+            .values(status="failed")
         )
-        record = result.scalar_one_or_none()
 
-        if record:
-            record.status = "failed"
-            await self.db.flush()
+
+def live_partition_days(now: datetime) -> list[date]:
+    """UTC days whose partitions can hold unexpired keys, oldest first."""
+    oldest = (now - IDEMPOTENCY_TTL).date()
+    return [oldest + timedelta(days=i) for i in range((now.date() - oldest).days + 1)]
+
+
+def _claimed(key: str, user_id: UUID) -> tuple:
+    """WHERE clauses for the processing row this worker claimed."""
+    return (
+        IdempotencyKey.key == key,
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.created_on.in_(live_partition_days(datetime.now(UTC))),
+        IdempotencyKey.status == "processing",
+    )
+
+
+def idempotency_conflict() -> HTTPException:
+    """The error for a key reused with a different request."""
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "error": {
+                "code": "IDEMPOTENCY_CONFLICT",
+                "message": "Idempotency key reused with different request",
+            }
+        },
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    """A completed write's fingerprint and the response it produced, as sent."""
+
+    method: str
+    path: str
+    request_hash: str
+    status_code: int
+    headers: tuple[tuple[bytes, bytes], ...]  # Raw ASGI headers, without Content-Length
+    body: bytes  # Compressed when content_encoding is set
+    content_encoding: str | None
+    created_at: float  # Unix time the key was claimed; expires with it
+
+    @classmethod
+    def capture(
+        cls,
+        method: str,
+        path: str,
+        request_hash: str,
+        status_code: int,
+        headers: list[tuple[bytes, bytes]],
+        body: bytes,
+        created_at: float,
+    ) -> "CachedResponse":
+        """Build an entry from a sent response, compressing large bodies."""
+        already_encoded = any(name.lower() == b"content-encoding" for name, _ in headers)
+        content_encoding = None
+        if not already_encoded and len(body) >= settings.idempotency_compress_min_bytes:
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+            content_encoding = "gzip"
+        return cls(
+            method=method,
+            path=path,
+            request_hash=request_hash,
+            status_code=status_code,
+            headers=tuple(
+                (name, value)
+                for name, value in headers
+                if name.lower() not in UNSTORED_HEADERS
+            ),
+            body=body,
+            content_encoding=content_encoding,
+            created_at=created_at,
+        )
+
+    def matches(self, method: str, path: str, request_hash: str) -> bool:
+        """Whether a retry is the same request as the one cached."""
+        return (self.method, self.path, self.request_hash) == (method, path, request_hash)
+
+    def encoded(self, accept_gzip: bool) -> tuple[list[tuple[bytes, bytes]], bytes]:
+        """
+        Headers and body to send on replay.
+
+        Compressed bodies go out untouched to clients that accept gzip and
+        are inflated for the rest; either way the client sees the original
+        bytes.
+        """
+        headers = list(self.headers)
+        body = self.body
+        if self.content_encoding is not None:
+            if accept_gzip:
+                headers.append((b"content-encoding", self.content_encoding.encode("latin-1")))
+                headers.append((b"vary", b"Accept-Encoding"))
+            else:
+                body = gzip.decompress(body)
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        return headers, body
+
+
+class ReplayCache:
+    """Bounded LRU of completed responses by (user_id, idempotency key), per worker."""
+
+    def __init__(self, max_entries: int, max_body_bytes: int):
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self._entries: OrderedDict[tuple[UUID, str], CachedResponse] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: UUID, key: str) -> CachedResponse | None:
+        """Return the cached response for a live key, or None."""
+        entry = self._entries.get((user_id, key))
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.time() - entry.created_at > IDEMPOTENCY_TTL.total_seconds():
+            del self._entries[(user_id, key)]
+            self.misses += 1
+            return None
+        self._entries.move_to_end((user_id, key))
+        self.hits += 1
+        return entry
+
+    def put(self, user_id: UUID, key: str, response: CachedResponse) -> None:
+        """Remember a completed response; large bodies are left to the database."""
+        if self.max_entries <= 0 or len(response.body) > self.max_body_bytes:
+            return
+        self._entries[(user_id, key)] = response
+        self._entries.move_to_end((user_id, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        """Return counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "max_body_bytes": self.max_body_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class IdempotencyPartitions(PeriodicTask):
+    """
+    Keeps idempotency_keys partitioned by UTC day.
+
+    Each run creates the partitions for the live days and the next
+    `days_ahead`, then detaches and drops every partition older than the
+    oldest live day. Dropping a partition expires a whole day of keys at the
+    cost of a catalog change, with no per-row deletes or vacuum work. The
+    first run happens at startup.
+    """
+
+    name = "idempotency-partitions"
+    run_on_start = True
+
+    def __init__(self, interval_seconds: float, days_ahead: int = 1):
+        super().__init__(interval_seconds)
+        self.days_ahead = days_ahead
+        self.partitions = 0
+        self.runs = 0
+        self.created = 0
+        self.dropped = 0
+        self.failures = 0
+
+    async def maintain(self, db: AsyncSession, now: datetime | None = None) -> tuple[int, int]:
+        """
+        Create upcoming partitions and drop expired ones.
+
+        Returns (created, dropped). Creation commits before any drop, and
+        each drop commits on its own, so a drop that cannot get its lock
+        within lock_timeout is simply retried on the next run.
+        """
+        now = now or datetime.now(UTC)
+        days = live_partition_days(now)
+        wanted = days + [days[-1] + timedelta(days=i) for i in range(1, self.days_ahead + 1)]
+        existing = await list_partitions(db)
+
+        created = 0
+        for day in wanted:
+            if day not in existing:
+                await db.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {_partition_name(day)} "
+                        f"PARTITION OF {IdempotencyKey.__tablename__} "
+                        f"FOR VALUES FROM ('{day.isoformat()}') "
+                        f"TO ('{(day + timedelta(days=1)).isoformat()}')"
+                    )
+                )
+                created += 1
+        await db.commit()
+
+        dropped = 0
+        try:
+            for day, name in sorted(existing.items()):
+                if day >= days[0]:
+                    continue
+                await db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+                await db.execute(
+                    text(f"ALTER TABLE {IdempotencyKey.__tablename__} DETACH PARTITION {name}")
+                )
+                await db.execute(text(f"DROP TABLE {name}"))
+                await db.commit()
+                dropped += 1
+        except Exception:
+            await db.rollback()
+            self.failures += 1
+            raise
+        finally:
+            self.created += created
+            self.dropped += dropped
+            self.partitions = len(existing) + created - dropped
+
+        self.runs += 1
+        return created, dropped
+
+    async def run_once(self, db: AsyncSession) -> tuple[int, int]:
+        """Maintain partitions (the periodic task's work)."""
+        return await self.maintain(db)
+
+    def stats(self) -> dict[str, int | float]:
+        """Return counters for monitoring."""
+        return {
+            "partitions": self.partitions,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "created": self.created,
+            "dropped": self.dropped,
+            "failures": self.failures,
+        }
+
+
+def _partition_name(day: date) -> str:
+    return f"{IdempotencyKey.__tablename__}_p{day:%Y%m%d}"
+
+
+async def list_partitions(db: AsyncSession) -> dict[date, str]:
+    """Existing day partitions of idempotency_keys by day."""
+    result = await db.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:parent AS regclass)"
+        ),
+        {"parent": IdempotencyKey.__tablename__},
+    )
+    prefix = f"{IdempotencyKey.__tablename__}_p"
+    partitions = {}
+    for (name,) in result.all():
+        if name.startswith(prefix):
+            partitions[datetime.strptime(name[len(prefix):], "%Y%m%d").date()] = name
+    return partitions
+
+
+replay_cache = ReplayCache(
+    max_entries=settings.idempotency_cache_max_entries,
+    max_body_bytes=settings.idempotency_cache_max_body_bytes,
+)
+
+
+def get_replay_cache() -> ReplayCache:
+    """Get the global idempotency replay cache instance."""
+    return replay_cache
+
+
+idempotency_partitions = IdempotencyPartitions(
+    interval_seconds=settings.idempotency_partition_interval_seconds,
+)
+
+
+def get_idempotency_partitions() -> IdempotencyPartitions:
+    """Get the global idempotency partition maintainer instance."""
+    return idempotency_partitions
@@ -0,0 +1,180 @@
+"""Per-user inbox counters: the read watermark and the repair job.
+
+inbox_counters is maintained by statement-level triggers on notifications,
+so it only drifts if those are bypassed (a trigger disabled for a bulk
+load, a restore of one table without the other). InboxCounterRepair
+periodically recounts users in batches and rewrites any row that differs.
+
+A recount must not lose increments made by transactions running alongside
+it. Each batch therefore first locks its counter rows, which waits out any
+writer that already adjusted them and makes later writers wait, and only
+then counts notifications in a fresh snapshot that includes every
+committed change.
+
+read_through is the user's read watermark: every notification created at or
+before it counts as read, whatever its read_at. Mark-all-read moves the
+watermark instead of stamping read_at on each unread row.
+"""
+
+import logging
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.services.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+USER_IDS = bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True)))
+
+NEXT_USERS = text("SELECT id FROM users WHERE id > :after ORDER BY id LIMIT :limit")
+ENSURE_ROWS = text(
+    "INSERT INTO inbox_counters (user_id) "
+    "SELECT id FROM users WHERE id = ANY(:ids) ORDER BY id "
+    "ON CONFLICT (user_id) DO NOTHING"
+).bindparams(USER_IDS)
+LOCK_ROWS = text(
+    "SELECT user_id FROM inbox_counters WHERE user_id = ANY(:ids) ORDER BY user_id FOR UPDATE"
+).bindparams(USER_IDS)
+RECOUNT = text(
+    """
+    UPDATE inbox_counters AS c
+    SET unread = x.unread, total = x.total, latest_at = x.latest_at
+    FROM (
+        SELECT k.user_id,
+               COUNT(n.id) FILTER (
+                   WHERE n.read_at IS NULL AND n.created_at > COALESCE(k.read_through, '-infinity')
+               ) AS unread,
+               COUNT(n.id) AS total,
+               MAX(n.created_at) AS latest_at
+        FROM inbox_counters k
+        LEFT JOIN notifications n ON n.user_id = k.user_id
+        WHERE k.user_id = ANY(:ids)
+        GROUP BY k.user_id
+    ) x
+    WHERE c.user_id = x.user_id
+      AND (c.unread, c.total, c.latest_at) IS DISTINCT FROM (x.unread, x.total, x.latest_at)
+    RETURNING c.user_id
+    """
+).bindparams(USER_IDS)
+
+# Locks the row, so the recount below sees every committed notification
+# and inserts committed after it wait for (and use) the new watermark
+ADVANCE_WATERMARK = text(
+    """
+    INSERT INTO inbox_counters AS c (user_id, read_through) VALUES (:user_id, :read_through)
+    ON CONFLICT (user_id) DO UPDATE
+    SET read_through = GREATEST(c.read_through, EXCLUDED.read_through)
+    RETURNING c.unread
+    """
+)
+RECOUNT_UNREAD = text(
+    """
+    UPDATE inbox_counters AS c
+    SET unread = (
+        SELECT COUNT(*) FROM notifications n
+        WHERE n.user_id = c.user_id AND n.read_at IS NULL AND n.created_at > c.read_through
+    )
+    WHERE c.user_id = :user_id
+    RETURNING c.unread
+    """
+)
+
+
+async def mark_all_read(db: AsyncSession, user_id: UUID, read_through: datetime) -> int:
+    """
+    Count everything the user was sent up to read_through as read.
+
+    A single-row write regardless of inbox size: the unread recount only
+    walks idx_notifications_unread past the watermark. Does not commit.
+    Returns how many notifications stopped being unread.
+    """
+    params = {"user_id": user_id, "read_through": read_through}
+    before = (await db.execute(ADVANCE_WATERMARK, params)).scalar_one()
+    after = (await db.execute(RECOUNT_UNREAD, params)).scalar_one()
+    return before - after
+
+
+class InboxCounterRepair(PeriodicTask):
+    """Recounts inbox_counters in batches of users and fixes drift."""
+
+    name = "inbox-counter-repair"
+
+    def __init__(self, interval_seconds: float, batch_size: int):
+        super().__init__(interval_seconds)
+        self.batch_size = batch_size
+        self.runs = 0
+        self.users_checked = 0
+        self.repaired = 0
+        self.failures = 0
+
+    async def repair(self, db: AsyncSession, user_ids: list[UUID] | None = None) -> int:
+        """
+        Recount the given users, or every user, committing each batch.
+
+        Returns the number of counter rows that were wrong.
+        """
+        repaired = 0
+        try:
+            if user_ids is not None:
+                for i in range(0, len(user_ids), self.batch_size):
+                    repaired += await self._repair_batch(db, user_ids[i : i + self.batch_size])
+            else:
+                after = UUID(int=0)
+                while batch := list(
+                    (await db.execute(NEXT_USERS, {"after": after, "limit": self.batch_size}))
+                    .scalars()
+                    .all()
+                ):
+                    repaired += await self._repair_batch(db, batch)
+                    after = batch[-1]
+        except Exception:
+            await db.rollback()
+            self.failures += 1
+            raise
+        finally:
+            self.repaired += repaired
+
+        self.runs += 1
+        return repaired
+
+    async def run_once(self, db: AsyncSession) -> int:
+        """Recount every user (the periodic task's work)."""
+        return await self.repair(db)
+
+    def stats(self) -> dict[str, int | float]:
+        """Return counters for monitoring."""
+        return {
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "users_checked": self.users_checked,
+            "repaired": self.repaired,
+            "failures": self.failures,
+        }
+
+    async def _repair_batch(self, db: AsyncSession, user_ids: list[UUID]) -> int:
+        await db.execute(ENSURE_ROWS, {"ids": user_ids})
+        await db.execute(LOCK_ROWS, {"ids": user_ids})
+        result = await db.execute(RECOUNT, {"ids": user_ids})
+        fixed = len(result.all())
+        await db.commit()
+        self.users_checked += len(user_ids)
+        if fixed:
+            logger.warning("Repaired %d drifted inbox counters", fixed)
+        return fixed
+
+
+inbox_counter_repair = InboxCounterRepair(
+    interval_seconds=settings.inbox_counter_repair_interval_seconds,
+    batch_size=settings.inbox_counter_repair_batch_size,
+)
+
+
+def get_inbox_counter_repair() -> InboxCounterRepair:
+    """Get the global inbox counter repair instance."""
+    return inbox_counter_repair
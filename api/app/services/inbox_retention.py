@@ -0,0 +1,177 @@
+"""Retention for read notifications.
+
+InboxRetention removes read notifications older than inbox_retention_days,
+either deleting them or moving a compact copy to notifications_archive, so
+idx_notifications_user and idx_notifications_unread only ever cover live
+inboxes. A notification is read when it has a read_at or is covered by its
+recipient's read_through watermark; unread ones are never removed.
+
+Work is done in small batches, each its own transaction. A batch picks the
+oldest eligible rows by ctid (walking idx_notifications_created) and removes
+exactly those, so no statement holds many locks or runs long. The picked
+rows are passed as an array, ctid = ANY(ARRAY(...)), which is planned as a
+TID scan; ctid IN (SELECT ...) becomes a semi-join over the whole table.
+Rows locked by a concurrent request are skipped until the next run.
+"""
+
+import logging
+from datetime import UTC, datetime, timedelta
+from typing import Literal
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.services.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+RetentionMode = Literal["delete", "archive"]
+
+ELIGIBLE = """
+    n.created_at < :cutoff
+    AND (
+        n.read_at IS NOT NULL
+        OR n.created_at <= (SELECT k.read_through FROM inbox_counters k WHERE k.user_id = n.user_id)
+    )
+"""
+
+BATCH = f"""
+    ctid = ANY(ARRAY(
+        SELECT n.ctid FROM notifications n
+        WHERE {ELIGIBLE} AND n.created_at >= :after
+        ORDER BY n.created_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ))
+"""
+
+COUNT_ELIGIBLE = text(f"SELECT COUNT(*) FROM notifications n WHERE {ELIGIBLE}")
+
+DELETE_BATCH = text(
+    f"""
+    WITH removed AS (
+        DELETE FROM notifications WHERE {BATCH}
+        RETURNING created_at
+    )
+    SELECT COUNT(*), MAX(created_at) FROM removed
+    """
+)
+
+ARCHIVE_BATCH = text(
+    f"""
+    WITH removed AS (
+        DELETE FROM notifications WHERE {BATCH}
+        RETURNING id, user_id, notification_type, title, resource_type, resource_id,
+                  created_at, read_at
+    ),
+    archived AS (
+        INSERT INTO notifications_archive (
+            id, user_id, notification_type, title, resource_type, resource_id, created_at, read_at
+        )
+        SELECT r.id, r.user_id, r.notification_type, r.title, r.resource_type, r.resource_id,
+               r.created_at, COALESCE(r.read_at, k.read_through)
+        FROM removed r
+        LEFT JOIN inbox_counters k ON k.user_id = r.user_id
+        ON CONFLICT (id) DO NOTHING
+    )
+    SELECT COUNT(*), MAX(created_at) FROM removed
+    """
+)
+
+
+class InboxRetention(PeriodicTask):
+    """Deletes or archives old read notifications in small batches."""
+
+    name = "inbox-retention"
+
+    def __init__(
+        self,
+        retention_days: int,
+        mode: RetentionMode,
+        batch_size: int,
+        interval_seconds: float,
+        dry_run: bool = False,
+    ):
+        super().__init__(interval_seconds)
+        self.retention_days = retention_days
+        self.mode = mode
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.runs = 0
+        self.batches = 0
+        self.removed = 0
+        self.eligible = 0
+        self.failures = 0
+
+    async def maintain(self, db: AsyncSession, now: datetime | None = None) -> int:
+        """
+        Remove every eligible notification, one committed batch at a time.
+
+        Returns how many were removed, or in dry-run mode how many would be
+        (nothing is changed).
+        """
+        cutoff = (now or datetime.now(UTC)) - timedelta(days=self.retention_days)
+        if self.dry_run:
+            self.eligible = (await db.execute(COUNT_ELIGIBLE, {"cutoff": cutoff})).scalar_one()
+            await db.commit()
+            self.runs += 1
+            return self.eligible
+
+        statement = ARCHIVE_BATCH if self.mode == "archive" else DELETE_BATCH
+        after = datetime.min.replace(tzinfo=UTC)
+        removed = 0
+        try:
+            while True:
+                params = {"cutoff": cutoff, "after": after, "limit": self.batch_size}
+                count, newest = (await db.execute(statement, params)).one()
+                await db.commit()
+                if count:
+                    self.batches += 1
+                    removed += count
+                    after = newest
+                if count < self.batch_size:
+                    break
+        except Exception:
+            await db.rollback()
+            self.failures += 1
+            raise
+        finally:
+            self.removed += removed
+
+        self.runs += 1
+        if removed:
+            logger.info("Inbox retention %s %d notifications", self.mode, removed)
+        return removed
+
+    async def run_once(self, db: AsyncSession) -> int:
+        """Apply retention (the periodic task's work)."""
+        return await self.maintain(db)
+
+    def stats(self) -> dict[str, int | float | str | bool]:
+        """Return counters for monitoring."""
+        return {
+            "mode": self.mode,
+            "dry_run": self.dry_run,
+            "retention_days": self.retention_days,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "batches": self.batches,
+            "removed": self.removed,
+            "eligible": self.eligible,
+            "failures": self.failures,
+        }
+
+
+inbox_retention = InboxRetention(
+    retention_days=settings.inbox_retention_days,
+    mode=settings.inbox_retention_mode,
+    batch_size=settings.inbox_retention_batch_size,
+    interval_seconds=settings.inbox_retention_interval_seconds,
+    dry_run=settings.inbox_retention_dry_run,
+)
+
+
+def get_inbox_retention() -> InboxRetention:
+    """Get the global inbox retention instance."""
+    return inbox_retention
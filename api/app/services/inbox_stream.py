@@ -0,0 +1,226 @@
+"""Server-sent event streams of new inbox notifications.
+
+An AFTER INSERT trigger on notifications publishes each recipient's user id
+on INBOX_CHANNEL when the inserting transaction commits. Every worker
+receives those on its single shared pg_listener connection, and InboxBroker
+wakes only the streams of that user, which then read what is new from the
+database. An idle stream costs a parked coroutine and a periodic heartbeat,
+not a poll.
+
+Notification rows get created_at from their transaction's start time, so a
+slow transaction can commit a row that sorts before one already streamed.
+Streams therefore re-read a short LOOKBACK window on every wake and skip
+ids they have already sent. Event ids are "<created_at>_<id>" cursors; a
+client reconnecting with Last-Event-ID resumes strictly after that key.
+"""
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.notification import Notification
+
+logger = logging.getLogger(__name__)
+
+INBOX_CHANNEL = "inbox"
+
+# How far back each wake re-reads, to catch rows committed out of order
+LOOKBACK = timedelta(seconds=10)
+# Rows read per query while catching up
+FETCH_BATCH = 200
+
+Cursor = tuple[datetime, UUID]
+
+
+class InboxBroker:
+    """Wakes the inbox streams of users named in INBOX_CHANNEL payloads."""
+
+    def __init__(self) -> None:
+        self._waiters: dict[UUID, set[asyncio.Event]] = {}
+        self.notifications = 0
+        self.wakeups = 0
+
+    def subscribe(self, user_id: UUID) -> asyncio.Event:
+        """Register a stream; the returned event is set when it should re-read."""
+        event = asyncio.Event()
+        self._waiters.setdefault(user_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, user_id: UUID, event: asyncio.Event) -> None:
+        """Remove a stream registered with subscribe()."""
+        waiters = self._waiters.get(user_id)
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                del self._waiters[user_id]
+
+    def apply_notification(self, payload: str) -> None:
+        """Wake the streams of the user id published on INBOX_CHANNEL."""
+        self.notifications += 1
+        try:
+            user_id = UUID(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed inbox notification %r", payload)
+            return
+        self._wake(self._waiters.get(user_id, ()))
+
+    def wake_all(self) -> None:
+        """Wake every stream, e.g. after notifications may have been missed."""
+        for waiters in self._waiters.values():
+            self._wake(waiters)
+
+    def clear(self) -> None:
+        """Forget all registered streams."""
+        self._waiters.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return counters for monitoring."""
+        return {
+            "streams": sum(len(waiters) for waiters in self._waiters.values()),
+            "users": len(self._waiters),
+            "notifications": self.notifications,
+            "wakeups": self.wakeups,
+        }
+
+    def _wake(self, waiters) -> None:
+        for event in waiters:
+            event.set()
+            self.wakeups += 1
+
+
+class InboxStream:
+    """
+    Tracks what one stream has sent and reads what it has not.
+
+    `seen` holds the ids sent (or already present at connect) within
+    LOOKBACK of the newest row, which is all a re-read can return again,
+    with the created_at they were sent at: a row that events were coalesced
+    into comes back with a later created_at and is sent again.
+    """
+
+    def __init__(self, user_id: UUID, resume_after: Cursor | None = None):
+        self.user_id = user_id
+        self.resume_after = resume_after
+        self.newest: datetime | None = resume_after[0] if resume_after else None
+        self.seen: dict[UUID, datetime] = {}
+
+    async def prime(self, db: AsyncSession, now: datetime) -> list[Notification]:
+        """
+        Prepare the stream on connect and return any backlog to send.
+
+        Without a resume cursor nothing is replayed: rows already in the
+        window are only marked as seen.
+        """
+        self.newest = self.newest or now
+        rows = await self._fetch(db, self.newest - LOOKBACK)
+        backlog = []
+        for row in rows:
+            if self.resume_after is not None and (row.created_at, row.id) > self.resume_after:
+                backlog.append(row)
+            self._mark(row)
+        return backlog
+
+    async def next(self, db: AsyncSession) -> list[Notification]:
+        """Rows committed since the last read, oldest first."""
+        assert self.newest is not None, "prime() first"
+        rows = await self._fetch(db, self.newest - LOOKBACK)
+        fresh = [row for row in rows if self.seen.get(row.id) != row.created_at]
+        for row in fresh:
+            self._mark(row)
+        self._forget_old()
+        return fresh
+
+    async def _fetch(self, db: AsyncSession, since: datetime) -> list[Notification]:
+        rows: list[Notification] = []
+        after: Cursor | None = None
+        while True:
+            query = select(Notification).where(
+                Notification.user_id == self.user_id,
+                Notification.created_at >= since,
+            )
+            if after is not None:
+                query = query.where(tuple_(Notification.created_at, Notification.id) > after)
+            query = query.order_by(Notification.created_at, Notification.id).limit(FETCH_BATCH)
+            page = list((await db.execute(query)).scalars().all())
+            rows.extend(page)
+            if len(page) < FETCH_BATCH:
+                return rows
+            after = (page[-1].created_at, page[-1].id)
+
+    def _mark(self, row: Notification) -> None:
+        self.seen[row.id] = row.created_at
+        if self.newest is None or row.created_at > self.newest:
+            self.newest = row.created_at
+
+    def _forget_old(self) -> None:
+        horizon = self.newest - LOOKBACK
+        for row_id in [row_id for row_id, created_at in self.seen.items() if created_at < horizon]:
+            del self.seen[row_id]
+
+
+def event_id(row: Notification) -> str:
+    """SSE event id (and resume cursor) for a notification."""
+    return f"{row.created_at.isoformat()}_{row.id}"
+
+
+def parse_event_id(value: str) -> Cursor:
+    """Inverse of event_id(); raises ValueError when malformed."""
+    created_at, _, row_id = value.partition("_")
+    return datetime.fromisoformat(created_at), UUID(row_id)
+
+
+async def inbox_events(
+    db: AsyncSession,
+    broker: InboxBroker,
+    user_id: UUID,
+    resume_after: Cursor | None,
+    render: Callable[[Notification], str],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    heartbeat_seconds: float,
+    max_seconds: float,
+) -> AsyncIterator[str]:
+    """
+    Yield SSE frames for a user's new notifications until the client leaves.
+
+    The session is committed after every read so the stream holds a pooled
+    connection only while it queries. After max_seconds the stream ends and
+    the client reconnects with Last-Event-ID, which re-checks credentials.
+    """
+    wake = broker.subscribe(user_id)
+    stream = InboxStream(user_id, resume_after)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    try:
+        rows = await stream.prime(db, datetime.now(UTC))
+        await db.commit()
+        yield f"retry: {int(heartbeat_seconds * 1000)}\n\n"
+        while True:
+            for row in rows:
+                yield f"id: {event_id(row)}\nevent: notification\ndata: {render(row)}\n\n"
+            remaining = deadline - loop.time()
+            if remaining <= 0 or await is_disconnected():
+                return
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=min(heartbeat_seconds, remaining))
+            except TimeoutError:
+                rows = []
+                yield ": keepalive\n\n"
+                continue
+            wake.clear()
+            rows = await stream.next(db)
+            await db.commit()
+    finally:
+        broker.unsubscribe(user_id, wake)
+
+
+inbox_broker = InboxBroker()
+
+
+def get_inbox_broker() -> InboxBroker:
+    """Get the global inbox broker instance."""
+    return inbox_broker
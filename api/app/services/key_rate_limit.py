@@ -0,0 +1,285 @@
+"""Per-API-key read/write budgets enforced from in-memory token buckets.
+
+Each worker keeps one token bucket per (API key, bucket type). A bucket
+holds up to the key's hourly limit (APIKey.rate_limit_reads / writes) and
+refills continuously at limit/hour, so decisions never touch the database.
+
+A background task periodically adds what this worker consumed to the
+current hour's rate_limit_buckets row with one batched upsert. The upsert
+returns the global count for each row, which tells the worker how much the
+other workers spent since its last sync; that amount is taken out of its
+local buckets so the limit holds across the fleet, give or take one sync
+interval.
+
+Session-cookie requests are charged to buckets keyed by the user's id with
+the configured session budgets. rate_limit_buckets rows belong to API keys,
+so the sync skips those buckets and session budgets hold per worker.
+"""
+
+import math
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Literal
+from uuid import UUID
+
+from sqlalchemy import Integer, String, column, delete, literal, select, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.rate_limit import RateLimitBucket
+from app.models.user import APIKey
+from app.services.periodic import PeriodicTask
+
+BucketType = Literal["read", "write"]
+
+WINDOW = timedelta(hours=1)
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitDecision:
+    """Outcome of charging a bucket, with the values for X-RateLimit-* headers."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_at: int  # Unix time at which the bucket is full again
+    retry_after: int  # Seconds until the request could succeed (0 if allowed)
+
+    def headers(self) -> dict[str, str]:
+        """Response headers describing this decision."""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(self.reset_at),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+@dataclass(slots=True)
+class _Bucket:
+    limit: int
+    tokens: float
+    updated_at: float
+    pending: int = 0
+    window_start: datetime | None = None
+    window_count: int = 0  # Global count seen at the last sync of window_start
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.limit, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    @property
+    def rate(self) -> float:
+        return self.limit / WINDOW.total_seconds()
+
+
+def payload_cost(items: int, byte_size: int = 0, token_count: int = 0) -> int:
+    """
+    Budget units for serving `items` records of the given total size.
+
+    Every item requested costs one unit (a batch of N counts as N
+    requests). With rate_limit_payload_cost set to "bytes" or "tokens" the
+    charge rises to one unit per bytes/tokens-per-unit served when that is
+    higher, so a few large documents cost as much as many small ones.
+    """
+    cost = items
+    if settings.rate_limit_payload_cost == "bytes":
+        cost = max(cost, math.ceil(byte_size / settings.rate_limit_bytes_per_unit))
+    elif settings.rate_limit_payload_cost == "tokens":
+        cost = max(cost, math.ceil(token_count / settings.rate_limit_tokens_per_unit))
+    return cost
+
+
+class KeyRateLimiter(PeriodicTask):
+    """Token buckets per API key with periodic reconciliation into Postgres."""
+
+    name = "key-rate-limit-sync"
+    run_on_stop = True
+
+    def __init__(self, sync_interval_seconds: float):
+        super().__init__(sync_interval_seconds)
+        self._buckets: dict[tuple[UUID, BucketType], _Bucket] = {}
+        self._pruned_before: datetime | None = None
+        self.allowed = 0
+        self.limited = 0
+        self.syncs = 0
+        self.rows_synced = 0
+        self.failures = 0
+
+    def consume(
+        self,
+        api_key_id: UUID,
+        bucket_type: BucketType,
+        limit: int,
+        cost: int = 1,
+    ) -> RateLimitDecision:
+        """Charge `cost` tokens if available. O(1), no I/O."""
+        now = time.monotonic()
+        key = (api_key_id, bucket_type)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(limit=limit, tokens=float(limit), updated_at=now)
+        else:
+            if bucket.limit != limit:
+                # Limit edited on the key: keep what was spent, rescale capacity
+                bucket.tokens += limit - bucket.limit
+                bucket.limit = limit
+            bucket.refill(now)
+
+        allowed = bucket.tokens >= cost
+        if allowed:
+            bucket.tokens -= cost
+            bucket.pending += cost
+            self.allowed += 1
+        else:
+            self.limited += 1
+
+        rate = bucket.rate
+        missing = max(bucket.limit - bucket.tokens, 0.0)
+        reset_at = math.ceil(time.time() + (missing / rate if rate else 0.0))
+        retry_after = 0
+        if not allowed:
+            shortfall = cost - bucket.tokens
+            retry_after = max(math.ceil(shortfall / rate), 1) if rate else int(WINDOW.total_seconds())
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=bucket.limit,
+            remaining=max(int(bucket.tokens), 0),
+            reset_at=reset_at,
+            retry_after=retry_after,
+        )
+
+    async def sync(self, db: AsyncSession) -> int:
+        """
+        Add pending consumption to this hour's rows and learn the global totals.
+
+        Returns the number of rows upserted. On failure the pending counts
+        are kept so the next sync retries them.
+        """
+        window_start = datetime.now(UTC).replace(minute=0, second=0, microsecond=0)
+        sent = {key: bucket.pending for key, bucket in self._buckets.items() if bucket.pending}
+        for key in sent:
+            self._buckets[key].pending = 0
+
+        try:
+            rows = []
+            if sent:
+                result = await db.execute(_upsert_counts(window_start, sent))
+                rows = result.all()
+            if self._pruned_before != window_start:
+                # Rows older than the previous window are no longer read
+                await db.execute(
+                    delete(RateLimitBucket).where(RateLimitBucket.window_start < window_start - WINDOW)
+                )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            self.failures += 1
+            for key, count in sent.items():
+                if (bucket := self._buckets.get(key)) is not None:
+                    bucket.pending += count
+            raise
+
+        self._pruned_before = window_start
+        for api_key_id, bucket_type, request_count in rows:
+            key = (api_key_id, bucket_type)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            previous = bucket.window_count if bucket.window_start == window_start else 0
+            others = request_count - previous - sent[key]
+            if others > 0:
+                bucket.tokens -= others
+            bucket.window_start = window_start
+            bucket.window_count = request_count
+
+        self._evict_idle(window_start)
+        self.syncs += 1
+        self.rows_synced += len(rows)
+        return len(rows)
+
+    async def run_once(self, db: AsyncSession) -> int:
+        """Sync the buckets (the periodic task's work)."""
+        return await self.sync(db)
+
+    def clear(self) -> None:
+        """Drop all buckets without syncing them."""
+        self._buckets.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        """Return counters for monitoring."""
+        return {
+            "buckets": len(self._buckets),
+            "pending": sum(bucket.pending for bucket in self._buckets.values()),
+            "sync_interval_seconds": self.interval_seconds,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "syncs": self.syncs,
+            "rows_synced": self.rows_synced,
+            "failures": self.failures,
+        }
+
+    def _evict_idle(self, window_start: datetime) -> None:
+        """
+        Forget full buckets with nothing pending; they are recreated full.
+
+        Buckets synced in the current window are kept, since dropping their
+        window_count would count this worker's own usage as the others'.
+        """
+        now = time.monotonic()
+        for key, bucket in list(self._buckets.items()):
+            bucket.refill(now)
+            if not bucket.pending and bucket.tokens >= bucket.limit and bucket.window_start != window_start:
+                del self._buckets[key]
+
+
+def _upsert_counts(window_start: datetime, sent: dict[tuple[UUID, BucketType], int]):
+    """
+    INSERT ... SELECT FROM (VALUES ...) ON CONFLICT DO UPDATE ... RETURNING.
+
+    Joining api_keys skips keys deleted since they were charged, so one
+    stale entry cannot fail the whole batch on the foreign key.
+    """
+    pending = values(
+        column("api_key_id", PG_UUID(as_uuid=True)),
+        column("bucket_type", String),
+        column("request_count", Integer),
+        name="pending",
+    ).data([(api_key_id, bucket_type, count) for (api_key_id, bucket_type), count in sent.items()])
+    rows = select(
+        pending.c.api_key_id,
+        pending.c.bucket_type,
+        literal(window_start, RateLimitBucket.window_start.type),
+        pending.c.request_count,
+    ).join(APIKey, APIKey.id == pending.c.api_key_id)
+    stmt = pg_insert(RateLimitBucket).from_select(
+        ["api_key_id", "bucket_type", "window_start", "request_count"],
+        rows,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            RateLimitBucket.api_key_id,
+            RateLimitBucket.bucket_type,
+            RateLimitBucket.window_start,
+        ],
+        set_={"request_count": RateLimitBucket.request_count + stmt.excluded.request_count},
+    ).returning(
+        RateLimitBucket.api_key_id,
+        RateLimitBucket.bucket_type,
+        RateLimitBucket.request_count,
+    )
+
+
+key_rate_limiter = KeyRateLimiter(
+    sync_interval_seconds=settings.rate_limit_sync_interval_seconds,
+)
+
+
+def get_key_rate_limiter() -> KeyRateLimiter:
+    """Get the global per-key rate limiter instance."""
+    return key_rate_limiter
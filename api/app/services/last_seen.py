@@ -0,0 +1,125 @@
+"""Write-behind recorder for API key and user "last seen" timestamps.
+
+Authenticated requests only note the key and user in an in-memory map; a
+background task periodically writes everything collected since the last
+flush as one set-based UPDATE per table. Request transactions therefore
+never touch api_keys/users rows just to bump a timestamp, and many requests
+from the same key collapse into a single row write per flush interval.
+"""
+
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import TIMESTAMP, column, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.user import APIKey, User
+from app.services.periodic import PeriodicTask
+
+
+class LastSeenRecorder(PeriodicTask):
+    """Coalesces last-used timestamps per worker and flushes them in batches."""
+
+    name = "last-seen-flush"
+    run_on_stop = True
+
+    def __init__(self, flush_interval_seconds: float):
+        super().__init__(flush_interval_seconds)
+        self._keys: dict[UUID, datetime] = {}
+        self._users: dict[UUID, datetime] = {}
+        self.flushes = 0
+        self.keys_written = 0
+        self.users_written = 0
+        self.failures = 0
+
+    def record(self, api_key_id: UUID | None, user_id: UUID, seen_at: datetime) -> None:
+        """Note an authenticated request (session requests have no key). O(1), no I/O."""
+        if api_key_id is not None:
+            self._merge(self._keys, api_key_id, seen_at)
+        self._merge(self._users, user_id, seen_at)
+
+    async def flush(self, db: AsyncSession) -> int:
+        """
+        Write all pending timestamps and commit.
+
+        Returns the number of pending entries written. On failure the
+        entries are merged back so the next flush retries them.
+        """
+        keys, self._keys = self._keys, {}
+        users, self._users = self._users, {}
+        if not keys and not users:
+            return 0
+
+        try:
+            if keys:
+                await db.execute(_last_seen_update(APIKey, APIKey.last_used_at, keys))
+            if users:
+                await db.execute(_last_seen_update(User, User.last_seen_at, users))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            self.failures += 1
+            for key_id, seen_at in keys.items():
+                self._merge(self._keys, key_id, seen_at)
+            for user_id, seen_at in users.items():
+                self._merge(self._users, user_id, seen_at)
+            raise
+
+        self.flushes += 1
+        self.keys_written += len(keys)
+        self.users_written += len(users)
+        return len(keys) + len(users)
+
+    async def run_once(self, db: AsyncSession) -> int:
+        """Flush pending timestamps (the periodic task's work)."""
+        return await self.flush(db)
+
+    def clear(self) -> None:
+        """Drop pending entries without writing them."""
+        self._keys.clear()
+        self._users.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        """Return counters for monitoring the write-behind queue."""
+        return {
+            "pending_keys": len(self._keys),
+            "pending_users": len(self._users),
+            "flush_interval_seconds": self.interval_seconds,
+            "flushes": self.flushes,
+            "keys_written": self.keys_written,
+            "users_written": self.users_written,
+            "failures": self.failures,
+        }
+
+    @staticmethod
+    def _merge(target: dict[UUID, datetime], key: UUID, seen_at: datetime) -> None:
+        if (current := target.get(key)) is None or current < seen_at:
+            target[key] = seen_at
+
+
+def _last_seen_update(model, target_column, pending: dict[UUID, datetime]):
+    """Build UPDATE ... FROM (VALUES ...) that only ever moves timestamps forward."""
+    seen = values(
+        column("id", PG_UUID(as_uuid=True)),
+        column("seen_at", TIMESTAMP(timezone=True)),
+        name="seen",
+    ).data(list(pending.items()))
+    return (
+        update(model)
+        .where(model.id == seen.c.id)
+        .where((target_column.is_(None)) | (target_column < seen.c.seen_at))
+        .values({target_column: seen.c.seen_at})
+        .execution_options(synchronize_session=False)
+    )
+
+
+last_seen_recorder = LastSeenRecorder(
+    flush_interval_seconds=settings.last_seen_flush_interval_seconds,
+)
+
+
+def get_last_seen_recorder() -> LastSeenRecorder:
+    """Get the global last-seen recorder instance."""
+    return last_seen_recorder
@@ -0,0 +1,151 @@
+"""Shared Postgres LISTEN connection for cross-worker signals.
+
+Each worker process holds one dedicated asyncpg connection that LISTENs on
+every subscribed channel and dispatches payloads to in-process handlers.
+If the connection drops, notifications sent while disconnected are lost, so
+reconnect handlers run once the listener is back to let subscribers resync.
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+NotificationHandler = Callable[[str], None]
+ReconnectHandler = Callable[[], None]
+
+RECONNECT_DELAY_SECONDS = 1.0
+MAX_RECONNECT_DELAY_SECONDS = 30.0
+
+
+def asyncpg_dsn(db_url: str) -> str:
+    """Convert a SQLAlchemy asyncpg URL into a plain libpq DSN."""
+    return make_url(db_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class PostgresListener:
+    """Owns one LISTEN connection and fans notifications out to handlers."""
+
+    def __init__(self) -> None:
+        self._handlers: dict[str, list[NotificationHandler]] = {}
+        self._reconnect_handlers: list[ReconnectHandler] = []
+        self._task: asyncio.Task[None] | None = None
+        self._connected = asyncio.Event()
+        self.notifications_received = 0
+        self.reconnects = 0
+
+    @property
+    def running(self) -> bool:
+        """Whether the background listener task is active."""
+        return self._task is not None and not self._task.done()
+
+    @property
+    def has_subscriptions(self) -> bool:
+        """Whether any channel has a registered handler."""
+        return bool(self._handlers)
+
+    def subscribe(self, channel: str, handler: NotificationHandler) -> None:
+        """Register a handler for a channel. Call before start()."""
+        handlers = self._handlers.setdefault(channel, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    def on_reconnect(self, handler: ReconnectHandler) -> None:
+        """Register a callback run after the connection is re-established."""
+        if handler not in self._reconnect_handlers:
+            self._reconnect_handlers.append(handler)
+
+    async def start(self, db_url: str | None = None) -> None:
+        """Start the background listener task."""
+        if self.running:
+            return
+        dsn = asyncpg_dsn(db_url or settings.database_url)
+        self._task = asyncio.create_task(self._run(dsn), name="postgres-listener")
+
+    async def wait_connected(self, timeout: float) -> bool:
+        """Wait until the listener holds a live connection."""
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    async def stop(self) -> None:
+        """Cancel the listener task and close its connection."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._connected.clear()
+
+    async def _run(self, dsn: str) -> None:
+        delay = RECONNECT_DELAY_SECONDS
+        first_connect = True
+        while True:
+            connection: asyncpg.Connection | None = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                terminated = asyncio.Event()
+                connection.add_termination_listener(lambda _conn, t=terminated: t.set())
+                for channel in self._handlers:
+                    await connection.add_listener(channel, self._dispatch)
+
+                if not first_connect:
+                    self.reconnects += 1
+                    self._run_reconnect_handlers()
+                first_connect = False
+                delay = RECONNECT_DELAY_SECONDS
+                self._connected.set()
+
+                await terminated.wait()
+                logger.warning("Postgres listener connection lost; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Postgres listener failed; retrying in %.1fs", delay)
+            finally:
+                self._connected.clear()
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY_SECONDS)
+
+    def _dispatch(
+        self,
+        connection: asyncpg.Connection,
+        pid: int,
+        channel: str,
+        payload: str,
+    ) -> None:
+        self.notifications_received += 1
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Notification handler failed for channel %s", channel)
+
+    def _run_reconnect_handlers(self) -> None:
+        for handler in self._reconnect_handlers:
+            try:
+                handler()
+            except Exception:
+                logger.exception("Listener reconnect handler failed")
+
+
+pg_listener = PostgresListener()
+
+
+def get_pg_listener() -> PostgresListener:
+    """Get the global Postgres listener instance."""
+    return pg_listener
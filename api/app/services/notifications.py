@@ -0,0 +1,130 @@
+"""Notification dispatch.
+
+Events fan out to their audience with one INSERT ... SELECT, so the cost of
+notifying a post's followers is a single statement in the triggering
+transaction however many followers there are. Rows are never built one
+follower at a time in Python.
+
+Events coalesce: while a recipient still has an unread notification of the
+same type about the same resource, a new event is folded into that row
+(ON CONFLICT on idx_notifications_coalesce) instead of adding another. The
+row keeps a running "count" in its payload, takes the latest event's body
+and actor, becomes a digest ("3 new comments on ...") and moves to the top
+of the inbox. A busy thread is one row per follower, not one per comment.
+"""
+
+from typing import Any
+
+from sqlalchemy import TIMESTAMP, Integer, case, func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import JSONB, Insert
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.principal import AuthPrincipal
+from app.models.bulletin import BulletinComment, BulletinFollow, BulletinPost
+from app.models.notification import Notification
+
+# Longest post title and comment excerpt copied into a notification
+TITLE_MAX_CHARS = 120
+EXCERPT_MAX_CHARS = 280
+
+NOTIFICATION_COLUMNS = [
+    "user_id",
+    "notification_type",
+    "title",
+    "body",
+    "resource_type",
+    "resource_id",
+    "payload",
+]
+
+
+def _excerpt(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def coalescing(stmt: Insert, digest_title: str) -> Insert:
+    """
+    Fold each inserted row into the recipient's unread row for the same subject.
+
+    digest_title is a format() pattern for the title once a row stands for
+    more than one event, e.g. '%s new comments on "..."'. A row that only
+    counts as read through the read_through watermark is revived with its
+    count restarted.
+    """
+    # The ON CONFLICT clause has no FROM to correlate a select() against
+    read_through = literal_column(
+        "(SELECT read_through FROM inbox_counters WHERE user_id = notifications.user_id)",
+        TIMESTAMP(timezone=True),
+    )
+    unread = Notification.created_at > func.coalesce(
+        read_through, literal_column("'-infinity'::timestamptz")
+    )
+    earlier = func.coalesce(Notification.payload["count"].astext.cast(Integer), 1)
+    count = case((unread, earlier), else_=0) + 1
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            Notification.user_id,
+            Notification.resource_type,
+            Notification.resource_id,
+            Notification.notification_type,
+        ],
+        index_where=Notification.read_at.is_(None) & Notification.resource_id.isnot(None),
+        set_={
+            "title": case((count > 1, func.format(digest_title, count)), else_=stmt.excluded.title),
+            "body": stmt.excluded.body,
+            "payload": stmt.excluded.payload.op("||")(func.jsonb_build_object("count", count)),
+            # Never backwards: an event whose transaction began earlier may commit later
+            "created_at": func.greatest(Notification.created_at, stmt.excluded.created_at),
+        },
+    )
+
+
+def comment_fan_out(post: BulletinPost, comment: BulletinComment, actor: AuthPrincipal) -> Insert:
+    """
+    Upsert one "new_comment" notification per follower of the post.
+
+    The commenter is not notified about their own comment. Followers are
+    visited in user_id order so concurrent fan-outs lock rows alike.
+    """
+    title = _excerpt(post.title, TITLE_MAX_CHARS)
+    payload: dict[str, Any] = {
+        "post_id": str(post.id),
+        "comment_id": str(comment.id),
+        "actor_id": str(actor.user_id),
+        "actor": actor.display,
+        "count": 1,
+    }
+    followers = (
+        select(
+            BulletinFollow.user_id,
+            literal("new_comment"),
+            literal(f'New comment on "{title}"'),
+            literal(_excerpt(comment.content_md, EXCERPT_MAX_CHARS)),
+            literal("bulletin_post"),
+            literal(post.id, PG_UUID(as_uuid=True)),
+            literal(payload, JSONB),
+        )
+        .where(
+            BulletinFollow.post_id == post.id,
+            BulletinFollow.user_id != actor.user_id,
+        )
+        .order_by(BulletinFollow.user_id)
+    )
+    digest_title = '%s new comments on "' + title.replace("%", "%%") + '"'
+    return coalescing(
+        pg_insert(Notification).from_select(NOTIFICATION_COLUMNS, followers), digest_title
+    )
+
+
+async def notify_comment_followers(
+    db: AsyncSession, post: BulletinPost, comment: BulletinComment, actor: AuthPrincipal
+) -> int:
+    """
+    Notify the post's followers of a new comment in the caller's transaction.
+
+    Returns the number of notifications created or coalesced into.
+    """
+    result = await db.execute(comment_fan_out(post, comment, actor))
+    return result.rowcount
@@ -0,0 +1,72 @@
+"""Scaffold for per-worker background jobs that run on a fixed interval.
+
+Write-behind flushers (last seen, read rollups) and maintenance jobs
+(partitions, inbox counters, retention) all run the same loop: wait an
+interval, do one unit of work in a fresh session, log and carry on if it
+fails. PeriodicTask owns that loop and the task lifecycle; subclasses only
+implement run_once and keep their own counters for stats().
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask(ABC):
+    """
+    Runs run_once in a new session every interval_seconds.
+
+    Every run waits for the interval first. With run_on_start, start() also
+    awaits one run before scheduling the loop, for work the app needs done
+    before it serves requests; with run_on_stop, stop() runs once more after
+    the loop ends, to write out whatever is still pending.
+    """
+
+    name = "periodic-task"
+    run_on_start = False
+    run_on_stop = False
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._task: asyncio.Task[None] | None = None
+
+    @abstractmethod
+    async def run_once(self, db: AsyncSession) -> object:
+        """Do one unit of work; failures are logged by the loop."""
+
+    async def start(self) -> None:
+        """Start the background loop."""
+        if self._task is None or self._task.done():
+            if self.run_on_start:
+                await self._run_with_new_session()
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        """Stop the background loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.run_on_stop:
+            await self._run_with_new_session()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self._run_with_new_session()
+
+    async def _run_with_new_session(self) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.run_once(db)
+        except Exception:
+            logger.exception("Background task %s failed", self.name)
@@ -0,0 +1,265 @@
+"""Shared fixed-window counters for slowapi, kept in an UNLOGGED Postgres table.
+
+slowapi's default memory storage is per process, so with N workers every IP
+limit is really N times the configured one, and restarts forget it. This
+storage keeps the authoritative counters in rate_limit_counters, shared by
+all workers.
+
+slowapi calls storage methods synchronously on the event loop, so they must
+never wait on the database. Each worker therefore answers from a local
+mirror (the last known shared count plus its own unflushed hits) and a
+background task flushes pending hits every flush interval with one batched
+INSERT ... ON CONFLICT that increments live windows and restarts expired
+ones atomically. The returned counts refresh the mirror, so hits from other
+workers are seen within one interval.
+
+Once a key is known to be over its limit, further hits are refused from the
+mirror without being queued, so a hot abusive IP costs no database work
+until its window expires.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from limits.storage import Storage
+from sqlalchemy import case, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.rate_limit import RateLimitCounter
+from app.services.periodic import PeriodicTask
+
+PRUNE_INTERVAL_SECONDS = 60.0
+
+
+@dataclass(slots=True)
+class _Window:
+    count: int  # Shared count as of the last flush
+    pending: int  # Hits from this worker not yet flushed
+    expires_at: float  # Unix time
+    limit: int | None  # Parsed from the key, if it follows the limits format
+
+
+def _limit_from_key(key: str) -> int | None:
+    """
+    Extract the limit amount from a limits key.
+
+    Keys end with "/<amount>/<multiples>/<granularity>"; anything else
+    disables fast rejection for that key.
+    """
+    parts = key.rsplit("/", 3)
+    if len(parts) == 4 and parts[1].isdigit():
+        return int(parts[1])
+    return None
+
+
+class PostgresCounterStorage(Storage):
+    """limits storage backend (scheme ``pgbatch://``) for the fixed-window strategy."""
+
+    STORAGE_SCHEME = ["pgbatch"]
+
+    def __init__(
+        self,
+        uri: str | None = None,
+        wrap_exceptions: bool = False,
+        flush_interval_seconds: float = 1.0,
+        **options: float | str | bool,
+    ):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.flush_interval_seconds = float(flush_interval_seconds)
+        self._windows: dict[str, _Window] = {}
+        self._cleared: set[str] = set()
+        self._lock = threading.Lock()
+        self._flusher = _Flusher(self)
+        self._last_prune = 0.0
+        self._healthy = True
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.fast_rejects = 0
+        self.failures = 0
+
+    @property
+    def base_exceptions(self) -> type[Exception] | tuple[type[Exception], ...]:
+        return SQLAlchemyError
+
+    # --- limits.storage.Storage (synchronous, never touches the database) ---
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            window = self._live_window(key, now)
+            if window is None:
+                window = self._windows[key] = _Window(
+                    count=0,
+                    pending=0,
+                    expires_at=now + expiry,
+                    limit=_limit_from_key(key),
+                )
+            total = window.count + window.pending
+            if window.limit is not None and total >= window.limit:
+                # Already over budget: refuse without queueing more work
+                self.fast_rejects += 1
+                return total + amount
+            window.pending += amount
+            return total + amount
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            window = self._live_window(key, time.time())
+            return window.count + window.pending if window else 0
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            window = self._live_window(key, time.time())
+            return window.expires_at if window else time.time()
+
+    def check(self) -> bool:
+        return self._healthy
+
+    def reset(self) -> int | None:
+        with self._lock:
+            cleared = len(self._windows)
+            self._windows.clear()
+            self._cleared.clear()
+        return cleared
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._windows.pop(key, None)
+            self._cleared.add(key)
+
+    # --- Background flushing ---
+
+    async def flush(self, db: AsyncSession) -> int:
+        """
+        Push pending hits to the shared table and refresh local counts.
+
+        Returns the number of counters written. On failure pending hits are
+        restored so the next flush retries them.
+        """
+        with self._lock:
+            batch = {
+                key: (window.pending, window.expires_at)
+                for key, window in self._windows.items()
+                if window.pending
+            }
+            for key in batch:
+                self._windows[key].pending = 0
+            cleared, self._cleared = self._cleared, set()
+
+        now = time.time()
+        try:
+            rows = []
+            if cleared:
+                await db.execute(delete(RateLimitCounter).where(RateLimitCounter.key.in_(cleared)))
+            if batch:
+                result = await db.execute(_increment_counters(batch))
+                rows = result.all()
+            if now - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                await db.execute(delete(RateLimitCounter).where(RateLimitCounter.expires_at < func.now()))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            self.failures += 1
+            self._healthy = False
+            with self._lock:
+                for key, (pending, _expires_at) in batch.items():
+                    if (window := self._windows.get(key)) is not None:
+                        window.pending += pending
+                self._cleared |= cleared
+            raise
+
+        self._healthy = True
+        if now - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+            self._last_prune = now
+        with self._lock:
+            for key, count, expires_at in rows:
+                window = self._windows.get(key)
+                if window is not None:
+                    # The shared row decides the window for every worker
+                    window.count = count
+                    window.expires_at = expires_at.timestamp()
+            for key, window in list(self._windows.items()):
+                if window.expires_at <= now and not window.pending:
+                    del self._windows[key]
+        self.flushes += 1
+        self.rows_flushed += len(rows)
+        return len(rows)
+
+    async def start(self) -> None:
+        """Start the periodic flush task."""
+        await self._flusher.start()
+
+    async def stop(self) -> None:
+        """Stop the flush task and write whatever is still pending."""
+        await self._flusher.stop()
+
+    def stats(self) -> dict[str, int | float]:
+        """Return counters for monitoring."""
+        with self._lock:
+            windows = len(self._windows)
+            pending = sum(window.pending for window in self._windows.values())
+        return {
+            "windows": windows,
+            "pending": pending,
+            "flush_interval_seconds": self.flush_interval_seconds,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "fast_rejects": self.fast_rejects,
+            "failures": self.failures,
+        }
+
+    def _live_window(self, key: str, now: float) -> _Window | None:
+        window = self._windows.get(key)
+        if window is None:
+            return None
+        if window.expires_at <= now:
+            # Unflushed hits of an expired window no longer affect any decision
+            del self._windows[key]
+            return None
+        return window
+
+
+class _Flusher(PeriodicTask):
+    """Flushes a storage every interval; Storage is already its base class."""
+
+    name = "rate-limit-storage-flush"
+    run_on_stop = True
+
+    def __init__(self, storage: PostgresCounterStorage):
+        super().__init__(storage.flush_interval_seconds)
+        self.storage = storage
+
+    async def run_once(self, db: AsyncSession) -> int:
+        return await self.storage.flush(db)
+
+
+def _increment_counters(batch: dict[str, tuple[int, float]]):
+    """Atomic increment-and-expire for many counters in one statement."""
+    stmt = pg_insert(RateLimitCounter).values(
+        [
+            {
+                "key": key,
+                "count": pending,
+                "expires_at": datetime.fromtimestamp(expires_at, UTC),
+            }
+            for key, (pending, expires_at) in batch.items()
+        ]
+    )
+    expired = RateLimitCounter.expires_at <= func.now()
+    return stmt.on_conflict_do_update(
+        index_elements=[RateLimitCounter.key],
+        set_={
+            "count": case(
+                (expired, stmt.excluded.count),
+                else_=RateLimitCounter.count + stmt.excluded.count,
+            ),
+            "expires_at": case(
+                (expired, stmt.excluded.expires_at),
+                else_=RateLimitCounter.expires_at,
+            ),
+        },
+    ).returning(RateLimitCounter.key, RateLimitCounter.count, RateLimitCounter.expires_at)
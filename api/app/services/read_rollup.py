@@ -0,0 +1,179 @@
+"""Exact per-hour article read counters, accumulated in memory.
+
+Article reads are too frequent to audit row by row (read events in
+activity_log are sampled), but authors and admins still want exact
+popularity numbers. Each read only bumps an in-memory counter keyed by
+(article, UTC hour) and adds the API key to that hour's key set; a background
+task folds everything collected since the last flush into article_read_hours
+with set-based upserts.
+
+Distinct keys stay exact across flushes and workers: keys are first inserted
+into article_read_keys with ON CONFLICT DO NOTHING, and only the rows that
+were actually new are added to distinct_keys. Key rows are pruned once their
+hour is older than read_rollup_key_retention_hours.
+"""
+
+from collections import Counter, defaultdict
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import TIMESTAMP, BigInteger, Integer, column, delete, select, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.article import Article, ArticleReadHour, ArticleReadKey
+from app.services.periodic import PeriodicTask
+
+HourKey = tuple[UUID, datetime]  # (article_id, hour)
+
+# Rows per statement, well under asyncpg's 32767 bind parameters
+CHUNK_ROWS = 2000
+
+
+def read_hour(at: datetime) -> datetime:
+    """The UTC hour bucket containing `at`."""
+    return at.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+
+
+class ReadRollup(PeriodicTask):
+    """Counts article reads per hour per worker and flushes them in batches."""
+
+    name = "read-rollup-flush"
+    run_on_stop = True
+
+    def __init__(self, flush_interval_seconds: float, key_retention_hours: int):
+        super().__init__(flush_interval_seconds)
+        self.key_retention_hours = key_retention_hours
+        self._reads: Counter[HourKey] = Counter()
+        self._keys: defaultdict[HourKey, set[UUID]] = defaultdict(set)
+        self._pruned_before: datetime | None = None
+        self.flushes = 0
+        self.reads_written = 0
+        self.keys_written = 0
+        self.failures = 0
+
+    def record(self, article_id: UUID, api_key_id: UUID | None, at: datetime | None = None) -> None:
+        """Count one read (session reads have no key). O(1), no I/O."""
+        bucket = (article_id, read_hour(at or datetime.now(UTC)))
+        self._reads[bucket] += 1
+        if api_key_id is not None:
+            self._keys[bucket].add(api_key_id)
+
+    async def flush(self, db: AsyncSession, now: datetime | None = None) -> int:
+        """
+        Add all pending counts to article_read_hours and commit.
+
+        Returns the number of reads written. On failure the pending counts
+        are merged back so the next flush retries them.
+        """
+        reads, self._reads = self._reads, Counter()
+        keys, self._keys = self._keys, defaultdict(set)
+        if not reads:
+            return 0
+
+        try:
+            new_keys = await _insert_keys(db, keys) if keys else Counter()
+            buckets = list(reads.items())
+            for i in range(0, len(buckets), CHUNK_ROWS):
+                await db.execute(_rollup_upsert(buckets[i : i + CHUNK_ROWS], new_keys))
+            await self._prune(db, now or datetime.now(UTC))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            self.failures += 1
+            self._reads.update(reads)
+            for bucket, key_ids in keys.items():
+                self._keys[bucket] |= key_ids
+            raise
+
+        self.flushes += 1
+        self.reads_written += sum(reads.values())
+        self.keys_written += sum(new_keys.values())
+        return sum(reads.values())
+
+    async def run_once(self, db: AsyncSession) -> int:
+        """Flush pending counts (the periodic task's work)."""
+        return await self.flush(db)
+
+    def clear(self) -> None:
+        """Drop pending counts without writing them."""
+        self._reads.clear()
+        self._keys.clear()
+        self._pruned_before = None
+
+    def stats(self) -> dict[str, int | float]:
+        """Return counters for monitoring the accumulator."""
+        return {
+            "pending_buckets": len(self._reads),
+            "pending_reads": sum(self._reads.values()),
+            "flush_interval_seconds": self.interval_seconds,
+            "flushes": self.flushes,
+            "reads_written": self.reads_written,
+            "keys_written": self.keys_written,
+            "failures": self.failures,
+        }
+
+    async def _prune(self, db: AsyncSession, now: datetime) -> None:
+        """Delete key rows for hours past retention, at most once an hour."""
+        cutoff = read_hour(now) - timedelta(hours=self.key_retention_hours)
+        if self._pruned_before is not None and self._pruned_before >= cutoff:
+            return
+        await db.execute(delete(ArticleReadKey).where(ArticleReadKey.hour < cutoff))
+        self._pruned_before = cutoff
+
+
+async def _insert_keys(db: AsyncSession, keys: dict[HourKey, set[UUID]]) -> Counter[HourKey]:
+    """Insert key rows and count, per bucket, the keys not seen before."""
+    rows = [
+        {"hour": hour, "article_id": article_id, "api_key_id": key_id}
+        for (article_id, hour), key_ids in keys.items()
+        for key_id in key_ids
+    ]
+    new_keys: Counter[HourKey] = Counter()
+    for i in range(0, len(rows), CHUNK_ROWS):
+        result = await db.execute(
+            pg_insert(ArticleReadKey)
+            .values(rows[i : i + CHUNK_ROWS])
+            .on_conflict_do_nothing()
+            .returning(ArticleReadKey.article_id, ArticleReadKey.hour)
+        )
+        new_keys.update(result.all())
+    return new_keys
+
+
+def _rollup_upsert(buckets: list[tuple[HourKey, int]], new_keys: Counter[HourKey]):
+    """INSERT ... SELECT FROM (VALUES ...) ON CONFLICT adding to the stored counts."""
+    pending = values(
+        column("article_id", PG_UUID(as_uuid=True)),
+        column("hour", TIMESTAMP(timezone=True)),
+        column("reads", BigInteger),
+        column("distinct_keys", Integer),
+        name="pending",
+    ).data([(article_id, hour, count, new_keys[article_id, hour]) for (article_id, hour), count in buckets])
+    # Joining articles skips reads of articles deleted since they were counted
+    stmt = pg_insert(ArticleReadHour).from_select(
+        ["article_id", "hour", "reads", "distinct_keys"],
+        select(pending.c.article_id, pending.c.hour, pending.c.reads, pending.c.distinct_keys).join(
+            Article, Article.id == pending.c.article_id
+        ),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[ArticleReadHour.article_id, ArticleReadHour.hour],
+        set_={
+            "reads": ArticleReadHour.reads + stmt.excluded.reads,
+            "distinct_keys": ArticleReadHour.distinct_keys + stmt.excluded.distinct_keys,
+        },
+    )
+
+
+read_rollup = ReadRollup(
+    flush_interval_seconds=settings.read_rollup_flush_interval_seconds,
+    key_retention_hours=settings.read_rollup_key_retention_hours,
+)
+
+
+def get_read_rollup() -> ReadRollup:
+    """Get the global read rollup instance."""
+    return read_rollup
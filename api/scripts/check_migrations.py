@@ -11,12 +11,12 @@ from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy import text
 
 from app.config import settings
-from app.database import Base
+from app.database import Base, include_object
 from app import models  # noqa: F401  # Ensure models are registered
 
 
 def _compare(connection) -> list[object]:
-    context = MigrationContext.configure(connection, opts={"compare_type": True})
+    context = MigrationContext.configure(connection, opts={"compare_type": True, "include_object": include_object})
     return compare_metadata(context, Base.metadata)
 
 
@@ -1,9 +1,57 @@
 """
 Tests for admin activity log endpoint:
 - GET /api/v1/admin/activity
+- Activity events are queued and written in batches
 """
 
+import asyncio
+import json
+import uuid
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from asyncpg.exceptions import PostgresError
 from httpx import AsyncClient
+from sqlalchemy import select, text
+
+from app.database import Base, include_object
+from app.models.activity import ActivityLog
+from app.services.activity import (
+    ActivityEvent,
+    ActivityPartitions,
+    ActivityWriter,
+    activity_writer,
+    list_partitions,
+    partition_start,
+)
+
+
+def _event(user_id: uuid.UUID | None = None, timestamp: datetime | None = None) -> ActivityEvent:
+    return ActivityEvent(
+        id=uuid.uuid4(),
+        timestamp=timestamp or datetime.now(UTC),
+        user_id=user_id,
+        api_key_id=None,
+        action="read",
+        resource="article",
+        resource_id=uuid.uuid4(),
+        request_id=None,
+        ip_address="127.0.0.1",
+        user_agent="test",
+        extra_data=json.dumps({}),
+    )
+
+
+def _writer(max_queue: int, overflow: str, sample_rate: float = 0.0) -> ActivityWriter:
+    return ActivityWriter(
+        batch_size=2,
+        flush_interval_seconds=1.0,
+        max_queue=max_queue,
+        overflow=overflow,
+        sample_rate=sample_rate,
+    )
 
 
 class TestListActivity:
@@ -47,3 +95,305 @@ class TestListActivity:
         """Unauthenticated request returns 401."""
         response = await async_client.get("/api/v1/admin/activity")
         assert response.status_code == 401
+
+
+class TestActivityWriter:
+    """Audited requests queue events; the writer COPYs them in batches."""
+
+    async def test_write_is_queued_then_listed(
+        self, async_client: AsyncClient, test_user: dict, test_admin: dict, auth_headers, db_session
+    ):
+        """Creating an article queues one event, visible to admins after a flush."""
+        response = await async_client.post(
+            "/api/v1/library/articles",
+            json={"title": "Audited", "slug": "audited", "content_md": "Body"},
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert response.status_code == 201
+        assert activity_writer.stats()["queued"] == 1
+        assert (await db_session.execute(select(ActivityLog))).first() is None
+
+        assert await activity_writer.flush(db_session) == 1
+
+        listing = await async_client.get(
+            "/api/v1/admin/activity",
+            headers=auth_headers(test_admin["api_key"]),
+        )
+        [entry] = listing.json()["items"]
+        assert entry["action"] == "create"
+        assert entry["resource"] == "article"
+        assert entry["resource_id"] == response.json()["id"]
+        assert entry["username"] == test_user["username"]
+
+    async def test_flush_writes_in_batches(self, db_session, test_user: dict):
+        """Queued events are written batch_size at a time."""
+        writer = _writer(max_queue=10, overflow="drop")
+        for _ in range(5):
+            await writer.log(_event(uuid.UUID(test_user["user_id"])))
+
+        assert await writer.flush(db_session) == 5
+        assert writer.stats()["queued"] == 0
+        rows = (await db_session.execute(select(ActivityLog))).scalars().all()
+        assert len(rows) == 5
+
+    async def test_deleted_user_is_written_as_null(self, db_session):
+        """A batch referencing a missing user falls back to a checked insert."""
+        writer = _writer(max_queue=10, overflow="drop")
+        await writer.log(_event(uuid.uuid4()))
+
+        assert await writer.flush(db_session) == 1
+        row = (await db_session.execute(select(ActivityLog))).scalar_one()
+        assert row.user_id is None
+
+    async def test_drop_policy_discards_when_full(self):
+        """With "drop", events beyond max_queue are counted and discarded."""
+        writer = _writer(max_queue=2, overflow="drop")
+        kept = [await writer.log(_event()) for _ in range(3)]
+
+        assert kept == [True, True, False]
+        assert writer.stats()["dropped"] == 1
+
+    async def test_sample_policy_thins_out_when_half_full(self):
+        """With "sample", new events are sampled once the queue is half full."""
+        writer = _writer(max_queue=4, overflow="sample", sample_rate=0.0)
+        kept = [await writer.log(_event()) for _ in range(4)]
+
+        assert kept == [True, True, False, False]
+        assert writer.stats()["sampled_out"] == 2
+
+
+    async def test_failing_batch_is_split_after_max_attempts(self, db_session):
+        """A batch Postgres keeps refusing is retried, then written event by event."""
+        writer = ActivityWriter(
+            batch_size=3,
+            flush_interval_seconds=1.0,
+            max_queue=10,
+            overflow="drop",
+            sample_rate=0.0,
+            max_attempts=2,
+        )
+        for event in [_event(), _event()._replace(action="bogus"), _event()]:
+            await writer.log(event)
+
+        with pytest.raises(PostgresError):
+            await writer.flush(db_session)
+        assert writer.stats()["queued"] == 3
+
+        assert await writer.flush(db_session) == 2
+        stats = writer.stats()
+        assert (stats["queued"], stats["failures"], stats["rejected"]) == (0, 2, 1)
+        rows = (await db_session.execute(select(ActivityLog))).scalars().all()
+        assert len(rows) == 2
+
+    async def test_block_policy_drops_after_timeout(self):
+        """A request blocked on a full queue gives up when nothing drains it."""
+        writer = ActivityWriter(
+            batch_size=2,
+            flush_interval_seconds=1.0,
+            max_queue=1,
+            overflow="block",
+            sample_rate=0.0,
+            block_timeout_seconds=0.05,
+        )
+        await writer.log(_event())
+
+        assert await asyncio.wait_for(writer.log(_event()), timeout=1) is False
+        assert writer.stats()["dropped"] == 1
+        assert writer.stats()["queued"] == 1
+
+
+class TestActivityPartitions:
+    """activity_log is partitioned on timestamp and paged by (timestamp, id)."""
+
+    def _partitions(self, unit: str = "month", retention_days: int = 3650) -> ActivityPartitions:
+        return ActivityPartitions(
+            unit=unit, ahead=2, retention_days=retention_days, interval_seconds=3600
+        )
+
+    async def test_migration_creates_current_and_upcoming_months(self, db_session):
+        """The current month and the next two have partitions."""
+        bounds = sorted((await list_partitions(db_session)).values())
+        current = partition_start(datetime.now(UTC), "month")
+
+        assert len(bounds) == 3
+        assert bounds[0][0] == current
+        assert all(upper == lower for (_, upper), (lower, _) in zip(bounds[:-1], bounds[1:], strict=True))
+
+    async def test_maintain_creates_ahead_and_drops_expired(self, db_session):
+        """Months ahead are created and months past retention are dropped whole."""
+        later = datetime.now(UTC) + timedelta(days=400)
+        partitions = self._partitions(retention_days=180)
+
+        created, dropped = await partitions.maintain(db_session, now=later)
+
+        assert (created, dropped) == (3, 3)
+        bounds = sorted((await list_partitions(db_session)).values())
+        assert bounds[0][0] == partition_start(later, "month")
+        assert partitions.stats()["partitions"] == 3
+
+    async def test_maintain_skips_periods_overlapping_existing(self, db_session):
+        """Switching to daily partitions waits for the monthly ones to run out."""
+        created, dropped = await self._partitions(unit="day").maintain(db_session)
+
+        assert (created, dropped) == (0, 0)
+
+    async def test_partitions_are_not_schema_drift(self, db_session):
+        """Autogenerate sees no drift once partitions have been added at runtime."""
+        last_month = partition_start(datetime.now(UTC), "month") - timedelta(days=1)
+        await self._partitions().maintain(db_session, now=last_month)
+
+        def compare(connection) -> list:
+            opts = {"compare_type": True, "include_object": include_object}
+            return compare_metadata(MigrationContext.configure(connection, opts=opts), Base.metadata)
+
+        connection = await db_session.connection()
+        assert await connection.run_sync(compare) == []
+
+    async def test_keyset_pages_span_partitions_and_ties(
+        self, async_client: AsyncClient, test_admin: dict, auth_headers, db_session
+    ):
+        """Entries sharing a timestamp or split across months are each listed once."""
+        now = datetime.now(UTC).replace(microsecond=0)
+        last_month = partition_start(now, "month") - timedelta(days=1)
+        await self._partitions().maintain(db_session, now=last_month)
+        writer = _writer(max_queue=10, overflow="drop")
+        for timestamp in [now, now, now, last_month, last_month]:
+            await writer.log(_event(timestamp=timestamp))
+        await writer.flush(db_session)
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2} | ({"cursor": cursor} if cursor else {})
+            page = (
+                await async_client.get(
+                    "/api/v1/admin/activity",
+                    params=params,
+                    headers=auth_headers(test_admin["api_key"]),
+                )
+            ).json()
+            seen.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert len({item["id"] for item in seen}) == 5
+        keys = [(item["timestamp"], item["id"]) for item in seen]
+        assert keys == sorted(keys, reverse=True)
+
+    async def test_cursor_bound_prunes_newer_partitions(self, db_session):
+        """A page ending last month does not scan this month's partition."""
+        now = datetime.now(UTC)
+        last_month = partition_start(now, "month") - timedelta(days=1)
+        await self._partitions().maintain(db_session, now=last_month)
+        partitions = await list_partitions(db_session)
+        current = next(
+            name for name, (lower, upper) in partitions.items() if lower <= now < upper
+        )
+
+        result = await db_session.execute(
+            text(
+                "EXPLAIN SELECT id FROM activity_log "
+                "WHERE timestamp <= :ts AND (timestamp, id) < (:ts, :id) "
+                "ORDER BY timestamp DESC, id DESC LIMIT 51"
+            ),
+            {"ts": last_month, "id": uuid.uuid4()},
+        )
+        plan = "\n".join(row[0] for row in result.all())
+
+        assert current not in plan
+
+
+class TestActivityFilters:
+    """GET /admin/activity filters and the NDJSON export."""
+
+    async def _seed(self, db_session, test_user: dict) -> dict[str, ActivityEvent]:
+        user_id = uuid.UUID(test_user["user_id"])
+        now = datetime.now(UTC)
+        events = {
+            "old_read": _event(user_id, now - timedelta(seconds=3)),
+            "update": _event(user_id, now - timedelta(seconds=2))._replace(action="update"),
+            "other_read": _event(None, now - timedelta(seconds=1)),
+            "post": _event(user_id, now)._replace(resource="bulletin_post"),
+        }
+        writer = _writer(max_queue=10, overflow="drop")
+        for event in events.values():
+            await writer.log(event)
+        await writer.flush(db_session)
+        return events
+
+    async def _ids(self, async_client: AsyncClient, test_admin: dict, auth_headers, **params):
+        response = await async_client.get(
+            "/api/v1/admin/activity",
+            params=params,
+            headers=auth_headers(test_admin["api_key"]),
+        )
+        assert response.status_code == 200
+        return [item["id"] for item in response.json()["items"]]
+
+    async def test_filters_narrow_the_listing(
+        self, async_client: AsyncClient, test_user: dict, test_admin: dict, auth_headers, db_session
+    ):
+        """Each filter returns only matching entries, newest first."""
+        events = await self._seed(db_session, test_user)
+        ids = {name: str(event.id) for name, event in events.items()}
+
+        async def listed(**params):
+            return await self._ids(async_client, test_admin, auth_headers, **params)
+
+        assert await listed(user_id=test_user["user_id"]) == [
+            ids["post"], ids["update"], ids["old_read"]
+        ]
+        assert await listed(resource="bulletin_post") == [ids["post"]]
+        assert await listed(
+            resource="article", resource_id=str(events["update"].resource_id)
+        ) == [ids["update"]]
+        assert await listed(action="update") == [ids["update"]]
+        assert await listed(
+            since=(events["update"].timestamp).isoformat(),
+            until=(events["post"].timestamp).isoformat(),
+        ) == [ids["other_read"], ids["update"]]
+        assert await listed(api_key_id=str(uuid.uuid4())) == []
+
+    async def test_resource_id_requires_resource(
+        self, async_client: AsyncClient, test_admin: dict, auth_headers
+    ):
+        """resource_id alone is rejected because no index serves it."""
+        response = await async_client.get(
+            "/api/v1/admin/activity",
+            params={"resource_id": str(uuid.uuid4())},
+            headers=auth_headers(test_admin["api_key"]),
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"]["error"]["code"] == "VALIDATION_ERROR"
+
+    async def test_export_streams_ndjson(
+        self, async_client: AsyncClient, test_user: dict, test_admin: dict, auth_headers, db_session
+    ):
+        """The export writes one JSON object per line, with the same filters."""
+        events = await self._seed(db_session, test_user)
+
+        response = await async_client.get(
+            "/api/v1/admin/activity/export",
+            params={"user_id": test_user["user_id"]},
+            headers=auth_headers(test_admin["api_key"]),
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert [record["id"] for record in records] == [
+            str(events[name].id) for name in ("post", "update", "old_read")
+        ]
+        assert records[0]["username"] == test_user["username"]
+        assert records[0]["metadata"] == {}
+
+    async def test_export_requires_admin(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Non-admin user gets 403 Forbidden."""
+        response = await async_client.get(
+            "/api/v1/admin/activity/export",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert response.status_code == 403
@@ -0,0 +1,99 @@
+"""
+Tests for bulk bot provisioning:
+- POST /api/v1/admin/bots (create users, roles and API keys in one batch)
+"""
+
+from httpx import AsyncClient
+from sqlalchemy import func, select
+
+from app.models.user import User
+
+
+class TestProvisionBots:
+    """POST /api/v1/admin/bots tests."""
+
+    async def test_provisions_bots_with_working_keys(
+        self, async_client: AsyncClient, test_admin: dict, auth_headers, db_session
+    ):
+        """Each created bot gets a usable key and no password."""
+        response = await async_client.post(
+            "/api/v1/admin/bots",
+            json={
+                "bots": [
+                    {"username": "fleet_bot_1", "display_name": "Fleet 1"},
+                    {"username": "fleet_bot_2", "roles": ["library:read"]},
+                ]
+            },
+            headers=auth_headers(test_admin["api_key"]),
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["conflicts"] == []
+        assert [bot["username"] for bot in data["created"]] == ["fleet_bot_1", "fleet_bot_2"]
+        assert data["created"][1]["roles"] == ["library:read"]
+
+        me = await async_client.get(
+            "/api/v1/users/me",
+            headers=auth_headers(data["created"][1]["api_key"]),
+        )
+        assert me.status_code == 200
+        assert me.json()["roles"] == ["library:read"]
+        assert me.json()["api_key_scopes"] == ["library:read"]
+
+        password_hash = await db_session.scalar(
+            select(User.password_hash).where(User.username == "fleet_bot_1")
+        )
+        assert password_hash is None
+
+    async def test_reports_conflicts_per_item(
+        self, async_client: AsyncClient, test_admin: dict, test_user: dict, auth_headers, db_session
+    ):
+        """Taken or repeated identities are reported; the rest are created."""
+        response = await async_client.post(
+            "/api/v1/admin/bots",
+            json={
+                "bots": [
+                    {"username": test_user["username"]},
+                    {"username": "fresh_bot", "email": test_user["email"].upper()},
+                    {"username": "ok_bot", "email": "ok_bot@example.com"},
+                    {"username": "ok_bot"},
+                ]
+            },
+            headers=auth_headers(test_admin["api_key"]),
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [bot["username"] for bot in data["created"]] == ["ok_bot"]
+        conflicts = {(c["username"], c["code"]) for c in data["conflicts"]}
+        assert conflicts == {
+            (test_user["username"], "CONFLICT"),
+            ("fresh_bot", "CONFLICT"),
+            ("ok_bot", "DUPLICATE"),
+        }
+
+        count = await db_session.scalar(
+            select(func.count()).select_from(User).where(User.username == "fresh_bot")
+        )
+        assert count == 0
+
+    async def test_non_admin_cannot_provision(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Regular users get 403."""
+        response = await async_client.post(
+            "/api/v1/admin/bots",
+            json={"bots": [{"username": "sneaky_bot"}]},
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert response.status_code == 403
+
+    async def test_rejects_invalid_username(
+        self, async_client: AsyncClient, test_admin: dict, auth_headers
+    ):
+        """Usernames follow the registration format."""
+        response = await async_client.post(
+            "/api/v1/admin/bots",
+            json={"bots": [{"username": "Bad Name"}]},
+            headers=auth_headers(test_admin["api_key"]),
+        )
+        assert response.status_code == 422
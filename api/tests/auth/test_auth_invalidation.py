@@ -0,0 +1,102 @@
+"""
+Tests for cross-worker principal cache invalidation over LISTEN/NOTIFY.
+
+A second cache wired to its own listener stands in for another worker:
+writes made through the API must reach it via Postgres, not via the
+in-process invalidation calls.
+"""
+
+import asyncio
+from uuid import UUID
+
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.auth.api_key import hash_api_key
+from app.auth.cache import AUTH_INVALIDATE_CHANNEL, PrincipalCache
+from app.auth.principal import AuthPrincipal
+from app.config import settings
+from app.services.listener import PostgresListener
+
+
+@pytest_asyncio.fixture
+async def remote_cache(db_session):
+    """A principal cache fed only by Postgres notifications."""
+    cache = PrincipalCache(max_entries=100, ttl_seconds=3600)
+    listener = PostgresListener()
+    listener.subscribe(AUTH_INVALIDATE_CHANNEL, cache.apply_notification)
+    await listener.start(settings.test_database_url)
+    assert await listener.wait_connected(timeout=5)
+    yield cache
+    await listener.stop()
+
+
+def _warm(cache: PrincipalCache, user: dict) -> str:
+    key_hash = hash_api_key(user["api_key"])
+    principal = AuthPrincipal(
+        user_id=UUID(user["user_id"]),
+        username=user["username"],
+        display_name=None,
+        email=user["email"],
+        roles=frozenset(user["roles"]),
+        api_key_id=UUID(int=0),
+        key_scopes=frozenset(user["roles"]),
+        key_expires_at=None,
+    )
+    cache.put(key_hash, principal, cache.generation)
+    return key_hash
+
+
+async def _wait_evicted(cache: PrincipalCache, key_hash: str, timeout: float = 5.0) -> bool:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if cache.get(key_hash) is None:
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+class TestNotifyInvalidation:
+    """Writes publish invalidations that other workers apply."""
+
+    async def test_admin_key_revocation_reaches_other_worker(
+        self, async_client: AsyncClient, remote_cache, test_admin: dict, test_user: dict, auth_headers
+    ):
+        """Revoking a user's keys evicts them from another worker's cache."""
+        key_hash = _warm(remote_cache, test_user)
+
+        await async_client.post(
+            f"/api/v1/admin/users/{test_user['username']}/revoke-keys",
+            headers=auth_headers(test_admin["api_key"]),
+        )
+
+        assert await _wait_evicted(remote_cache, key_hash)
+
+    async def test_role_change_reaches_other_worker(
+        self, async_client: AsyncClient, remote_cache, test_admin: dict, test_user: dict, auth_headers
+    ):
+        """Role grants evict every key of the affected user."""
+        key_hash = _warm(remote_cache, test_user)
+
+        await async_client.patch(
+            f"/api/v1/admin/users/{test_user['username']}/roles",
+            headers=auth_headers(test_admin["api_key"]),
+            json={"roles": ["bulletin:read"]},
+        )
+
+        assert await _wait_evicted(remote_cache, key_hash)
+
+    async def test_unrelated_write_keeps_entry(
+        self, async_client: AsyncClient, remote_cache, test_user: dict, auth_headers
+    ):
+        """Ordinary content writes do not publish invalidations."""
+        key_hash = _warm(remote_cache, test_user)
+
+        await async_client.post(
+            "/api/v1/bulletin/posts",
+            headers=auth_headers(test_user["api_key"]),
+            json={"title": "Hello", "content_md": "World"},
+        )
+        await asyncio.sleep(0.2)
+
+        assert remote_cache.get(key_hash) is not None
@@ -0,0 +1,137 @@
+"""
+Tests for per-API-key rate limiting:
+- Authenticated responses carry X-RateLimit-* headers
+- Exhausting the key's write budget returns 429 RATE_LIMITED
+- Syncing upserts counts and applies other workers' consumption
+- Editing a key's limits reaches workers that cached the key
+"""
+
+import asyncio
+from datetime import UTC, datetime
+from uuid import UUID
+
+from httpx import AsyncClient
+from sqlalchemy import select, update
+
+from app.auth.api_key import hash_api_key
+from app.auth.cache import AUTH_INVALIDATE_CHANNEL, principal_cache
+from app.config import settings
+from app.models.rate_limit import RateLimitBucket
+from app.models.user import APIKey
+from app.services.key_rate_limit import key_rate_limiter
+from app.services.listener import PostgresListener
+
+
+async def _key_id(db_session, user_id: str) -> UUID:
+    return await db_session.scalar(select(APIKey.id).where(APIKey.user_id == UUID(user_id)))
+
+
+class TestKeyRateLimit:
+    """Per-key read/write budgets."""
+
+    async def test_read_returns_rate_limit_headers(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Reads report the key's read budget."""
+        response = await async_client.get(
+            "/api/v1/users/me",
+            headers=auth_headers(test_user["api_key"]),
+        )
+
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Limit"] == "1000"
+        assert response.headers["X-RateLimit-Remaining"] == "999"
+        assert int(response.headers["X-RateLimit-Reset"]) >= int(datetime.now(UTC).timestamp())
+
+    async def test_write_budget_exhausted_returns_429(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """Writes beyond rate_limit_writes are rejected with Retry-After."""
+        await db_session.execute(
+            update(APIKey)
+            .where(APIKey.user_id == UUID(test_user["user_id"]))
+            .values(rate_limit_writes=2)
+        )
+        await db_session.commit()
+        headers = auth_headers(test_user["api_key"])
+
+        for _ in range(2):
+            response = await async_client.patch(
+                "/api/v1/users/me/profile", json={"display_name": "Bot"}, headers=headers
+            )
+            assert response.status_code == 200
+
+        response = await async_client.patch(
+            "/api/v1/users/me/profile", json={"display_name": "Bot"}, headers=headers
+        )
+        assert response.status_code == 429
+        assert response.json()["detail"]["error"]["code"] == "RATE_LIMITED"
+        assert response.headers["X-RateLimit-Remaining"] == "0"
+        assert int(response.headers["Retry-After"]) >= 1
+
+        # Reads have their own budget
+        response = await async_client.get("/api/v1/users/me", headers=headers)
+        assert response.status_code == 200
+
+    async def test_limit_change_applies_to_cached_key(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """A limit edited in the database evicts the cached principal and takes effect."""
+        listener = PostgresListener()
+        listener.subscribe(AUTH_INVALIDATE_CHANNEL, principal_cache.apply_notification)
+        await listener.start(settings.test_database_url)
+        try:
+            assert await listener.wait_connected(timeout=5)
+            headers = auth_headers(test_user["api_key"])
+            response = await async_client.get("/api/v1/users/me", headers=headers)
+            assert response.headers["X-RateLimit-Limit"] == "1000"
+            key_hash = hash_api_key(test_user["api_key"])
+            assert principal_cache.get(key_hash) is not None
+
+            await db_session.execute(
+                update(APIKey)
+                .where(APIKey.user_id == UUID(test_user["user_id"]))
+                .values(rate_limit_reads=5)
+            )
+            await db_session.commit()
+            for _ in range(100):
+                if principal_cache.get(key_hash) is None:
+                    break
+                await asyncio.sleep(0.05)
+
+            response = await async_client.get("/api/v1/users/me", headers=headers)
+            assert response.headers["X-RateLimit-Limit"] == "5"
+        finally:
+            await listener.stop()
+
+    async def test_sync_upserts_and_applies_remote_usage(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """Counts land in rate_limit_buckets; other workers' usage lowers the budget."""
+        headers = auth_headers(test_user["api_key"])
+        await async_client.get("/api/v1/users/me", headers=headers)
+        await async_client.get("/api/v1/users/me", headers=headers)
+
+        assert await key_rate_limiter.sync(db_session) == 1
+        key_id = await _key_id(db_session, test_user["user_id"])
+        count = await db_session.scalar(
+            select(RateLimitBucket.request_count).where(
+                RateLimitBucket.api_key_id == key_id,
+                RateLimitBucket.bucket_type == "read",
+            )
+        )
+        assert count == 2
+
+        # Another worker spends 100 reads in the same window
+        await db_session.execute(
+            update(RateLimitBucket)
+            .where(RateLimitBucket.api_key_id == key_id)
+            .values(request_count=RateLimitBucket.request_count + 100)
+        )
+        await db_session.commit()
+
+        await async_client.get("/api/v1/users/me", headers=headers)
+        await key_rate_limiter.sync(db_session)
+
+        response = await async_client.get("/api/v1/users/me", headers=headers)
+        assert int(response.headers["X-RateLimit-Remaining"]) <= 1000 - 4 - 100
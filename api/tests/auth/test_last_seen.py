@@ -0,0 +1,50 @@
+"""
+Tests for write-behind last-seen tracking:
+- Authenticated requests do not write api_keys.last_used_at inline
+- A flush writes APIKey.last_used_at and User.last_seen_at in bulk
+"""
+
+from httpx import AsyncClient
+
+from app.services.last_seen import last_seen_recorder
+
+
+class TestLastSeenWriteBehind:
+    """Coalesced last_used_at / last_seen_at writes."""
+
+    async def test_request_does_not_write_last_used_inline(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Until a flush, the key's last_used_at stays unset."""
+        last_seen_recorder.clear()
+        headers = auth_headers(test_user["api_key"])
+
+        await async_client.get("/api/v1/inbox/summary", headers=headers)
+        response = await async_client.get("/api/v1/auth/api-keys", headers=headers)
+
+        assert response.json()["items"][0]["last_used_at"] is None
+        assert last_seen_recorder.stats()["pending_keys"] == 1
+
+    async def test_flush_writes_key_and_user_timestamps(
+        self, async_client: AsyncClient, test_admin: dict, test_user: dict, auth_headers, db_session
+    ):
+        """A flush populates APIKey.last_used_at and User.last_seen_at."""
+        last_seen_recorder.clear()
+        await async_client.get("/api/v1/inbox/summary", headers=auth_headers(test_user["api_key"]))
+        await async_client.get("/api/v1/inbox/summary", headers=auth_headers(test_user["api_key"]))
+
+        written = await last_seen_recorder.flush(db_session)
+        assert written == 2  # one key, one user
+
+        keys_response = await async_client.get(
+            "/api/v1/auth/api-keys",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert keys_response.json()["items"][0]["last_used_at"] is not None
+
+        users_response = await async_client.get(
+            "/api/v1/admin/users",
+            headers=auth_headers(test_admin["api_key"]),
+        )
+        users = {u["username"]: u for u in users_response.json()["items"]}
+        assert users[test_user["username"]]["last_seen_at"] is not None
@@ -7,8 +7,19 @@ Lockout rules:
 - Lock expires after 15 minutes
 """
 
+import asyncio
+from datetime import UTC, datetime
+from uuid import UUID
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.models.user import User
+from app.routers.auth import _record_failed_login
 
 
 class TestLockoutTriggering:
@@ -81,6 +92,37 @@ class TestLockoutTriggering:
         assert response.status_code == 401
 
 
+class TestConcurrentFailures:
+    """Failed-attempt accounting under concurrent bad passwords."""
+
+    async def test_concurrent_failures_each_count_once(
+        self, test_user: dict, db_session
+    ):
+        """Parallel failures from separate connections are not lost."""
+        engine = create_async_engine(settings.test_database_url, poolclass=NullPool)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        user_id = UUID(test_user["user_id"])
+        now = datetime.now(UTC)
+
+        async def fail_once() -> None:
+            async with sessions() as session:
+                await session.execute(_record_failed_login(user_id, now))
+                await session.commit()
+
+        try:
+            await asyncio.gather(*(fail_once() for _ in range(6)))
+        finally:
+            await engine.dispose()
+
+        row = (
+            await db_session.execute(
+                select(User.failed_login_count, User.locked_until).where(User.id == user_id)
+            )
+        ).one()
+        assert row.failed_login_count == 6
+        assert row.locked_until is not None and row.locked_until > now
+
+
 class TestLockoutExpiration:
     """Tests for lockout expiration."""
 
@@ -111,6 +111,19 @@ class TestLoginSuccess:
         )
         assert response.status_code == 200
 
+    async def test_login_with_email_is_case_insensitive(
+        self, async_client: AsyncClient, test_user: dict
+    ):
+        """Email lookup ignores case."""
+        response = await async_client.post(
+            "/api/v1/auth/login",
+            json={
+                "username": test_user["email"].upper(),
+                "password": test_user["password"],
+            },
+        )
+        assert response.status_code == 200
+
 
 class TestLoginFailure:
     """Authentication failure scenarios."""
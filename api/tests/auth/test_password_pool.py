@@ -0,0 +1,140 @@
+"""
+Tests for the bounded password hashing pool:
+- Login hashes off the event loop and is counted in pool stats
+- A saturated pool fails fast with 503 and Retry-After
+- bcrypt cost calibration and rehash-on-login below the target cost
+"""
+
+from uuid import UUID
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, update
+
+from app.auth.password import calibrate_bcrypt_rounds, password_hasher, pwd_context
+from app.models.user import User
+
+
+@pytest.fixture
+def bcrypt_rounds():
+    """Restore the bcrypt cost and recorded calibration after a test."""
+    rounds = password_hasher.bcrypt_rounds
+    hash_ms = password_hasher.bcrypt_hash_ms
+    yield password_hasher.set_rounds
+    password_hasher.set_rounds(rounds, hash_ms)
+
+
+class TestPasswordHasherPool:
+    """bcrypt runs on a bounded worker pool."""
+
+    async def test_login_runs_on_pool(
+        self, async_client: AsyncClient, test_user: dict, valid_login_data: dict
+    ):
+        """A successful login is recorded as a completed pool call."""
+        before = password_hasher.stats()["completed"]
+
+        response = await async_client.post("/api/v1/auth/login", json=valid_login_data)
+
+        assert response.status_code == 200
+        assert password_hasher.stats()["completed"] == before + 1
+
+    async def test_saturated_pool_returns_503(
+        self, async_client: AsyncClient, test_user: dict, valid_login_data: dict, monkeypatch
+    ):
+        """When every slot is taken, login is rejected without queueing."""
+        monkeypatch.setattr(password_hasher, "_in_flight", password_hasher.capacity)
+        rejected = password_hasher.rejected
+
+        response = await async_client.post("/api/v1/auth/login", json=valid_login_data)
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == str(password_hasher.retry_after_seconds)
+        assert response.json()["detail"]["error"]["code"] == "SERVICE_BUSY"
+        assert password_hasher.rejected == rejected + 1
+
+    async def test_admin_metrics_include_password_hasher(
+        self, async_client: AsyncClient, test_admin: dict, auth_headers
+    ):
+        """Pool utilisation is exposed on the admin metrics endpoint."""
+        response = await async_client.get(
+            "/api/v1/admin/metrics",
+            headers=auth_headers(test_admin["api_key"]),
+        )
+
+        assert response.status_code == 200
+        stats = response.json()["password_hasher"]
+        assert stats["max_workers"] == password_hasher.max_workers
+        assert stats["queued"] == 0
+
+
+class TestBcryptCalibration:
+    """Startup cost calibration and transparent rehashing."""
+
+    def test_calibration_respects_bounds(self):
+        """A tiny target clamps to the floor, a huge one to the ceiling."""
+        assert calibrate_bcrypt_rounds(0.001, 4, 6)[0] == 4
+        assert calibrate_bcrypt_rounds(60_000, 4, 6)[0] == 6
+
+    async def test_login_rehashes_below_target_cost(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        valid_login_data: dict,
+        db_session,
+        bcrypt_rounds,
+    ):
+        """Logging in upgrades a hash made with a lower cost to the target."""
+        query = select(User.password_hash).where(User.id == UUID(test_user["user_id"]))
+        cheap = pwd_context.handler("bcrypt").using(rounds=4).hash(valid_login_data["password"])
+        await db_session.execute(
+            update(User).where(User.id == UUID(test_user["user_id"])).values(password_hash=cheap)
+        )
+        await db_session.commit()
+        bcrypt_rounds(5)
+
+        response = await async_client.post("/api/v1/auth/login", json=valid_login_data)
+        assert response.status_code == 200
+
+        db_session.expire_all()
+        stored = await db_session.scalar(query)
+        assert stored.startswith("$2b$05$")
+        assert not pwd_context.needs_update(stored)
+
+        # The new hash still verifies
+        response = await async_client.post("/api/v1/auth/login", json=valid_login_data)
+        assert response.status_code == 200
+
+    async def test_login_keeps_hash_above_target_cost(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        valid_login_data: dict,
+        db_session,
+        bcrypt_rounds,
+    ):
+        """A worker calibrated lower never downgrades a costlier hash."""
+        query = select(User.password_hash).where(User.id == UUID(test_user["user_id"]))
+        before = await db_session.scalar(query)
+        bcrypt_rounds(4)
+
+        response = await async_client.post("/api/v1/auth/login", json=valid_login_data)
+        assert response.status_code == 200
+
+        db_session.expire_all()
+        assert await db_session.scalar(query) == before
+
+    async def test_login_keeps_hash_at_target_cost(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        valid_login_data: dict,
+        db_session,
+    ):
+        """Hashes already at the configured cost are left alone."""
+        query = select(User.password_hash).where(User.id == UUID(test_user["user_id"]))
+        before = await db_session.scalar(query)
+
+        await async_client.post("/api/v1/auth/login", json=valid_login_data)
+
+        db_session.expire_all()
+        assert await db_session.scalar(query) == before
@@ -0,0 +1,140 @@
+"""
+Tests for the in-process API key principal cache:
+- Repeated requests are served from the cache
+- Revocation, role changes and profile edits invalidate cached principals
+- GET /api/v1/admin/metrics exposes hit/miss counters
+"""
+
+from httpx import AsyncClient
+
+from app.auth.api_key import hash_api_key
+from app.auth.cache import principal_cache
+
+
+class TestPrincipalCacheHits:
+    """Cache population and hit accounting."""
+
+    async def test_second_request_is_cache_hit(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """The first request loads from the database, the second hits the cache."""
+        headers = auth_headers(test_user["api_key"])
+
+        await async_client.get("/api/v1/users/me", headers=headers)
+        hits_before = principal_cache.hits
+
+        response = await async_client.get("/api/v1/users/me", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["username"] == test_user["username"]
+        assert principal_cache.hits == hits_before + 1
+
+    async def test_invalid_key_is_not_cached(
+        self, async_client: AsyncClient, auth_headers
+    ):
+        """Unknown keys are never stored."""
+        bad_key = "ts_live_" + "a" * 64
+        response = await async_client.get("/api/v1/users/me", headers=auth_headers(bad_key))
+        assert response.status_code == 401
+        assert principal_cache.get(hash_api_key(bad_key)) is None
+
+
+class TestPrincipalCacheInvalidation:
+    """Writes that change a principal must take effect immediately."""
+
+    async def test_revoked_key_rejected_after_cache_warm(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Revoking a key drops it from the cache."""
+        create_response = await async_client.post(
+            "/api/v1/auth/api-keys",
+            headers=auth_headers(test_user["api_key"]),
+            json={"name": "Short lived"},
+        )
+        new_key = create_response.json()["api_key"]
+        key_id = create_response.json()["id"]
+
+        assert (await async_client.get("/api/v1/users/me", headers=auth_headers(new_key))).status_code == 200
+
+        revoke_response = await async_client.delete(
+            f"/api/v1/auth/api-keys/{key_id}",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert revoke_response.status_code == 204
+
+        response = await async_client.get("/api/v1/users/me", headers=auth_headers(new_key))
+        assert response.status_code == 401
+
+    async def test_admin_revoke_keys_invalidates_cache(
+        self, async_client: AsyncClient, test_admin: dict, test_user: dict, auth_headers
+    ):
+        """Admin revocation of all keys takes effect immediately."""
+        headers = auth_headers(test_user["api_key"])
+        assert (await async_client.get("/api/v1/users/me", headers=headers)).status_code == 200
+
+        await async_client.post(
+            f"/api/v1/admin/users/{test_user['username']}/revoke-keys",
+            headers=auth_headers(test_admin["api_key"]),
+        )
+
+        response = await async_client.get("/api/v1/users/me", headers=headers)
+        assert response.status_code == 401
+
+    async def test_role_update_invalidates_cache(
+        self, async_client: AsyncClient, test_admin: dict, test_user: dict, auth_headers
+    ):
+        """Removing a role is reflected in the next request's scopes."""
+        headers = auth_headers(test_user["api_key"])
+        assert (await async_client.get("/api/v1/library/articles", headers=headers)).status_code == 200
+
+        await async_client.patch(
+            f"/api/v1/admin/users/{test_user['username']}/roles",
+            headers=auth_headers(test_admin["api_key"]),
+            json={"roles": ["bulletin:read"]},
+        )
+
+        response = await async_client.get("/api/v1/library/articles", headers=headers)
+        assert response.status_code == 403
+
+    async def test_display_name_update_invalidates_cache(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Profile edits refresh the cached display name."""
+        headers = auth_headers(test_user["api_key"])
+        await async_client.get("/api/v1/users/me", headers=headers)
+
+        await async_client.patch(
+            "/api/v1/users/me/profile",
+            headers=headers,
+            json={"display_name": "Renamed Bot"},
+        )
+
+        response = await async_client.get("/api/v1/users/me", headers=headers)
+        assert response.json()["display_name"] == "Renamed Bot"
+
+
+class TestMetricsEndpoint:
+    """GET /api/v1/admin/metrics tests."""
+
+    async def test_admin_can_read_cache_stats(
+        self, async_client: AsyncClient, test_admin: dict, auth_headers
+    ):
+        """Metrics include principal cache counters."""
+        response = await async_client.get(
+            "/api/v1/admin/metrics",
+            headers=auth_headers(test_admin["api_key"]),
+        )
+        assert response.status_code == 200
+        stats = response.json()["auth_cache"]
+        assert stats["misses"] >= 1
+        assert "hits" in stats
+        assert "hit_ratio" in stats
+
+    async def test_non_admin_cannot_read_metrics(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Non-admin user gets 403 Forbidden."""
+        response = await async_client.get(
+            "/api/v1/admin/metrics",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert response.status_code == 403
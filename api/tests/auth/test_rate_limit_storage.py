@@ -0,0 +1,76 @@
+"""
+Tests for the shared Postgres-backed slowapi storage:
+- Hits are answered locally and flushed in one batch
+- Workers see each other's hits after a flush
+- Expired shared windows restart atomically
+- Keys known to be over budget are refused without queueing work
+"""
+
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select
+
+from app.models.rate_limit import RateLimitCounter
+from app.services.rate_limit_storage import PostgresCounterStorage
+
+KEY = "LIMITER/10.0.0.1/app.routers.auth.login/3/1/minute"
+
+
+class TestPostgresCounterStorage:
+    """pgbatch:// storage behaviour."""
+
+    async def test_flush_shares_counts_between_workers(self, db_session):
+        """A second worker learns the first worker's hits from the shared row."""
+        worker_a = PostgresCounterStorage()
+        worker_b = PostgresCounterStorage()
+
+        assert worker_a.incr(KEY, 60) == 1
+        assert worker_a.incr(KEY, 60) == 2
+        assert await worker_a.flush(db_session) == 1
+
+        assert worker_b.incr(KEY, 60) == 1  # Not flushed yet: local view only
+        await worker_b.flush(db_session)
+        assert worker_b.get(KEY) == 3
+
+        count = await db_session.scalar(
+            select(RateLimitCounter.count).where(RateLimitCounter.key == KEY)
+        )
+        assert count == 3
+
+    async def test_expired_window_restarts(self, db_session):
+        """Flushing into an expired row resets its count and expiry."""
+        db_session.add(
+            RateLimitCounter(
+                key=KEY,
+                count=50,
+                expires_at=datetime.now(UTC) - timedelta(seconds=5),
+            )
+        )
+        await db_session.commit()
+        storage = PostgresCounterStorage()
+
+        storage.incr(KEY, 60)
+        await storage.flush(db_session)
+
+        assert storage.get(KEY) == 1
+        assert storage.get_expiry(KEY) > datetime.now(UTC).timestamp()
+
+    async def test_over_budget_key_is_fast_rejected(self, db_session):
+        """Hits past the limit are refused locally and not queued for the database."""
+        storage = PostgresCounterStorage()
+
+        results = [storage.incr(KEY, 60) for _ in range(5)]
+
+        assert results[:3] == [1, 2, 3]
+        assert all(result > 3 for result in results[3:])
+        assert storage.stats()["pending"] == 3
+        assert storage.stats()["fast_rejects"] == 2
+
+    def test_reset_clears_local_windows(self):
+        """reset() forgets every window."""
+        storage = PostgresCounterStorage()
+        storage.incr(KEY, 60)
+
+        storage.reset()
+
+        assert storage.get(KEY) == 0
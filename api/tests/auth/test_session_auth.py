@@ -0,0 +1,226 @@
+"""
+Tests for session (access-token cookie) authentication:
+- Data routes accept the access_token cookie without an API key
+- Cookie writes must come from an allowed origin and sessions have a budget
+- Claims authorise the request without touching the database
+- Role changes bump auth_version and make older tokens stale, on every worker
+"""
+
+from uuid import UUID
+
+from httpx import AsyncClient
+from sqlalchemy import event, select, update
+
+from app.auth.cache import PrincipalCache, principal_cache
+from app.auth.jwt import create_access_token, create_refresh_token
+from app.config import settings
+from app.models.user import User
+
+
+async def _login(async_client: AsyncClient, user: dict) -> str:
+    response = await async_client.post(
+        "/api/v1/auth/login",
+        json={"username": user["username"], "password": user["password"]},
+    )
+    assert response.status_code == 200
+    return response.cookies["access_token"]
+
+
+class TestSessionAuth:
+    """Access-token cookies on data routes."""
+
+    async def test_cookie_authenticates_without_api_key(
+        self, async_client: AsyncClient, test_user: dict
+    ):
+        """GET /users/me works with only the session cookie."""
+        token = await _login(async_client, test_user)
+        async_client.cookies.set("access_token", token)
+
+        response = await async_client.get("/api/v1/users/me")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["username"] == test_user["username"]
+        assert set(data["roles"]) == set(test_user["roles"])
+
+    async def test_cookie_auth_runs_no_queries(
+        self, async_client: AsyncClient, test_user: dict, db_session
+    ):
+        """A valid token whose version this worker knows is authorised from its claims alone."""
+        token = await _login(async_client, test_user)
+        async_client.cookies.set("access_token", token)
+        statements: list[str] = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db_session.bind.sync_engine
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            response = await async_client.get("/api/v1/users/me")
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        assert response.status_code == 200
+        assert statements == []
+
+    async def test_token_without_claims_rejected(
+        self, async_client: AsyncClient, test_user: dict
+    ):
+        """Access tokens without roles/version claims do not authenticate."""
+        async_client.cookies.set("access_token", create_access_token(test_user["user_id"]))
+
+        response = await async_client.get("/api/v1/users/me")
+
+        assert response.status_code == 401
+
+    async def test_refresh_token_rejected_as_access_token(
+        self, async_client: AsyncClient, test_user: dict
+    ):
+        """A refresh token in the access_token cookie is refused."""
+        async_client.cookies.set("access_token", create_refresh_token(test_user["user_id"]))
+
+        response = await async_client.get("/api/v1/users/me")
+
+        assert response.status_code == 401
+
+
+class TestSessionWrites:
+    """Cross-site protection and rate limits for cookie requests."""
+
+    async def test_write_from_own_origin_allowed(self, async_client: AsyncClient, test_user: dict):
+        """A write whose Origin is this site goes through."""
+        async_client.cookies.set("access_token", await _login(async_client, test_user))
+
+        response = await async_client.patch(
+            "/api/v1/users/me/profile",
+            json={"display_name": "Human"},
+            headers={"Origin": "http://test"},
+        )
+
+        assert response.status_code == 200
+
+    async def test_cross_origin_write_rejected(self, async_client: AsyncClient, test_user: dict):
+        """Writes from another origin, or with no Origin or Referer, are refused."""
+        async_client.cookies.set("access_token", await _login(async_client, test_user))
+
+        for headers in (
+            {"Origin": "https://evil.example"},
+            {"Referer": "https://evil.example/x"},
+            {},
+        ):
+            response = await async_client.post(
+                "/api/v1/auth/api-keys",
+                json={"name": "Stolen", "scopes": ["library:read"]},
+                headers=headers,
+            )
+            assert response.status_code == 403, headers
+            assert response.json()["detail"]["error"]["code"] == "CSRF_FAILED"
+
+        response = await async_client.get(
+            "/api/v1/users/me", headers={"Origin": "https://evil.example"}
+        )
+        assert response.status_code == 200
+
+    async def test_sessions_have_a_read_budget(
+        self, async_client: AsyncClient, test_user: dict, monkeypatch
+    ):
+        """Cookie requests are charged to a per-user budget like API keys are."""
+        monkeypatch.setattr(settings, "session_rate_limit_reads", 2)
+        async_client.cookies.set("access_token", await _login(async_client, test_user))
+
+        for remaining in ("1", "0"):
+            response = await async_client.get("/api/v1/users/me")
+            assert response.headers["X-RateLimit-Remaining"] == remaining
+
+        response = await async_client.get("/api/v1/users/me")
+        assert response.status_code == 429
+        assert response.json()["detail"]["error"]["code"] == "RATE_LIMITED"
+
+
+class TestSessionAuthVersion:
+    """Early invalidation of session tokens on role change."""
+
+    async def test_role_change_makes_token_stale(
+        self, async_client: AsyncClient, test_user: dict, test_admin: dict, auth_headers, db_session
+    ):
+        """After an admin changes roles, the old token is rejected; a new login works."""
+        token = await _login(async_client, test_user)
+
+        response = await async_client.patch(
+            f"/api/v1/admin/users/{test_user['username']}/roles",
+            json={"roles": ["library:read"]},
+            headers=auth_headers(test_admin["api_key"]),
+        )
+        assert response.status_code == 200
+
+        version = await db_session.scalar(
+            select(User.auth_version).where(User.id == UUID(test_user["user_id"]))
+        )
+        assert version > 0
+
+        async_client.cookies.set("access_token", token)
+        response = await async_client.get("/api/v1/users/me")
+        assert response.status_code == 401
+
+        async_client.cookies.set("access_token", await _login(async_client, test_user))
+        response = await async_client.get("/api/v1/users/me")
+        assert response.status_code == 200
+        assert response.json()["roles"] == ["library:read"]
+
+    def test_version_notification_is_applied(self):
+        """A "ver:" payload from another worker marks older tokens stale."""
+        user_id = UUID("00000000-0000-0000-0000-0000000000a1")
+
+        principal_cache.apply_notification(f"ver:{user_id}:3")
+        principal_cache.apply_notification(f"ver:{user_id}:2")
+
+        assert principal_cache.get_auth_version(user_id) == 3
+
+    async def test_unknown_version_is_loaded_from_database(
+        self, async_client: AsyncClient, test_user: dict, db_session
+    ):
+        """A worker that missed the change (cold or reconnected) still rejects the old token."""
+        token = await _login(async_client, test_user)
+        # A change made elsewhere whose notification this worker never saw
+        await db_session.execute(
+            update(User)
+            .where(User.id == UUID(test_user["user_id"]))
+            .values(auth_version=User.auth_version + 1)
+        )
+        await db_session.commit()
+        # The listener clears the cache when it reconnects
+        principal_cache.clear()
+        async_client.cookies.set("access_token", token)
+
+        response = await async_client.get("/api/v1/users/me")
+
+        assert response.status_code == 401
+        version = await db_session.scalar(
+            select(User.auth_version).where(User.id == UUID(test_user["user_id"]))
+        )
+        assert principal_cache.get_auth_version(UUID(test_user["user_id"])) == version
+
+    async def test_versions_are_bounded(self):
+        """Auth versions are evicted least recently used first, like principals."""
+        cache = PrincipalCache(max_entries=2, ttl_seconds=60)
+        first, second, third = (UUID(int=i) for i in range(1, 4))
+        cache.note_auth_version(first, 1)
+        cache.note_auth_version(second, 1)
+        cache.get_auth_version(first)
+
+        cache.note_auth_version(third, 1)
+
+        assert cache.get_auth_version(second) is None
+        assert cache.get_auth_version(first) == 1
+        assert cache.stats()["auth_versions"] == 2
+
+    async def test_stale_database_read_is_not_cached(self):
+        """A version read before an invalidation is not stored."""
+        user_id = UUID(int=1)
+        generation = principal_cache.generation
+        principal_cache.clear()
+
+        principal_cache.note_auth_version(user_id, 1, generation)
+
+        assert principal_cache.get_auth_version(user_id) is None
@@ -3,8 +3,16 @@ Tests for bulletin comment endpoints:
 - POST /api/v1/bulletin/posts/{id}/comments (add comment)
 """
 
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event, func, insert, select, update
+
+from app.models.bulletin import BulletinFollow
+from app.models.notification import Notification
+from app.models.user import User
 
 
 class TestAddComment:
@@ -142,3 +150,202 @@ class TestAddComment:
             headers=auth_headers(second_user["api_key"]),
         )
         assert response.status_code == 201
+
+
+class TestCommentNotifications:
+    """New comments notify the post's followers."""
+
+    async def _post_followed_by(self, async_client: AsyncClient, auth_headers, author: dict, *followers: dict) -> str:
+        response = await async_client.post(
+            "/api/v1/bulletin/posts",
+            json={"title": "Busy Thread", "content_md": "Content"},
+            headers=auth_headers(author["api_key"]),
+        )
+        post_id = response.json()["id"]
+        for follower in followers:
+            await async_client.post(
+                f"/api/v1/bulletin/posts/{post_id}/follow",
+                headers=auth_headers(follower["api_key"]),
+            )
+        return post_id
+
+    async def _notifications(self, async_client: AsyncClient, auth_headers, user: dict) -> list[dict]:
+        response = await async_client.get(
+            "/api/v1/inbox/notifications",
+            headers=auth_headers(user["api_key"]),
+        )
+        return response.json()["items"]
+
+    async def test_followers_are_notified(
+        self, async_client: AsyncClient, test_user: dict, second_user: dict, test_admin: dict, auth_headers
+    ):
+        """Every follower except the commenter gets one notification."""
+        post_id = await self._post_followed_by(
+            async_client, auth_headers, test_user, test_user, second_user, test_admin
+        )
+
+        response = await async_client.post(
+            f"/api/v1/bulletin/posts/{post_id}/comments",
+            json={"content_md": "A reply"},
+            headers=auth_headers(second_user["api_key"]),
+        )
+        comment_id = response.json()["id"]
+
+        for follower in (test_user, test_admin):
+            [notification] = await self._notifications(async_client, auth_headers, follower)
+            assert notification["notification_type"] == "new_comment"
+            assert notification["title"] == 'New comment on "Busy Thread"'
+            assert notification["body"] == "A reply"
+            assert notification["resource_type"] == "bulletin_post"
+            assert notification["resource_id"] == post_id
+            assert notification["payload"]["comment_id"] == comment_id
+            assert notification["payload"]["actor_id"] == second_user["user_id"]
+        assert await self._notifications(async_client, auth_headers, second_user) == []
+
+    async def test_unfollowed_posts_notify_nobody(
+        self, async_client: AsyncClient, test_user: dict, second_user: dict, auth_headers, db_session
+    ):
+        """Comments on a post nobody follows create no notifications."""
+        post_id = await self._post_followed_by(async_client, auth_headers, test_user)
+
+        await async_client.post(
+            f"/api/v1/bulletin/posts/{post_id}/comments",
+            json={"content_md": "Into the void"},
+            headers=auth_headers(second_user["api_key"]),
+        )
+
+        count = await db_session.scalar(select(func.count()).select_from(Notification))
+        assert count == 0
+
+    async def test_fan_out_is_one_statement(
+        self, async_client: AsyncClient, test_user: dict, second_user: dict, auth_headers, db_session
+    ):
+        """Hundreds of followers are notified by a single INSERT ... SELECT."""
+        post_id = await self._post_followed_by(async_client, auth_headers, test_user)
+        users = [
+            {"username": f"follower{i}", "email": f"follower{i}@example.com", "password_hash": "x"}
+            for i in range(300)
+        ]
+        follower_ids = (
+            await db_session.execute(insert(User).values(users).returning(User.id))
+        ).scalars().all()
+        await db_session.execute(
+            insert(BulletinFollow).values(
+                [{"user_id": user_id, "post_id": UUID(post_id)} for user_id in follower_ids]
+            )
+        )
+        await db_session.commit()
+
+        inserts = []
+
+        def count_inserts(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT INTO notifications"):
+                inserts.append(statement)
+
+        engine = db_session.bind.sync_engine
+        event.listen(engine, "before_cursor_execute", count_inserts)
+        try:
+            response = await async_client.post(
+                f"/api/v1/bulletin/posts/{post_id}/comments",
+                json={"content_md": "Hello everyone"},
+                headers=auth_headers(second_user["api_key"]),
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", count_inserts)
+
+        assert response.status_code == 201
+        assert len(inserts) == 1
+        count = await db_session.scalar(select(func.count()).select_from(Notification))
+        assert count == 300
+
+    async def _comment(self, async_client: AsyncClient, auth_headers, post_id: str, user: dict, text: str) -> str:
+        response = await async_client.post(
+            f"/api/v1/bulletin/posts/{post_id}/comments",
+            json={"content_md": text},
+            headers=auth_headers(user["api_key"]),
+        )
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    async def test_unread_comments_coalesce_into_a_digest(
+        self, async_client: AsyncClient, test_user: dict, second_user: dict, test_admin: dict, auth_headers
+    ):
+        """Further comments update the follower's unread row instead of adding rows."""
+        post_id = await self._post_followed_by(async_client, auth_headers, test_user, test_user)
+
+        await self._comment(async_client, auth_headers, post_id, second_user, "First")
+        [first] = await self._notifications(async_client, auth_headers, test_user)
+        await self._comment(async_client, auth_headers, post_id, second_user, "Second")
+        last_id = await self._comment(async_client, auth_headers, post_id, test_admin, "Third")
+
+        [digest] = await self._notifications(async_client, auth_headers, test_user)
+        assert digest["id"] == first["id"]
+        assert digest["title"] == '3 new comments on "Busy Thread"'
+        assert digest["body"] == "Third"
+        assert digest["payload"]["count"] == 3
+        assert digest["payload"]["comment_id"] == last_id
+        assert digest["payload"]["actor_id"] == test_admin["user_id"]
+        assert digest["created_at"] > first["created_at"]
+        summary = await async_client.get(
+            "/api/v1/inbox/summary", headers=auth_headers(test_user["api_key"])
+        )
+        assert (summary.json()["unread_count"], summary.json()["total_count"]) == (1, 1)
+
+    async def test_older_event_does_not_move_digest_back(
+        self, async_client: AsyncClient, test_user: dict, second_user: dict, auth_headers, db_session
+    ):
+        """An event stamped before the row's created_at still counts but keeps its place."""
+        post_id = await self._post_followed_by(async_client, auth_headers, test_user, test_user)
+        await self._comment(async_client, auth_headers, post_id, second_user, "First")
+        # As if a later event had committed first
+        later = datetime.now(UTC) + timedelta(hours=1)
+        await db_session.execute(update(Notification).values(created_at=later))
+        await db_session.commit()
+
+        await self._comment(async_client, auth_headers, post_id, second_user, "Second")
+
+        [digest] = await self._notifications(async_client, auth_headers, test_user)
+        assert digest["payload"]["count"] == 2
+        assert datetime.fromisoformat(digest["created_at"]) == later
+
+    async def test_read_notification_is_not_coalesced_into(
+        self, async_client: AsyncClient, test_user: dict, second_user: dict, auth_headers
+    ):
+        """Once read, the next comment starts a fresh notification."""
+        post_id = await self._post_followed_by(async_client, auth_headers, test_user, test_user)
+        await self._comment(async_client, auth_headers, post_id, second_user, "First")
+        [first] = await self._notifications(async_client, auth_headers, test_user)
+        await async_client.post(
+            f"/api/v1/inbox/notifications/{first['id']}/read",
+            headers=auth_headers(test_user["api_key"]),
+        )
+
+        await self._comment(async_client, auth_headers, post_id, second_user, "Second")
+
+        newest, oldest = await self._notifications(async_client, auth_headers, test_user)
+        assert oldest["id"] == first["id"]
+        assert newest["title"] == 'New comment on "Busy Thread"'
+        assert newest["read_at"] is None
+
+    async def test_read_all_restarts_the_count(
+        self, async_client: AsyncClient, test_user: dict, second_user: dict, auth_headers
+    ):
+        """A row read through the watermark is revived as a single new comment."""
+        post_id = await self._post_followed_by(async_client, auth_headers, test_user, test_user)
+        await self._comment(async_client, auth_headers, post_id, second_user, "First")
+        await self._comment(async_client, auth_headers, post_id, second_user, "Second")
+        await async_client.post(
+            "/api/v1/inbox/notifications/read-all",
+            headers=auth_headers(test_user["api_key"]),
+        )
+
+        await self._comment(async_client, auth_headers, post_id, second_user, "Third")
+
+        [notification] = await self._notifications(async_client, auth_headers, test_user)
+        assert notification["title"] == 'New comment on "Busy Thread"'
+        assert notification["payload"]["count"] == 1
+        assert notification["read_at"] is None
+        summary = await async_client.get(
+            "/api/v1/inbox/summary", headers=auth_headers(test_user["api_key"])
+        )
+        assert summary.json()["unread_count"] == 1
@@ -14,6 +14,11 @@ from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.pool import NullPool
 
+from app.auth.cache import principal_cache
+from app.services.activity import activity_writer
+from app.services.idempotency import replay_cache
+from app.services.read_rollup import read_rollup
+from app.services.key_rate_limit import key_rate_limiter
 from app.config import settings
 from app.database import get_db, init_db, migrate_db
 from app.main import app
@@ -59,12 +64,19 @@ def event_loop():
 @pytest.fixture(autouse=True)
 def reset_rate_limiter():
     """Reset rate limiter before each test to ensure test isolation."""
-    # Clear rate limiter storage before each test by clearing its internal storage dict
-    # slowapi uses limits library with in-memory storage by default
-    if hasattr(limiter, "_limiter") and limiter._limiter:
-        storage = limiter._limiter.storage
-        if hasattr(storage, "storage"):
-            storage.storage.clear()
+    # Clears the limiter's local counters (memory or pgbatch storage)
+    limiter.reset()
+    key_rate_limiter.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_principal_cache():
+    """Clear per-worker caches and queues so each test starts cold."""
+    principal_cache.clear()
+    replay_cache.clear()
+    activity_writer.clear()
+    read_rollup.clear()
     yield
 
 
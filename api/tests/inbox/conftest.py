@@ -0,0 +1,71 @@
+"""
+Shared fixtures for inbox tests.
+
+Provides a notification factory and an inbox summary reader.
+"""
+
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+import pytest
+from httpx import AsyncClient
+
+from app.models.notification import Notification
+
+
+@pytest.fixture
+def notification_factory(db_session):
+    """
+    Factory fixture for adding notifications to a user's inbox.
+
+    With ages, adds one notification per age, created that long before now;
+    otherwise adds count notifications with the given fields. read marks each
+    one read an hour after it was created. Rows are committed and returned in
+    order.
+    """
+
+    async def _add(
+        user: dict,
+        *ages: timedelta,
+        count: int = 1,
+        read: bool = False,
+        now: datetime | None = None,
+        **fields,
+    ) -> list[Notification]:
+        now = now or datetime.now(UTC)
+        if ages:
+            fields_per_row = [fields | {"created_at": now - age} for age in ages]
+        else:
+            fields_per_row = [dict(fields) for _ in range(count)]
+        rows = []
+        for i, row_fields in enumerate(fields_per_row):
+            if read:
+                row_fields["read_at"] = row_fields.get("created_at", now) + timedelta(hours=1)
+            rows.append(
+                Notification(
+                    user_id=UUID(user["user_id"]),
+                    notification_type="test",
+                    title=f"Notification {i}",
+                    **row_fields,
+                )
+            )
+        db_session.add_all(rows)
+        await db_session.commit()
+        return rows
+
+    return _add
+
+
+@pytest.fixture
+def inbox_summary(async_client: AsyncClient, auth_headers):
+    """Factory fixture for reading a user's GET /api/v1/inbox/summary."""
+
+    async def _summary(user: dict) -> dict:
+        response = await async_client.get(
+            "/api/v1/inbox/summary",
+            headers=auth_headers(user["api_key"]),
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    return _summary
@@ -0,0 +1,203 @@
+"""
+Tests for bulk inbox operations:
+- POST /api/v1/inbox/notifications/bulk-read
+- POST /api/v1/inbox/notifications/bulk-delete
+"""
+
+from datetime import UTC, datetime, timedelta
+from uuid import uuid4
+
+from httpx import AsyncClient
+from sqlalchemy import event, func, select
+
+from app.models.notification import Notification
+
+MINUTE = timedelta(minutes=1)
+
+
+class TestBulkRead:
+    """POST /api/v1/inbox/notifications/bulk-read tests."""
+
+    async def test_reports_outcome_per_id(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        second_user: dict,
+        auth_headers,
+        db_session,
+        notification_factory,
+        inbox_summary,
+    ):
+        """Ids are marked read, already read or not found, in request order."""
+        unread, read = await notification_factory(test_user, 2 * MINUTE, MINUTE)
+        [theirs] = await notification_factory(second_user, MINUTE)
+        await async_client.post(
+            f"/api/v1/inbox/notifications/{read.id}/read",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        missing = uuid4()
+
+        response = await async_client.post(
+            "/api/v1/inbox/notifications/bulk-read",
+            json={"ids": [str(theirs.id), str(read.id), str(unread.id), str(missing)]},
+            headers=auth_headers(test_user["api_key"]),
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 1
+        assert [(r["id"], r["status"]) for r in data["results"]] == [
+            (str(theirs.id), "not_found"),
+            (str(read.id), "already_read"),
+            (str(unread.id), "read"),
+            (str(missing), "not_found"),
+        ]
+        assert all(r["read_at"] for r in data["results"][1:3])
+        assert (await inbox_summary(test_user))["unread_count"] == 0
+        await db_session.refresh(theirs)
+        assert theirs.read_at is None
+
+    async def test_ids_are_marked_in_one_statement(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        auth_headers,
+        db_session,
+        notification_factory,
+    ):
+        """Hundreds of ids cost a single statement against notifications."""
+        rows = await notification_factory(test_user, *(age * MINUTE for age in range(300)))
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db_session.bind.sync_engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = await async_client.post(
+                "/api/v1/inbox/notifications/bulk-read",
+                json={"ids": [str(row.id) for row in rows]},
+                headers=auth_headers(test_user["api_key"]),
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.json()["count"] == 300
+        assert len([s for s in statements if "notifications" in s]) == 1
+
+    async def test_before_cursor_marks_older_notifications(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        auth_headers,
+        db_session,
+        notification_factory,
+    ):
+        """Everything created before the cursor is read; the rest stays unread."""
+        old, older, newer = await notification_factory(
+            test_user, 30 * MINUTE, 60 * MINUTE, 5 * MINUTE
+        )
+
+        response = await async_client.post(
+            "/api/v1/inbox/notifications/bulk-read",
+            json={"before": old.created_at.isoformat()},
+            headers=auth_headers(test_user["api_key"]),
+        )
+
+        assert response.json() == {"count": 1, "results": []}
+        response = await async_client.get(
+            "/api/v1/inbox/notifications?unread_only=true",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert [item["id"] for item in response.json()["items"]] == [str(newer.id), str(old.id)]
+
+    async def test_requires_ids_or_before(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Exactly one of ids and before, and at most 500 ids."""
+        for body in (
+            {},
+            {"ids": [str(uuid4())], "before": datetime.now(UTC).isoformat()},
+            {"ids": []},
+            {"ids": [str(uuid4()) for _ in range(501)]},
+            {"before": "2026-01-01T00:00:00"},
+        ):
+            response = await async_client.post(
+                "/api/v1/inbox/notifications/bulk-read",
+                json=body,
+                headers=auth_headers(test_user["api_key"]),
+            )
+            assert response.status_code == 422, body
+
+    async def test_requires_auth(self, async_client: AsyncClient):
+        """Unauthenticated request returns 401."""
+        response = await async_client.post(
+            "/api/v1/inbox/notifications/bulk-read", json={"ids": [str(uuid4())]}
+        )
+        assert response.status_code == 401
+
+
+class TestBulkDelete:
+    """POST /api/v1/inbox/notifications/bulk-delete tests."""
+
+    async def test_reports_outcome_per_id(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        second_user: dict,
+        auth_headers,
+        db_session,
+        notification_factory,
+        inbox_summary,
+    ):
+        """Own notifications are deleted; others' are not found and kept."""
+        mine, kept = await notification_factory(test_user, MINUTE, 2 * MINUTE)
+        [theirs] = await notification_factory(second_user, MINUTE)
+
+        response = await async_client.post(
+            "/api/v1/inbox/notifications/bulk-delete",
+            json={"ids": [str(mine.id), str(theirs.id), str(mine.id)]},
+            headers=auth_headers(test_user["api_key"]),
+        )
+
+        assert response.json() == {
+            "count": 1,
+            "results": [
+                {"id": str(mine.id), "status": "deleted", "read_at": None},
+                {"id": str(theirs.id), "status": "not_found", "read_at": None},
+            ],
+        }
+        summary = await inbox_summary(test_user)
+        assert (summary["unread_count"], summary["total_count"]) == (1, 1)
+        remaining = await db_session.scalar(select(func.count()).select_from(Notification))
+        assert remaining == 2
+
+    async def test_before_cursor_deletes_older_notifications(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        auth_headers,
+        db_session,
+        notification_factory,
+    ):
+        """Everything created before the cursor is deleted."""
+        cursor, older, newer = await notification_factory(
+            test_user, 30 * MINUTE, 60 * MINUTE, 5 * MINUTE
+        )
+
+        response = await async_client.post(
+            "/api/v1/inbox/notifications/bulk-delete",
+            json={"before": cursor.created_at.isoformat()},
+            headers=auth_headers(test_user["api_key"]),
+        )
+
+        assert response.json() == {"count": 1, "results": []}
+        response = await async_client.get(
+            "/api/v1/inbox/notifications",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert [item["id"] for item in response.json()["items"]] == [
+            str(newer.id),
+            str(cursor.id),
+        ]
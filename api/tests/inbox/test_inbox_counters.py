@@ -0,0 +1,295 @@
+"""
+Tests for inbox counters:
+- inbox_counters follows notification inserts, reads and deletes (triggers)
+- GET /api/v1/inbox/summary reads the counter row
+- POST /api/v1/inbox/notifications/read-all advances the read_through watermark
+- InboxCounterRepair recounts drifted rows
+"""
+
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+from httpx import AsyncClient
+from sqlalchemy import event, func, select, update
+
+from app.models.notification import InboxCounter, Notification
+from app.services.inbox_counters import InboxCounterRepair
+
+
+async def _counter(db_session, user_id: str) -> InboxCounter | None:
+    return (
+        await db_session.execute(
+            select(InboxCounter)
+            .where(InboxCounter.user_id == UUID(user_id))
+            .execution_options(populate_existing=True)
+        )
+    ).scalar_one_or_none()
+
+
+class TestInboxCounters:
+    """Counter rows are kept in step with notifications by triggers."""
+
+    async def test_summary_without_notifications(self, test_user: dict, inbox_summary):
+        """A user who never had a notification has no row and zero counts."""
+        data = await inbox_summary(test_user)
+        assert data == {
+            "unread_count": 0,
+            "total_count": 0,
+            "latest_at": None,
+            "read_through": None,
+        }
+
+    async def test_insert_read_and_delete(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        auth_headers,
+        db_session,
+        notification_factory,
+        inbox_summary,
+    ):
+        """Counts follow inserts, mark-read, read-all and delete."""
+        rows = await notification_factory(test_user, count=3)
+        data = await inbox_summary(test_user)
+        assert (data["unread_count"], data["total_count"]) == (3, 3)
+        assert data["latest_at"] is not None
+
+        await async_client.post(
+            f"/api/v1/inbox/notifications/{rows[0].id}/read",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        data = await inbox_summary(test_user)
+        assert (data["unread_count"], data["total_count"]) == (2, 3)
+
+        await async_client.delete(
+            f"/api/v1/inbox/notifications/{rows[1].id}",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        data = await inbox_summary(test_user)
+        assert (data["unread_count"], data["total_count"]) == (1, 2)
+
+        await async_client.post(
+            "/api/v1/inbox/notifications/read-all",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        data = await inbox_summary(test_user)
+        assert (data["unread_count"], data["total_count"]) == (0, 2)
+
+    async def test_fan_out_counts_each_recipient(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        second_user: dict,
+        test_admin: dict,
+        auth_headers,
+        db_session,
+    ):
+        """A comment fan-out bumps every follower's row but not the commenter's."""
+        response = await async_client.post(
+            "/api/v1/bulletin/posts",
+            json={"title": "Thread", "content_md": "Content"},
+            headers=auth_headers(test_user["api_key"]),
+        )
+        post_id = response.json()["id"]
+        for follower in (test_user, test_admin):
+            await async_client.post(
+                f"/api/v1/bulletin/posts/{post_id}/follow",
+                headers=auth_headers(follower["api_key"]),
+            )
+
+        await async_client.post(
+            f"/api/v1/bulletin/posts/{post_id}/comments",
+            json={"content_md": "Hi"},
+            headers=auth_headers(second_user["api_key"]),
+        )
+
+        for user in (test_user, test_admin):
+            counter = await _counter(db_session, user["user_id"])
+            assert (counter.unread, counter.total) == (1, 1)
+        assert await _counter(db_session, second_user["user_id"]) is None
+
+    async def test_deleting_newest_recomputes_latest_at(
+        self, test_user: dict, db_session, notification_factory
+    ):
+        """latest_at falls back to the newest remaining notification."""
+        now = datetime.now(UTC)
+        older = await notification_factory(test_user, created_at=now - timedelta(hours=1))
+        newest = await notification_factory(test_user, created_at=now)
+        assert (await _counter(db_session, test_user["user_id"])).latest_at == now
+
+        await db_session.delete(newest[0])
+        await db_session.commit()
+
+        counter = await _counter(db_session, test_user["user_id"])
+        assert counter.latest_at == older[0].created_at
+        assert counter.total == 1
+
+
+class TestReadWatermark:
+    """Mark-all-read moves a per-user watermark instead of updating rows."""
+
+    async def test_read_all_writes_no_notification_rows(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        auth_headers,
+        db_session,
+        notification_factory,
+        inbox_summary,
+    ):
+        """Only the counter row is written, and every notification reads as read."""
+        rows = await notification_factory(test_user, count=5)
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db_session.bind.sync_engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = await async_client.post(
+                "/api/v1/inbox/notifications/read-all",
+                headers=auth_headers(test_user["api_key"]),
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.json() == {"marked_count": 5}
+        assert not [s for s in statements if s.lstrip().startswith("UPDATE notifications")]
+        untouched = await db_session.scalar(
+            select(func.count())
+            .select_from(Notification)
+            .where(
+                Notification.user_id == UUID(test_user["user_id"]), Notification.read_at.is_(None)
+            )
+        )
+        assert untouched == len(rows)
+
+        summary = await inbox_summary(test_user)
+        assert (summary["unread_count"], summary["total_count"]) == (0, 5)
+        listing = await async_client.get(
+            "/api/v1/inbox/notifications",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert {item["read_at"] for item in listing.json()["items"]} == {summary["read_through"]}
+
+    async def test_newer_notifications_stay_unread(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        auth_headers,
+        db_session,
+        notification_factory,
+        inbox_summary,
+    ):
+        """Rows created after the watermark count, list and read individually."""
+        await notification_factory(test_user, count=2)
+        await async_client.post(
+            "/api/v1/inbox/notifications/read-all",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        newer = await notification_factory(
+            test_user, created_at=datetime.now(UTC) + timedelta(seconds=1)
+        )
+
+        summary = await inbox_summary(test_user)
+        assert (summary["unread_count"], summary["total_count"]) == (1, 3)
+        response = await async_client.get(
+            "/api/v1/inbox/notifications?unread_only=true",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert [item["id"] for item in response.json()["items"]] == [str(newer[0].id)]
+
+        await async_client.post(
+            f"/api/v1/inbox/notifications/{newer[0].id}/read",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        assert (await inbox_summary(test_user))["unread_count"] == 0
+
+    async def test_marking_covered_notification_is_a_no_op(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        auth_headers,
+        db_session,
+        notification_factory,
+        inbox_summary,
+    ):
+        """A notification under the watermark reports it as its read time."""
+        rows = await notification_factory(test_user)
+        await async_client.post(
+            "/api/v1/inbox/notifications/read-all",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        read_through = (await inbox_summary(test_user))["read_through"]
+
+        response = await async_client.post(
+            f"/api/v1/inbox/notifications/{rows[0].id}/read",
+            headers=auth_headers(test_user["api_key"]),
+        )
+
+        assert response.json()["read_at"] == read_through
+        await db_session.refresh(rows[0])
+        assert rows[0].read_at is None
+
+    async def test_late_commit_under_watermark_counts_as_read(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        auth_headers,
+        db_session,
+        notification_factory,
+        inbox_summary,
+    ):
+        """A row committed after read-all but created before it is already read."""
+        await async_client.post(
+            "/api/v1/inbox/notifications/read-all",
+            headers=auth_headers(test_user["api_key"]),
+        )
+        await notification_factory(test_user, created_at=datetime.now(UTC) - timedelta(minutes=1))
+
+        summary = await inbox_summary(test_user)
+        assert (summary["unread_count"], summary["total_count"]) == (0, 1)
+        repair = InboxCounterRepair(interval_seconds=60, batch_size=100)
+        assert await repair.repair(db_session, [UUID(test_user["user_id"])]) == 0
+
+
+class TestInboxCounterRepair:
+    """InboxCounterRepair tests."""
+
+    async def test_repairs_drifted_rows_only(
+        self, test_user: dict, second_user: dict, db_session, notification_factory
+    ):
+        """Rows that disagree with notifications are rewritten and counted."""
+        await notification_factory(test_user, count=2)
+        await notification_factory(second_user, count=1)
+        await db_session.execute(
+            update(InboxCounter)
+            .where(InboxCounter.user_id == UUID(test_user["user_id"]))
+            .values(unread=40, total=41)
+        )
+        await db_session.commit()
+        repair = InboxCounterRepair(interval_seconds=60, batch_size=1)
+
+        assert await repair.repair(db_session) == 1
+
+        counter = await _counter(db_session, test_user["user_id"])
+        assert (counter.unread, counter.total) == (2, 2)
+        assert repair.stats()["users_checked"] >= 2
+        assert await repair.repair(db_session) == 0
+
+    async def test_creates_missing_rows(self, test_user: dict, db_session, notification_factory):
+        """Users whose row is missing get one, recounted."""
+        await notification_factory(test_user, count=2)
+        await db_session.execute(
+            InboxCounter.__table__.delete().where(
+                InboxCounter.user_id == UUID(test_user["user_id"])
+            )
+        )
+        await db_session.commit()
+
+        repair = InboxCounterRepair(interval_seconds=60, batch_size=100)
+        assert await repair.repair(db_session, [UUID(test_user["user_id"])]) == 1
+
+        counter = await _counter(db_session, test_user["user_id"])
+        assert (counter.unread, counter.total) == (2, 2)
@@ -0,0 +1,99 @@
+"""
+Tests for notification retention:
+- InboxRetention deletes or archives old read notifications in batches
+- Dry-run mode only counts them
+"""
+
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import func, select
+
+from app.models.notification import InboxCounter, Notification, NotificationArchive
+from app.services.inbox_counters import mark_all_read
+from app.services.inbox_retention import InboxRetention
+
+
+async def _remaining(db_session) -> set[UUID]:
+    result = await db_session.execute(select(Notification.id))
+    return set(result.scalars().all())
+
+
+def _retention(**overrides) -> InboxRetention:
+    options = {
+        "retention_days": 30,
+        "mode": "delete",
+        "batch_size": 100,
+        "interval_seconds": 60,
+    }
+    return InboxRetention(**(options | overrides))
+
+
+class TestInboxRetention:
+    """InboxRetention tests."""
+
+    async def test_deletes_only_old_read_notifications(
+        self, test_user: dict, db_session, notification_factory
+    ):
+        """Old rows read individually or by the watermark go; unread and recent stay."""
+        now = datetime.now(UTC)
+        await notification_factory(test_user, timedelta(days=60), read=True, now=now)
+        await notification_factory(test_user, timedelta(days=50), now=now)
+        await mark_all_read(db_session, UUID(test_user["user_id"]), now - timedelta(days=45))
+        await db_session.commit()
+        unread = await notification_factory(test_user, timedelta(days=40), now=now)
+        recent = await notification_factory(test_user, timedelta(days=10), read=True, now=now)
+
+        retention = _retention()
+        assert await retention.maintain(db_session, now) == 2
+
+        assert await _remaining(db_session) == {unread[0].id, recent[0].id}
+        counter = await db_session.get(InboxCounter, UUID(test_user["user_id"]))
+        await db_session.refresh(counter)
+        assert (counter.unread, counter.total) == (1, 2)
+        assert retention.stats()["removed"] == 2
+
+    async def test_works_in_batches(self, test_user: dict, db_session, notification_factory):
+        """Each batch removes at most batch_size rows and commits."""
+        now = datetime.now(UTC)
+        ages = [timedelta(days=age) for age in range(40, 45)]
+        await notification_factory(test_user, *ages, read=True, now=now)
+
+        retention = _retention(batch_size=2)
+        assert await retention.maintain(db_session, now) == 5
+
+        assert await _remaining(db_session) == set()
+        assert retention.stats()["batches"] == 3
+
+    async def test_archive_keeps_a_compact_copy(
+        self, test_user: dict, db_session, notification_factory
+    ):
+        """Archived rows keep what and when, with the watermark as read time."""
+        now = datetime.now(UTC)
+        [old] = await notification_factory(test_user, timedelta(days=60), now=now)
+        read_through = now - timedelta(days=45)
+        await mark_all_read(db_session, UUID(test_user["user_id"]), read_through)
+        await db_session.commit()
+
+        assert await _retention(mode="archive").maintain(db_session, now) == 1
+
+        assert await _remaining(db_session) == set()
+        [archived] = (await db_session.execute(select(NotificationArchive))).scalars().all()
+        assert archived.id == old.id
+        assert archived.title == old.title
+        assert archived.read_at == read_through
+
+    async def test_dry_run_changes_nothing(self, test_user: dict, db_session, notification_factory):
+        """A dry run reports how many notifications would be removed."""
+        now = datetime.now(UTC)
+        await notification_factory(
+            test_user, timedelta(days=60), timedelta(days=50), read=True, now=now
+        )
+        await notification_factory(test_user, timedelta(days=50), now=now)
+
+        retention = _retention(dry_run=True)
+        assert await retention.maintain(db_session, now) == 2
+
+        assert await db_session.scalar(select(func.count()).select_from(Notification)) == 3
+        assert retention.stats()["eligible"] == 2
+        assert retention.stats()["removed"] == 0
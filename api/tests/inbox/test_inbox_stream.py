@@ -0,0 +1,226 @@
+"""
+Tests for inbox streaming:
+- GET /api/v1/inbox/stream (server-sent events)
+- New notifications are published over LISTEN/NOTIFY per recipient
+"""
+
+import asyncio
+import json
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.config import settings
+from app.models.notification import Notification
+from app.services.inbox_stream import (
+    INBOX_CHANNEL,
+    InboxBroker,
+    InboxStream,
+    event_id,
+    inbox_broker,
+)
+from app.services.listener import PostgresListener
+
+
+@pytest.fixture
+def short_streams(monkeypatch):
+    """Streams end quickly so ASGITransport can return the whole body."""
+    monkeypatch.setattr(settings, "inbox_stream_heartbeat_seconds", 0.1)
+    monkeypatch.setattr(settings, "inbox_stream_max_seconds", 0.6)
+
+
+@pytest_asyncio.fixture
+async def remote_broker(db_session):
+    """A broker fed only by Postgres notifications, like another worker's."""
+    broker = InboxBroker()
+    listener = PostgresListener()
+    listener.subscribe(INBOX_CHANNEL, broker.apply_notification)
+    await listener.start(settings.test_database_url)
+    assert await listener.wait_connected(timeout=5)
+    yield broker
+    await listener.stop()
+
+
+async def _notify(engine: AsyncEngine, user_id: str, title: str = "Hello") -> Notification:
+    """Create a notification in its own session, as another request would."""
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        notification = Notification(user_id=UUID(user_id), notification_type="test", title=title)
+        session.add(notification)
+        await session.commit()
+        await session.refresh(notification)
+        return notification
+
+
+def _events(body: str) -> list[dict]:
+    events = []
+    for frame in body.split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in frame.splitlines() if line and not line.startswith(":")
+        )
+        if fields.get("event") == "notification":
+            events.append({"id": fields["id"], "data": json.loads(fields["data"])})
+    return events
+
+
+class TestInboxNotify:
+    """Committed notifications wake the recipient's streams in every worker."""
+
+    async def test_insert_wakes_recipient_stream(
+        self, remote_broker: InboxBroker, test_user: dict, second_user: dict, db_session
+    ):
+        """Only the recipient's streams are woken."""
+        mine = remote_broker.subscribe(UUID(test_user["user_id"]))
+        theirs = remote_broker.subscribe(UUID(second_user["user_id"]))
+
+        await _notify(db_session.bind, test_user["user_id"])
+
+        await asyncio.wait_for(mine.wait(), timeout=5)
+        assert not theirs.is_set()
+
+    async def test_fan_out_publishes_once_per_recipient(
+        self,
+        async_client: AsyncClient,
+        remote_broker: InboxBroker,
+        test_user: dict,
+        second_user: dict,
+        test_admin: dict,
+        auth_headers,
+    ):
+        """A multi-row insert publishes one message per distinct recipient."""
+        response = await async_client.post(
+            "/api/v1/bulletin/posts",
+            json={"title": "Thread", "content_md": "Content"},
+            headers=auth_headers(test_user["api_key"]),
+        )
+        post_id = response.json()["id"]
+        for follower in (test_user, test_admin):
+            await async_client.post(
+                f"/api/v1/bulletin/posts/{post_id}/follow",
+                headers=auth_headers(follower["api_key"]),
+            )
+        woken = remote_broker.subscribe(UUID(test_admin["user_id"]))
+
+        await async_client.post(
+            f"/api/v1/bulletin/posts/{post_id}/comments",
+            json={"content_md": "Hi"},
+            headers=auth_headers(second_user["api_key"]),
+        )
+
+        await asyncio.wait_for(woken.wait(), timeout=5)
+        await asyncio.sleep(0.2)
+        assert remote_broker.stats()["notifications"] == 2
+
+
+    async def test_coalesced_event_wakes_recipient_stream(
+        self, remote_broker: InboxBroker, test_user: dict, db_session
+    ):
+        """Moving a row's created_at forward (a coalesced event) publishes too."""
+        notification = await _notify(db_session.bind, test_user["user_id"])
+        woken = remote_broker.subscribe(UUID(test_user["user_id"]))
+
+        await db_session.execute(
+            update(Notification)
+            .where(Notification.id == notification.id)
+            .values(created_at=datetime.now(UTC) + timedelta(seconds=1))
+        )
+        await db_session.commit()
+
+        await asyncio.wait_for(woken.wait(), timeout=5)
+
+    async def test_coalesced_row_is_sent_again(self, test_user: dict, db_session):
+        """A row already sent is re-sent once an event moves its created_at."""
+        notification = await _notify(db_session.bind, test_user["user_id"])
+        stream = InboxStream(UUID(test_user["user_id"]))
+        await stream.prime(db_session, datetime.now(UTC))
+        assert await stream.next(db_session) == []
+
+        await db_session.execute(
+            update(Notification)
+            .where(Notification.id == notification.id)
+            .values(created_at=datetime.now(UTC) + timedelta(seconds=1))
+        )
+        await db_session.commit()
+
+        assert [row.id for row in await stream.next(db_session)] == [notification.id]
+        assert await stream.next(db_session) == []
+
+
+class TestInboxStream:
+    """GET /api/v1/inbox/stream tests."""
+
+    async def _stream(self, async_client: AsyncClient, user: dict, auth_headers, **headers):
+        response = await async_client.get(
+            "/api/v1/inbox/stream",
+            headers=auth_headers(user["api_key"]) | headers,
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        return response
+
+    async def test_streams_new_notifications(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, short_streams, db_session
+    ):
+        """Notifications created while connected are pushed; older ones are not."""
+        await _notify(db_session.bind, test_user["user_id"], "Before")
+
+        async def notify_later():
+            await asyncio.sleep(0.2)
+            created = await _notify(db_session.bind, test_user["user_id"], "During")
+            inbox_broker.apply_notification(test_user["user_id"])
+            return created
+
+        task = asyncio.create_task(notify_later())
+        response = await self._stream(async_client, test_user, auth_headers)
+        created = await task
+
+        [event] = _events(response.text)
+        assert event["data"]["title"] == "During"
+        assert event["id"] == event_id(created)
+        assert ": keepalive" in response.text
+        assert inbox_broker.stats()["streams"] == 0
+
+    async def test_resume_sends_everything_after_last_event_id(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, short_streams, db_session
+    ):
+        """Reconnecting with Last-Event-ID replays only what came after it."""
+        first = await _notify(db_session.bind, test_user["user_id"], "First")
+        await _notify(db_session.bind, test_user["user_id"], "Second")
+        await _notify(db_session.bind, test_user["user_id"], "Third")
+
+        response = await self._stream(
+            async_client, test_user, auth_headers, **{"Last-Event-ID": event_id(first)}
+        )
+
+        assert [event["data"]["title"] for event in _events(response.text)] == ["Second", "Third"]
+
+    async def test_other_users_notifications_are_not_streamed(
+        self,
+        async_client: AsyncClient,
+        test_user: dict,
+        second_user: dict,
+        auth_headers,
+        short_streams,
+        db_session,
+    ):
+        """A stream only ever carries its own user's notifications."""
+
+        async def notify_other():
+            await asyncio.sleep(0.2)
+            await _notify(db_session.bind, second_user["user_id"])
+            inbox_broker.wake_all()
+
+        task = asyncio.create_task(notify_other())
+        response = await self._stream(async_client, test_user, auth_headers)
+        await task
+
+        assert _events(response.text) == []
+
+    async def test_stream_requires_auth(self, async_client: AsyncClient):
+        """Unauthenticated request returns 401."""
+        response = await async_client.get("/api/v1/inbox/stream")
+        assert response.status_code == 401
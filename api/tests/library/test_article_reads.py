@@ -0,0 +1,161 @@
+"""
+Tests for article read statistics:
+- GET /api/v1/library/articles/{slug}/reads
+- Reads are counted exactly by the read rollup and sampled in the audit log
+"""
+
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+from httpx import AsyncClient
+from sqlalchemy import delete, func, select
+
+from app.models.article import Article, ArticleReadHour, ArticleReadKey
+from app.services.activity import ActivityService, ActivityWriter
+from app.services.read_rollup import read_hour, read_rollup
+
+
+async def _create_article(async_client: AsyncClient, auth_headers, user: dict, slug: str) -> str:
+    response = await async_client.post(
+        "/api/v1/library/articles",
+        json={"title": "Popular", "slug": slug, "content_md": "Read me"},
+        headers=auth_headers(user["api_key"]),
+    )
+    return response.json()["id"]
+
+
+async def _reads(async_client: AsyncClient, auth_headers, user: dict, slug: str):
+    return await async_client.get(
+        f"/api/v1/library/articles/{slug}/reads",
+        headers=auth_headers(user["api_key"]),
+    )
+
+
+class TestArticleReads:
+    """Hourly read counts are exact and visible to authors and admins."""
+
+    async def test_reads_and_distinct_keys_are_counted(
+        self, async_client: AsyncClient, test_user: dict, second_user: dict, auth_headers, db_session
+    ):
+        """Single and batch reads add up; each key counts once per hour."""
+        await _create_article(async_client, auth_headers, test_user, "popular")
+        for user in (test_user, second_user):
+            await async_client.get(
+                "/api/v1/library/articles/popular", headers=auth_headers(user["api_key"])
+            )
+        await async_client.post(
+            "/api/v1/library/articles/batch-read",
+            json={"slugs": ["popular"]},
+            headers=auth_headers(second_user["api_key"]),
+        )
+
+        assert await read_rollup.flush(db_session) == 3
+
+        response = await _reads(async_client, auth_headers, test_user, "popular")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["reads"] == 3
+        [hour] = data["items"]
+        assert hour["reads"] == 3
+        assert hour["distinct_keys"] == 2
+        assert hour["hour"] == read_hour(datetime.now(UTC)).isoformat()
+
+    async def test_distinct_keys_stay_exact_across_flushes(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """A key already counted in an earlier flush is not counted again."""
+        article_id = UUID(await _create_article(async_client, auth_headers, test_user, "popular"))
+        key_id = uuid4()
+        read_rollup.record(article_id, key_id)
+        await read_rollup.flush(db_session)
+        read_rollup.record(article_id, key_id)
+        read_rollup.record(article_id, None)
+        await read_rollup.flush(db_session)
+
+        [hour] = (await _reads(async_client, auth_headers, test_user, "popular")).json()["items"]
+        assert (hour["reads"], hour["distinct_keys"]) == (3, 1)
+
+    async def test_reads_of_deleted_articles_are_skipped(self, db_session, test_user: dict):
+        """Pending counts for an article deleted before the flush are dropped."""
+        read_rollup.record(uuid4(), uuid4())
+
+        assert await read_rollup.flush(db_session) == 1
+        assert read_rollup.stats()["pending_reads"] == 0
+
+    async def test_old_key_rows_are_pruned(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """Key rows older than the retention window are deleted on flush."""
+        article_id = UUID(await _create_article(async_client, auth_headers, test_user, "popular"))
+        old = datetime.now(UTC) - timedelta(hours=read_rollup.key_retention_hours + 2)
+        read_rollup.record(article_id, uuid4(), at=old)
+        read_rollup.record(article_id, uuid4())
+
+        await read_rollup.flush(db_session)
+
+        count = await db_session.scalar(select(func.count()).select_from(ArticleReadKey))
+        assert count == 1
+
+    async def test_only_author_or_admin_sees_reads(
+        self, async_client: AsyncClient, test_user: dict, second_user: dict, test_admin: dict,
+        auth_headers, db_session
+    ):
+        """Other users get 403; admins can see any article's reads."""
+        await _create_article(async_client, auth_headers, test_user, "popular")
+
+        assert (await _reads(async_client, auth_headers, second_user, "popular")).status_code == 403
+        assert (await _reads(async_client, auth_headers, test_admin, "popular")).status_code == 200
+
+    async def test_deleting_article_removes_rollups(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """Rollup rows go with their article."""
+        article_id = UUID(await _create_article(async_client, auth_headers, test_user, "popular"))
+        read_rollup.record(article_id, uuid4())
+        await read_rollup.flush(db_session)
+
+        await db_session.execute(delete(Article).where(Article.id == article_id))
+        await db_session.commit()
+
+        count = await db_session.scalar(select(func.count()).select_from(ArticleReadHour))
+        assert count == 0
+
+
+class TestReadSampling:
+    """Read events are sampled per resource before they are queued."""
+
+    def _service(self, rates: dict[str, float]) -> tuple[ActivityService, ActivityWriter]:
+        writer = ActivityWriter(
+            batch_size=10, flush_interval_seconds=1.0, max_queue=10, overflow="drop", sample_rate=0.0
+        )
+        return ActivityService(writer=writer, read_sample_rates=rates), writer
+
+    async def _log(self, service: ActivityService, action: str, resource: str):
+        request = SimpleNamespace(state=SimpleNamespace(), client=None, headers={})
+        return await service.log(request, None, None, action, resource, uuid4())
+
+    async def test_sampled_out_reads_are_not_queued(self):
+        """A zero rate skips reads of that resource and counts them."""
+        service, writer = self._service({"article": 0.0})
+
+        assert await self._log(service, "read", "article") is None
+        assert writer.stats()["queued"] == 0
+        assert writer.stats()["reads_skipped"] == 1
+
+    async def test_writes_and_unlisted_resources_are_always_logged(self):
+        """Only reads of listed resources are sampled."""
+        service, writer = self._service({"article": 0.0})
+
+        assert await self._log(service, "update", "article") is not None
+        assert await self._log(service, "read", "bulletin_post") is not None
+        assert writer.stats()["queued"] == 2
+
+    async def test_dropped_events_are_not_returned(self):
+        """An event the full queue refuses is reported as not logged."""
+        service, writer = self._service({})
+        for _ in range(10):
+            await self._log(service, "update", "article")
+
+        assert await self._log(service, "update", "article") is None
+        assert writer.stats()["dropped"] == 1
@@ -1,10 +1,19 @@
 """
 Tests for library batch-read endpoint:
 - POST /api/v1/library/articles/batch-read
+- Batches are charged to the read budget per slug (and optionally per size)
+- Requests costing more than the whole budget are refused outright
+- Single reads are priced from the row they load, in one query
 """
 
+from uuid import UUID
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event, update
+
+from app.config import settings
+from app.models.user import APIKey
 
 
 class TestBatchRead:
@@ -124,3 +133,121 @@ class TestBatchRead:
             json={"slugs": ["test"]},
         )
         assert response.status_code == 401
+
+
+class TestBatchReadCost:
+    """Batch reads are charged as N reads."""
+
+    async def _create(self, async_client: AsyncClient, headers: dict, slug: str, content: str):
+        response = await async_client.post(
+            "/api/v1/library/articles",
+            json={"title": slug, "slug": slug, "content_md": content},
+            headers=headers,
+        )
+        assert response.status_code == 201
+
+    async def test_batch_charges_read_budget_per_slug(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Every requested slug costs one read, including missing ones."""
+        headers = auth_headers(test_user["api_key"])
+        await self._create(async_client, headers, "cost-a", "A")
+        await self._create(async_client, headers, "cost-b", "B")
+
+        response = await async_client.post(
+            "/api/v1/library/articles/batch-read",
+            json={"slugs": ["cost-a", "cost-b", "cost-missing"]},
+            headers=headers,
+        )
+
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Limit"] == "1000"
+        assert response.headers["X-RateLimit-Remaining"] == "997"
+
+    async def test_batch_over_read_budget_returns_429(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """A batch larger than the remaining read budget is rejected."""
+        await db_session.execute(
+            update(APIKey)
+            .where(APIKey.user_id == UUID(test_user["user_id"]))
+            .values(rate_limit_reads=5)
+        )
+        await db_session.commit()
+
+        for expected in (200, 429):
+            response = await async_client.post(
+                "/api/v1/library/articles/batch-read",
+                json={"slugs": [f"slug-{i}" for i in range(3)]},
+                headers=auth_headers(test_user["api_key"]),
+            )
+            assert response.status_code == expected
+
+        assert response.json()["detail"]["error"]["code"] == "RATE_LIMITED"
+        assert "Retry-After" in response.headers
+
+    async def test_batch_over_whole_budget_returns_413(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """A batch costing more than the hourly limit could never succeed."""
+        await db_session.execute(
+            update(APIKey)
+            .where(APIKey.user_id == UUID(test_user["user_id"]))
+            .values(rate_limit_reads=5)
+        )
+        await db_session.commit()
+
+        response = await async_client.post(
+            "/api/v1/library/articles/batch-read",
+            json={"slugs": [f"slug-{i}" for i in range(6)]},
+            headers=auth_headers(test_user["api_key"]),
+        )
+
+        assert response.status_code == 413
+        assert response.json()["detail"]["error"]["code"] == "REQUEST_TOO_COSTLY"
+        assert "Retry-After" not in response.headers
+
+    async def test_bytes_mode_charges_large_articles(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, monkeypatch
+    ):
+        """With byte charging, size served costs more than the item count."""
+        monkeypatch.setattr(settings, "rate_limit_payload_cost", "bytes")
+        monkeypatch.setattr(settings, "rate_limit_bytes_per_unit", 100)
+        headers = auth_headers(test_user["api_key"])
+        await self._create(async_client, headers, "cost-large", "x" * 1000)
+
+        response = await async_client.post(
+            "/api/v1/library/articles/batch-read",
+            json={"slugs": ["cost-large"]},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Remaining"] == "990"
+
+        response = await async_client.get("/api/v1/library/articles/cost-large", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Remaining"] == "980"
+
+    async def test_single_read_loads_the_article_once(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session, monkeypatch
+    ):
+        """A size-priced single read is charged from the one row it loads."""
+        monkeypatch.setattr(settings, "rate_limit_payload_cost", "bytes")
+        monkeypatch.setattr(settings, "rate_limit_bytes_per_unit", 100)
+        headers = auth_headers(test_user["api_key"])
+        await self._create(async_client, headers, "cost-once", "x" * 1000)
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db_session.bind.sync_engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = await async_client.get("/api/v1/library/articles/cost-once", headers=headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Remaining"] == "990"
+        assert len([s for s in statements if "FROM articles" in s]) == 1
@@ -0,0 +1,386 @@
+"""
+Tests for X-Idempotency-Key handling on writes:
+- Retries replay the original response without repeating the write
+- Replays are charged to the key's read budget
+- Reusing a key for a different request returns 409
+- Failed requests release the key; in-flight keys return 409
+- Cancelled requests and streamed responses release the key unstored
+- Keys live in day partitions; expired partitions are dropped whole
+"""
+
+import asyncio
+import json
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from httpx import AsyncClient
+from sqlalchemy import func, select, update
+
+from app.database import Base, include_object
+from app.main import app
+from app.middleware.idempotency import IdempotencyMiddleware
+from app.models.article import Article
+from app.models.idempotency import IdempotencyKey
+from app.models.user import APIKey
+from app.services.idempotency import (
+    IdempotencyPartitions,
+    IdempotencyService,
+    list_partitions,
+    replay_cache,
+)
+
+ARTICLE = {"title": "Idempotent", "slug": "idempotent", "content_md": "Once only"}
+
+
+class TestIdempotentWrites:
+    """X-Idempotency-Key on POST/PATCH/DELETE."""
+
+    async def test_retry_replays_without_repeating_write(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """The second request gets the first response and creates nothing."""
+        headers = {**auth_headers(test_user["api_key"]), "X-Idempotency-Key": "create-1"}
+
+        first = await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+        second = await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+
+        assert first.status_code == 201
+        assert "X-Idempotency-Replayed" not in first.headers
+        assert second.status_code == 201
+        assert second.headers["X-Idempotency-Replayed"] == "true"
+        assert second.json() == first.json()
+        assert await db_session.scalar(select(func.count()).select_from(Article)) == 1
+
+    async def test_replay_from_database_after_cache_loss(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """Completed keys replay from idempotency_keys when the worker cache is cold."""
+        headers = {**auth_headers(test_user["api_key"]), "X-Idempotency-Key": "create-2"}
+        first = await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+
+        record = await db_session.scalar(select(IdempotencyKey).where(IdempotencyKey.key == "create-2"))
+        assert record.status == "completed"
+        assert record.response_status == 201
+
+        replay_cache.clear()
+        second = await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+
+        assert second.status_code == 201
+        assert second.headers["X-Idempotency-Replayed"] == "true"
+        assert second.json() == first.json()
+
+    async def test_replays_are_charged_to_read_budget(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """Each replay costs a read, and an exhausted read budget rejects it."""
+        await db_session.execute(
+            update(APIKey)
+            .where(APIKey.user_id == UUID(test_user["user_id"]))
+            .values(rate_limit_reads=1)
+        )
+        await db_session.commit()
+        headers = {**auth_headers(test_user["api_key"]), "X-Idempotency-Key": "create-6"}
+        await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+
+        replayed = await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+        limited = await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+
+        assert replayed.status_code == 201
+        assert replayed.headers["X-RateLimit-Remaining"] == "0"
+        assert limited.status_code == 429
+        assert limited.json()["detail"]["error"]["code"] == "RATE_LIMITED"
+        assert "X-Idempotency-Replayed" not in limited.headers
+
+    async def test_key_reused_with_different_body_returns_409(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Same key, different payload is rejected."""
+        headers = {**auth_headers(test_user["api_key"]), "X-Idempotency-Key": "create-3"}
+        await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+
+        for _ in range(2):  # From the worker cache, then from the database
+            response = await async_client.post(
+                "/api/v1/library/articles",
+                json={**ARTICLE, "slug": "other"},
+                headers=headers,
+            )
+            assert response.status_code == 409
+            assert response.json()["detail"]["error"]["code"] == "IDEMPOTENCY_CONFLICT"
+            replay_cache.clear()
+
+    async def test_failed_request_can_be_retried(
+        self, async_client: AsyncClient, test_user: dict, auth_headers
+    ):
+        """Error responses are not stored, so a corrected retry runs."""
+        headers = {**auth_headers(test_user["api_key"]), "X-Idempotency-Key": "create-4"}
+
+        rejected = await async_client.post(
+            "/api/v1/library/articles", json={"title": "No content"}, headers=headers
+        )
+        retried = await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+
+        assert rejected.status_code == 422
+        assert retried.status_code == 201
+        assert "X-Idempotency-Replayed" not in retried.headers
+
+    async def test_in_progress_key_returns_409(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """A retry while the original is still running is rejected."""
+        body = json.dumps(ARTICLE).encode()
+        db_session.add(
+            IdempotencyKey(
+                key="create-5",
+                user_id=UUID(test_user["user_id"]),
+                method="POST",
+                path="/api/v1/library/articles",
+                request_hash=IdempotencyService.hash_request_body(body),
+                status="processing",
+                created_at=datetime.now(UTC),
+            )
+        )
+        await db_session.commit()
+
+        response = await async_client.post(
+            "/api/v1/library/articles",
+            content=body,
+            headers={
+                **auth_headers(test_user["api_key"]),
+                "Content-Type": "application/json",
+                "X-Idempotency-Key": "create-5",
+            },
+        )
+        assert response.status_code == 409
+        assert response.json()["detail"]["error"]["code"] == "IDEMPOTENCY_IN_PROGRESS"
+
+    async def test_keys_are_scoped_per_user(
+        self, async_client: AsyncClient, test_user: dict, test_admin: dict, auth_headers
+    ):
+        """Another user's identical key is an unrelated request."""
+        first = await async_client.post(
+            "/api/v1/library/articles",
+            json=ARTICLE,
+            headers={**auth_headers(test_user["api_key"]), "X-Idempotency-Key": "shared"},
+        )
+        second = await async_client.post(
+            "/api/v1/library/articles",
+            json={**ARTICLE, "slug": "idempotent-admin"},
+            headers={**auth_headers(test_admin["api_key"]), "X-Idempotency-Key": "shared"},
+        )
+
+        assert first.status_code == 201
+        assert second.status_code == 201
+        assert second.json()["id"] != first.json()["id"]
+
+
+class TestUnstoredResponses:
+    """Responses the middleware cannot store release the key."""
+
+    def _scope(self, user: dict, key: str) -> dict:
+        return {
+            "type": "http",
+            "method": "POST",
+            "path": "/api/v1/library/articles",
+            "query_string": b"",
+            "headers": [
+                (b"x-api-key", user["api_key"].encode()),
+                (b"x-idempotency-key", key.encode()),
+            ],
+            "app": app,
+        }
+
+    async def _run(self, inner, scope: dict) -> list[dict]:
+        sent = []
+        received = iter([{"type": "http.request", "body": b"{}", "more_body": False}])
+
+        async def receive():
+            return next(received, {"type": "http.disconnect"})
+
+        async def send(message):
+            sent.append(message)
+
+        await IdempotencyMiddleware(inner)(scope, receive, send)
+        return sent
+
+    async def _status(self, db_session, key: str) -> str:
+        record = await db_session.scalar(select(IdempotencyKey).where(IdempotencyKey.key == key))
+        await db_session.refresh(record)
+        return record.status
+
+    async def test_cancelled_request_releases_key(
+        self, async_client: AsyncClient, test_user: dict, db_session
+    ):
+        """A client disconnect mid-request marks the claim failed, not processing."""
+
+        async def cancelled(scope, receive, send):
+            raise asyncio.CancelledError
+
+        try:
+            await self._run(cancelled, self._scope(test_user, "cancel-1"))
+        except asyncio.CancelledError:
+            pass
+        else:
+            raise AssertionError("CancelledError was swallowed")
+
+        assert await self._status(db_session, "cancel-1") == "failed"
+
+    async def test_streamed_response_passes_through(
+        self, async_client: AsyncClient, test_user: dict, db_session
+    ):
+        """Chunks are sent as produced and the key is released, not stored."""
+        chunks = [b"one", b"two", b"three"]
+
+        async def streamed(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            for i, chunk in enumerate(chunks):
+                more = i < len(chunks) - 1
+                await send({"type": "http.response.body", "body": chunk, "more_body": more})
+
+        sent = await self._run(streamed, self._scope(test_user, "stream-1"))
+
+        assert [m.get("body") for m in sent if m["type"] == "http.response.body"] == chunks
+        assert await self._status(db_session, "stream-1") == "failed"
+        assert replay_cache.get(UUID(test_user["user_id"]), "stream-1") is None
+
+
+class TestByteExactReplay:
+    """Stored responses replay as the bytes originally sent."""
+
+    async def test_replay_is_byte_identical(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """Database replays return the original body bytes and headers."""
+        headers = {**auth_headers(test_user["api_key"]), "X-Idempotency-Key": "bytes-1"}
+        first = await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+
+        record = await db_session.scalar(select(IdempotencyKey).where(IdempotencyKey.key == "bytes-1"))
+        assert record.response_bytes == first.content
+        assert record.response_encoding is None
+
+        replay_cache.clear()
+        second = await async_client.post("/api/v1/library/articles", json=ARTICLE, headers=headers)
+
+        assert second.content == first.content
+        assert second.headers["content-type"] == first.headers["content-type"]
+        assert second.headers["content-length"] == first.headers["content-length"]
+
+    async def test_large_response_stored_compressed(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """Large bodies are gzipped at rest and replay identically with or without gzip."""
+        article = {**ARTICLE, "content_md": "All work and no play. " * 200}
+        headers = {**auth_headers(test_user["api_key"]), "X-Idempotency-Key": "bytes-2"}
+        first = await async_client.post("/api/v1/library/articles", json=article, headers=headers)
+
+        record = await db_session.scalar(select(IdempotencyKey).where(IdempotencyKey.key == "bytes-2"))
+        assert record.response_encoding == "gzip"
+        assert len(record.response_bytes) < len(first.content)
+
+        gzipped = await async_client.post(
+            "/api/v1/library/articles",
+            json=article,
+            headers={**headers, "Accept-Encoding": "gzip"},
+        )
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert gzipped.content == first.content
+
+        replay_cache.clear()
+        identity = await async_client.post(
+            "/api/v1/library/articles",
+            json=article,
+            headers={**headers, "Accept-Encoding": "identity"},
+        )
+        assert "content-encoding" not in identity.headers
+        assert identity.content == first.content
+
+
+class TestDayPartitions:
+    """idempotency_keys is partitioned by UTC day."""
+
+    async def _store_yesterday(self, db_session, user_id: str, key: str, age: timedelta) -> bytes:
+        body = json.dumps(ARTICLE).encode()
+        now = datetime.now(UTC)
+        db_session.add(
+            IdempotencyKey(
+                key=key,
+                user_id=UUID(user_id),
+                method="POST",
+                path="/api/v1/library/articles",
+                request_hash=IdempotencyService.hash_request_body(body),
+                status="completed",
+                response_status=201,
+                response_headers=[["content-type", "application/json"]],
+                response_bytes=b'{"stored":true}',
+                created_at=now - age,
+                created_on=now.date() - timedelta(days=1),
+            )
+        )
+        await db_session.commit()
+        return body
+
+    async def test_maintain_creates_ahead_and_drops_expired(self, db_session):
+        """Partitions past the TTL are dropped; upcoming days are created."""
+        today = datetime.now(UTC).date()
+        partitions = await list_partitions(db_session)
+        assert set(partitions) == {today + timedelta(days=i) for i in (-1, 0, 1)}
+
+        created, dropped = await IdempotencyPartitions(interval_seconds=3600).maintain(
+            db_session, now=datetime.now(UTC) + timedelta(days=3)
+        )
+
+        assert (created, dropped) == (3, 3)
+        partitions = await list_partitions(db_session)
+        assert set(partitions) == {today + timedelta(days=i) for i in (2, 3, 4)}
+
+    async def test_partitions_are_not_schema_drift(self, db_session):
+        """Autogenerate leaves the day partitions and their indexes alone."""
+
+        def compare(connection) -> list:
+            opts = {"compare_type": True, "include_object": include_object}
+            return compare_metadata(MigrationContext.configure(connection, opts=opts), Base.metadata)
+
+        connection = await db_session.connection()
+        diffs = await connection.run_sync(compare)
+
+        assert not [diff for diff in diffs if "idempotency_keys_p" in repr(diff)]
+
+    async def test_live_key_in_yesterdays_partition_replays(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """A key claimed before midnight still replays after it."""
+        body = await self._store_yesterday(db_session, test_user["user_id"], "day-1", timedelta(hours=1))
+
+        response = await async_client.post(
+            "/api/v1/library/articles",
+            content=body,
+            headers={
+                **auth_headers(test_user["api_key"]),
+                "Content-Type": "application/json",
+                "X-Idempotency-Key": "day-1",
+            },
+        )
+
+        assert response.status_code == 201
+        assert response.content == b'{"stored":true}'
+
+    async def test_expired_key_in_yesterdays_partition_is_reusable(
+        self, async_client: AsyncClient, test_user: dict, auth_headers, db_session
+    ):
+        """Keys older than the TTL are ignored even before their partition is dropped."""
+        body = await self._store_yesterday(db_session, test_user["user_id"], "day-2", timedelta(hours=25))
+
+        response = await async_client.post(
+            "/api/v1/library/articles",
+            content=body,
+            headers={
+                **auth_headers(test_user["api_key"]),
+                "Content-Type": "application/json",
+                "X-Idempotency-Key": "day-2",
+            },
+        )
+
+        assert response.status_code == 201
+        assert "X-Idempotency-Replayed" not in response.headers
+        assert response.json()["slug"] == ARTICLE["slug"]
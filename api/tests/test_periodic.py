@@ -0,0 +1,74 @@
+"""
+Tests for the periodic background task scaffold:
+- Runs wait for the interval; run_on_start runs once before start() returns
+- A failing run is logged and the loop carries on
+- run_on_stop runs once more after the loop ends
+- Subclasses must implement run_once
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.periodic import PeriodicTask
+
+
+class Counting(PeriodicTask):
+    name = "counting"
+
+    def __init__(self, interval_seconds: float, fail: bool = False):
+        super().__init__(interval_seconds)
+        self.fail = fail
+        self.runs = 0
+
+    async def run_once(self, db) -> int:
+        self.runs += 1
+        if self.fail:
+            raise RuntimeError("boom")
+        return self.runs
+
+
+class TestPeriodicTask:
+    """PeriodicTask lifecycle."""
+
+    async def test_first_run_waits_for_interval(self):
+        """Nothing runs until an interval has passed."""
+        task = Counting(interval_seconds=0.05)
+        await task.start()
+        try:
+            assert task.runs == 0
+            await asyncio.sleep(0.2)
+            assert task.runs >= 2
+        finally:
+            await task.stop()
+
+    async def test_run_on_start_and_stop(self):
+        """run_on_start runs before start() returns; run_on_stop after the loop."""
+        task = Counting(interval_seconds=3600)
+        task.run_on_start = True
+        task.run_on_stop = True
+
+        await task.start()
+        assert task.runs == 1
+        await task.stop()
+        assert task.runs == 2
+
+    async def test_failures_do_not_stop_the_loop(self):
+        """A run that raises is logged and the next one still happens."""
+        task = Counting(interval_seconds=0.02, fail=True)
+        await task.start()
+        try:
+            await asyncio.sleep(0.2)
+            assert task.runs >= 2
+            assert task._task is not None and not task._task.done()
+        finally:
+            await task.stop()
+
+    def test_run_once_is_abstract(self):
+        """A subclass without run_once cannot be instantiated."""
+
+        class Incomplete(PeriodicTask):
+            name = "incomplete"
+
+        with pytest.raises(TypeError):
+            Incomplete(interval_seconds=1)